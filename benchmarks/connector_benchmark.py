@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""Offline throughput, latency and memory benchmarks of every connector.
+
+Each connector runs against a local StubServer serving synthetic payloads,
+so the suite needs neither network access nor API keys. Per connector it
+measures:
+
+    throughput  requests per second of a multi-request call, with injected
+                latency so that concurrency shows
+    latency     p50/p95 milliseconds of single calls, i.e. client overhead
+    memory      peak traced MiB of one large response, request and parsing
+
+DeFiLlama also runs its throughput scenario with injected 503s to measure
+the cost of retries. Results are compared with a stored baselines file and
+the run fails when a metric is worse than its baseline by more than the
+tolerance. Baselines depend on the machine; refresh them with --save after
+an intended change.
+
+Usage:
+    python -m benchmarks.connector_benchmark [--check] [--save] [--tolerance 0.5]
+        [--baselines benchmarks/baselines.json] [--only defillama messari]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# Connectors read their API keys at import, the stub server ignores them
+for _env_key in ("ETHERSCAN_API_KEY", "COINMARKETCAP_API_KEY", "FTMSCAN_API_KEY"):
+    os.environ.setdefault(_env_key, "offline")
+
+from benchmarks import payloads  # noqa: E402
+from pycaw import cmc  # noqa: E402
+from pycaw.defillama import DeFiLlama  # noqa: E402
+from pycaw.etherscan import EtherscanConnector  # noqa: E402
+from pycaw.messari import Messari  # noqa: E402
+from pycaw.messari.dataloader import RetryPolicy  # noqa: E402
+from tests.http_fixtures import StubServer, route_to  # noqa: E402
+
+DEFAULT_BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+CONNECTORS = ("defillama", "messari", "etherscan", "cmc")
+HOSTS = ["api.llama.fi", "data.messari.io", "api.etherscan.io", "pro-api.coinmarketcap.com"]
+
+# Latency injected by the stub server in the throughput scenarios
+THROUGHPUT_LATENCY = 0.02
+NUM_REQUESTS = 32
+LATENCY_CALLS = 50
+# Differences below these never count as regressions, millisecond timings are noisy
+ABSOLUTE_SLACK = {"_ms": 5.0, "_mib": 1.0}
+
+
+def throughput(func: Callable[[], object], num_requests: int) -> float:
+    start = time.perf_counter()
+    func()
+    return num_requests / (time.perf_counter() - start)
+
+
+def latency(func: Callable[[], object], calls: int = LATENCY_CALLS) -> Dict[str, float]:
+    func()  # Warm up the connection pool
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e3)
+    timings.sort()
+    return {"latency_p50_ms": timings[len(timings) // 2],
+            "latency_p95_ms": timings[int(len(timings) * 0.95) - 1]}
+
+
+def peak_mib(func: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 2**20
+
+
+def bench_defillama(server: StubServer) -> Dict[str, float]:
+    small = payloads.synthetic_protocol(num_days=200, num_chains=2, num_tokens=5)
+    large = payloads.synthetic_protocol(num_days=1500, num_chains=8, num_tokens=40)
+    server.add_route(r"^/protocol/large$", large)
+    server.add_route(r"^/protocol/", small)
+    slugs = [f"protocol-{i}" for i in range(NUM_REQUESTS)]
+    llama = DeFiLlama(max_workers=8, retry_policy=RetryPolicy(backoff_factor=0.0))
+
+    results = {}
+    server.latency = THROUGHPUT_LATENCY
+    results["throughput_rps"] = throughput(
+        lambda: llama.get_protocol_tvl_timeseries(slugs), NUM_REQUESTS)
+    server.error_rate = 0.1
+    results["throughput_errors_rps"] = throughput(
+        lambda: llama.get_protocol_tvl_timeseries(slugs), NUM_REQUESTS)
+    server.latency, server.error_rate = 0.0, 0.0
+    results.update(latency(lambda: llama.get_protocol_tvl_timeseries("protocol-0")))
+    results["peak_mib"] = peak_mib(lambda: llama.get_protocol_tvl_timeseries("large"))
+    return results
+
+
+def bench_messari(server: StubServer) -> Dict[str, float]:
+    metrics = payloads.synthetic_asset_metrics(num_assets=NUM_REQUESTS)
+    server.add_route(r"/assets/([^/]+)/metrics$",
+                     lambda path, query: {"data": metrics[path.split("/")[-2]]})
+    slugs = list(metrics)
+    messari = Messari(max_workers=8)
+
+    results = {}
+    server.latency = THROUGHPUT_LATENCY
+    results["throughput_rps"] = throughput(lambda: messari.get_asset_metrics(slugs),
+                                           NUM_REQUESTS)
+    server.latency = 0.0
+    results.update(latency(lambda: messari.get_asset_metrics(slugs[0])))
+    results["peak_mib"] = peak_mib(lambda: messari.get_asset_metrics(slugs))
+    return results
+
+
+def bench_etherscan(server: StubServer) -> Dict[str, float]:
+    logs = payloads.synthetic_event_logs(num_logs=1000)
+    server.add_route(r"module=logs.*offset=1000", {"status": "1", "message": "OK",
+                                                    "result": logs})
+    server.add_route(r"module=logs", {"status": "1", "message": "OK", "result": logs[:10]})
+    connector = EtherscanConnector(max_api_calls_sec=10_000)
+    address, topic = "0x" + "ab" * 20, "0x" + "cd" * 32
+
+    def event_logs(num_calls: int):
+        for page in range(num_calls):
+            connector.get_event_log(address, topic, page=page + 1)
+
+    results = {}
+    server.latency = THROUGHPUT_LATENCY
+    results["throughput_rps"] = throughput(lambda: event_logs(NUM_REQUESTS // 4),
+                                           NUM_REQUESTS // 4)
+    server.latency = 0.0
+    results.update(latency(lambda: event_logs(1)))
+    results["peak_mib"] = peak_mib(lambda: connector.get_event_log(address, topic, offset=1000))
+    return results
+
+
+def bench_cmc(server: StubServer) -> Dict[str, float]:
+    id_map = payloads.synthetic_cmc_map(num_coins=5000)
+    by_symbol = {coin["symbol"]: coin for coin in id_map}
+
+    def map_payload(path, query):
+        if "symbol" in query:
+            return {"data": [by_symbol[symbol] for symbol in query["symbol"].split(",")]}
+        start = int(query["start"]) - 1
+        return {"data": id_map[start:start + int(query["limit"])]}
+
+    server.add_route(r"/cryptocurrency/map", map_payload)
+    server.add_route(r"/cryptocurrency/quotes/latest", lambda path, query: {"data": {
+        id_: {"id": int(id_), "quote": {"USD": {"price": 1.0}}}
+        for id_ in query["id"].split(",")}})
+    api = cmc.CoinMarketCapAPI(max_workers=8)
+    ids = [coin["id"] for coin in id_map]
+    symbols = [coin["symbol"] for coin in id_map[:NUM_REQUESTS // 4]]
+
+    results = {}
+    server.latency = THROUGHPUT_LATENCY
+    # Unknown symbols are queried once, then resolved in the local id map
+    results["throughput_rps"] = throughput(
+        lambda: [api.cmc_id_map(symbol) for symbol in symbols], len(symbols))
+    # Quote requests are chunked by URL length, count the ones actually sent
+    sent = server.stats["requests"]
+    quotes_rps = throughput(lambda: api.quotes_latest(ids), 1)
+    results["throughput_quotes_rps"] = quotes_rps * (server.stats["requests"] - sent)
+    server.latency = 0.0
+    # cmc_id_map of a known symbol never reaches the transport, quotes always do
+    results.update(latency(lambda: api.quotes_latest(ids[:1])))
+    results["peak_mib"] = peak_mib(lambda: api.cmc_id_map("all"))
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[StubServer], Dict[str, float]]] = {
+    "defillama": bench_defillama, "messari": bench_messari,
+    "etherscan": bench_etherscan, "cmc": bench_cmc}
+
+
+def run(connectors: List[str]) -> Dict[str, float]:
+    results = {}
+    for name in connectors:
+        with StubServer(seed=0) as server, route_to(server, hosts=HOSTS):
+            for metric, value in BENCHMARKS[name](server).items():
+                results[f"{name}.{metric}"] = round(value, 3)
+    return results
+
+
+def regressions(results: Dict[str, float], baselines: Dict[str, float],
+                tolerance: float) -> List[str]:
+    """Metrics worse than their baseline by more than tolerance (a fraction)"""
+    failed = []
+    for metric, value in results.items():
+        baseline = baselines.get(metric)
+        if baseline is None:
+            continue
+        if metric.endswith("_rps"):
+            worse = value < baseline * (1 - tolerance)
+        else:
+            slack = next((slack for suffix, slack in ABSOLUTE_SLACK.items()
+                          if metric.endswith(suffix)), 0.0)
+            worse = value > max(baseline * (1 + tolerance), baseline + slack)
+        if worse:
+            failed.append(f"{metric}: {value:.3f} vs baseline {baseline:.3f}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=CONNECTORS, default=list(CONNECTORS))
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed fraction worse than baseline, stub runs are noisy")
+    parser.add_argument("--check", action="store_true", help="exit 1 on regressions")
+    parser.add_argument("--save", action="store_true", help="store the results as baselines")
+    args = parser.parse_args()
+
+    results = run(args.only)
+    baselines: Dict[str, float] = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    for metric, value in results.items():
+        baseline = baselines.get(metric)
+        reference = "" if baseline is None else f"  (baseline {baseline:.3f})"
+        print(f"{metric:<36} {value:10.3f}{reference}")
+
+    if args.save:
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump({**baselines, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines saved to {args.baselines}")
+    if args.check:
+        failed = regressions(results, baselines, args.tolerance)
+        for line in failed:
+            print(f"REGRESSION {line}")
+        if failed:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
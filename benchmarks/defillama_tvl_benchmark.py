@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""Benchmark 'helpers.protocols_tvl_df' against the per-chain concat/join builder,
+the memory of its wide, sparse and long outputs, and date windows pushed down
+into parsing against filtering the full history.
+
+Usage:
+    python -m benchmarks.defillama_tvl_benchmark [--payload recorded_protocol.json]
+        [--protocols 5] [--repeat 5] [--memory-protocols 40]
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+
+import pandas as pd
+from typing import Any, Dict, List
+
+from benchmarks import payloads
+from pycaw.defillama import helpers
+from pycaw.messari import utils
+
+
+def baseline_protocol_tvl_df(protocol: Dict[str, Any]) -> pd.DataFrame:
+    """The per-chain concat/join builder protocol_tvl_df replaced, mutates protocol."""
+    ###########################
+    # This portion is basically grabbing tvl metrics on a per chain basis
+
+    # TODO this is gonna be difficult
+    chain_tvls = protocol["chainTvls"]
+    chains = protocol["chains"]
+    chain_list = []
+    chain_df_list = []
+    for chain in chains:
+        chain_list.append(chain)
+
+        # get timeseries
+        chain_tvl = chain_tvls[chain]["tvl"]
+        chain_tvl_tokens = chain_tvls[chain]["tokens"]
+        chain_tvl_tokens_usd = chain_tvls[chain]["tokensInUsd"]
+
+        # convert tokens & tokensInUsd
+        for token in chain_tvl_tokens:
+            for key, value in token["tokens"].items():
+                token[key] = value
+            token.pop("tokens", None)
+
+        for token in chain_tvl_tokens_usd:
+            for key, value in token["tokens"].items():
+                token[key] = value
+            token.pop("tokens", None)
+
+        # convert to df
+        chain_tvl_df = pd.DataFrame(chain_tvl)
+        chain_tvl_tokens_df = pd.DataFrame(chain_tvl_tokens)
+        chain_tvl_tokens_usd_df = pd.DataFrame(chain_tvl_tokens_usd)
+
+        # fix indexes
+        chain_tvl_df = helpers.format_df(chain_tvl_df)
+        chain_tvl_tokens_df = helpers.format_df(chain_tvl_tokens_df)
+        chain_tvl_tokens_usd_df = helpers.format_df(chain_tvl_tokens_usd_df)
+        chain_tvl_tokens_usd_df = chain_tvl_tokens_usd_df.add_suffix("_usd")
+
+        # concat tokens and tokensInUsd
+        joint_tokens_df = pd.concat(
+            [chain_tvl_tokens_df, chain_tvl_tokens_usd_df], axis=1
+        )
+        # Join total chain TVL w/ token TVL
+        chain_df = chain_tvl_df.join(joint_tokens_df)
+        chain_df_list.append(chain_df)
+
+    ###########################
+    # This portion is basically grabbing tvl metrics for all chains combined
+
+    ######################################
+    # Get protocol token balances
+
+    ## tokens in native amount
+    tokens = protocol["tokens"]
+    for token in tokens:
+        for key, value in token["tokens"].items():
+            token[key] = value
+        token.pop("tokens", None)
+    tokens_df = pd.DataFrame(tokens)
+    tokens_df = helpers.format_df(tokens_df)
+
+    ## tokens in USD
+    tokens_usd = protocol["tokensInUsd"]
+    for token in tokens_usd:
+        for key, value in token["tokens"].items():
+            token[key] = value
+        token.pop("tokens", None)
+    tokens_usd_df = pd.DataFrame(tokens_usd)
+    tokens_usd_df = helpers.format_df(tokens_usd_df)
+    tokens_usd_df = tokens_usd_df.add_suffix("_usd")
+
+    # Get total tvl across chains
+    tvl = protocol["tvl"]
+    total_tvl_df = pd.DataFrame(tvl)
+    total_tvl_df = helpers.format_df(total_tvl_df)
+
+    # Working
+    joint_tokens_df = pd.concat([tokens_df, tokens_usd_df], axis=1)
+    total_df = total_tvl_df.join(joint_tokens_df)
+
+    # Now create multi index
+    chain_list.append("all")
+    chain_df_list.append(total_df)
+
+    return pd.concat(chain_df_list, keys=chain_list, axis=1)
+
+
+def baseline(protocols: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    slug_df_list = [baseline_protocol_tvl_df(protocol) for protocol in protocols.values()]
+    total_slugs_df = pd.concat(slug_df_list, keys=list(protocols), axis=1)
+    return total_slugs_df.sort_index()
+
+
+def best_time(func, protocols: Dict[str, Dict[str, Any]], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        # The baseline flattens token dicts in place, give every run a fresh payload
+        fresh = copy.deepcopy(protocols)
+        start = time.perf_counter()
+        func(fresh)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="recorded DeFiLlama /protocol/{slug} JSON")
+    parser.add_argument("--protocols", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--memory-protocols", type=int, default=40)
+    args = parser.parse_args()
+
+    protocols = {f"protocol-{i}": payloads.load_protocol(args.payload, seed=i)
+                 for i in range(args.protocols)}
+    expected = baseline(copy.deepcopy(protocols))
+    result = helpers.protocols_tvl_df(protocols)
+    pd.testing.assert_frame_equal(expected, result, check_dtype=False)
+
+    print(f"{len(protocols)} protocols, {result.shape[0]} rows, {result.shape[1]} columns")
+    timings = {}
+    for name, func in [("concat/join per chain", baseline),
+                       ("protocols_tvl_df", helpers.protocols_tvl_df)]:
+        timings[name] = best_time(func, protocols, args.repeat)
+        print(f"{name:<25} {timings[name] * 1e3:8.1f} ms")
+    speedup = timings["concat/join per chain"] / timings["protocols_tvl_df"]
+    print(f"speedup: {speedup:.1f}x")
+
+    # Protocols launched on different days, as in a request for many protocols
+    protocols = {f"protocol-{i}": payloads.synthetic_protocol(
+                     num_days=1500 - 35 * i, num_chains=3, num_tokens=10, seed=i,
+                     launch_day=35 * i)
+                 for i in range(args.memory_protocols)}
+    print(f"\n{len(protocols)} protocols launched over "
+          f"{35 * (args.memory_protocols - 1)} days")
+    for output in helpers.TVL_OUTPUTS:
+        tracemalloc.start()
+        result = helpers.protocols_tvl_df(protocols, output=output)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        size = result.memory_usage(deep=True).sum()
+        print(f"{output:<6} {str(result.shape):>14}  result {size / 2**20:7.1f} MiB  "
+              f"peak {peak / 2**20:7.1f} MiB")
+
+    # A 7 day window of four years of history
+    protocols = {f"protocol-{i}": payloads.synthetic_protocol(num_days=1460, seed=i)
+                 for i in range(args.protocols)}
+    start_date, end_date = "2022-12-01", "2022-12-07"
+
+    def filter_full():
+        return utils.time_filter_df(helpers.protocols_tvl_df(protocols),
+                                    start_date=start_date, end_date=end_date)
+
+    def push_down():
+        start, end = helpers.date_window(start_date, end_date)
+        return helpers.protocols_tvl_df(
+            {slug: helpers.window_protocol(protocol, start, end)
+             for slug, protocol in protocols.items()})
+
+    print(f"\n{len(protocols)} protocols, 1460 days, window {start_date} to {end_date}")
+    for name, build in [("time_filter_df", filter_full), ("date window", push_down)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<15} {str(result.shape):>12} {elapsed * 1e3:8.1f} ms  "
+              f"peak {peak / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Benchmark 'utils.flatten_to_dataframe' against convert_flatten + from_dict.
+
+Usage:
+    python -m benchmarks.flatten_benchmark [--payload recorded.json] [--repeat 5]
+"""
+import argparse
+import timeit
+
+import pandas as pd
+
+from benchmarks import payloads
+from pycaw.messari import utils
+
+
+def baseline(response_data):
+    flat = {key: utils.convert_flatten(value) for key, value in response_data.items()}
+    return pd.DataFrame.from_dict(flat, orient="index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="recorded asset metrics JSON")
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    response_data = payloads.load_asset_metrics(args.payload, num_assets=args.assets)
+    expected = baseline(response_data)
+    result = utils.flatten_to_dataframe(response_data)
+    pd.testing.assert_frame_equal(expected.loc[result.index], result)
+
+    print(f"{len(response_data)} records, {result.shape[1]} columns")
+    timings = {}
+    for name, func in [("convert_flatten + from_dict", baseline),
+                       ("flatten_to_dataframe", utils.flatten_to_dataframe)]:
+        best = min(timeit.repeat(lambda: func(response_data), number=1, repeat=args.repeat))
+        timings[name] = best
+        print(f"{name:<30} {best * 1e3:8.1f} ms")
+    speedup = timings["convert_flatten + from_dict"] / timings["flatten_to_dataframe"]
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""Benchmark the JSON backends DataLoader can decode responses with.
+
+Usage:
+    python -m benchmarks.json_benchmark [--payload recorded_protocol.json] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+
+from benchmarks import payloads
+from pycaw.messari import json_decoding
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="recorded DeFiLlama /protocol/{slug} JSON")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    content = json.dumps(payloads.load_protocol(args.payload)).encode()
+    print(f"payload: {len(content) / 2**20:.1f} MiB")
+    backends = ["json"] + (["orjson"] if json_decoding.orjson is not None else [])
+    timings = {}
+    for backend in backends:
+        decode = json_decoding.get_decoder(backend)
+        best = min(timeit.repeat(lambda: decode(content), number=1, repeat=args.repeat))
+        timings[backend] = best
+        print(f"{backend:<8} {best * 1e3:8.1f} ms {len(content) / best / 2**20:8.1f} MiB/s")
+    if "orjson" in timings:
+        print(f"speedup: {timings['json'] / timings['orjson']:.1f}x")
+    else:
+        print("orjson not installed, only the stdlib backend was measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Recorded or synthetic provider payloads used by the benchmarks.
+
+Each loader reads a recorded JSON payload when a path is given and otherwise
+generates a synthetic payload with the same nesting as the real endpoint, so
+the benchmarks also run offline and without API keys.
+"""
+import json
+import random
+from typing import Any, Dict, List, Optional
+
+METRIC_SECTIONS: Dict[str, int] = {
+    "market_data": 12, "marketcap": 8, "supply": 10, "blockchain_stats_24_hours": 14,
+    "market_data_liquidity": 6, "all_time_high": 6, "cycle_low": 5,
+    "token_sale_stats": 8, "staking_stats": 6, "mining_stats": 9,
+    "developer_activity": 7, "roi_data": 6, "roi_by_year": 12, "risk_metrics": 10,
+    "misc_data": 12, "lend_rates": 4, "borrow_rates": 4, "loan_data": 4,
+    "reddit": 2, "on_chain_data": 40, "exchange_flows": 30, "alert_messages": 0,
+}
+
+
+def _section(rng: random.Random, name: str, width: int) -> Optional[Dict[str, Any]]:
+    if width == 0 or rng.random() < 0.1:  # Some sections are null for some assets
+        return None
+    section: Dict[str, Any] = {}
+    for i in range(width):
+        if i % 5 == 4:
+            section[f"{name}_group_{i}"] = {
+                "open": rng.random(), "high": rng.random(), "low": rng.random(),
+                "close": rng.random(), "volume": rng.random() * 1e9}
+        else:
+            section[f"{name}_{i}"] = rng.random() * 1e6 if rng.random() > 0.05 else None
+    return section
+
+
+def synthetic_asset_metrics(num_assets: int = 500, seed: int = 0) -> Dict[str, Dict]:
+    """Asset metrics payloads keyed by slug, shaped like /v1/assets/{slug}/metrics."""
+    rng = random.Random(seed)
+    payload = {}
+    for i in range(num_assets):
+        slug = f"asset-{i}"
+        record: Dict[str, Any] = {"id": f"id-{i}", "symbol": f"A{i}", "name": slug,
+                                  "slug": slug, "contract_addresses": None}
+        for name, width in METRIC_SECTIONS.items():
+            record[name] = _section(rng, name, width)
+        payload[slug] = record
+    return payload
+
+
+def load_asset_metrics(path: Optional[str] = None, num_assets: int = 500) -> Dict[str, Dict]:
+    """Recorded asset metrics keyed by slug, or a synthetic stand-in.
+
+    A recording may be a {slug: data} mapping or a raw get_all_assets response
+    ({"data": [...]}).
+    """
+    if path is None:
+        return synthetic_asset_metrics(num_assets)
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+        payload = {asset["slug"]: asset for asset in payload["data"]}
+    return payload
+
+
+def synthetic_timeseries(num_assets: int = 200, num_points: int = 2016,
+                         interval_ms: int = 60_000, seed: int = 0) -> Dict[str, Dict]:
+    """Flattened price timeseries responses keyed by slug, with ragged histories."""
+    rng = random.Random(seed)
+    end = 1_640_995_200_000
+    payload = {}
+    for i in range(num_assets):
+        length = num_points - rng.randrange(0, num_points // 4)
+        start = end - (length - 1) * interval_ms
+        values: List[List] = [
+            [start + j * interval_ms, rng.random(), rng.random(), rng.random(),
+             rng.random(), rng.random() * 1e6]
+            for j in range(length)]
+        payload[f"asset-{i}"] = {
+            "parameters_columns": ["timestamp", "open", "high", "low", "close", "volume"],
+            "values": values}
+    return payload
+
+
+def synthetic_protocol(num_days: int = 1000, num_chains: int = 5, num_tokens: int = 20,
+                       seed: int = 0, launch_day: int = 0) -> Dict[str, Any]:
+    """A DeFiLlama /protocol/{slug} response with daily points per chain and token.
+
+    Like the real endpoint, the latest day appears twice (the daily close and
+    the current value) and tokens start at different dates. The history starts
+    launch_day days after 2019-01-01.
+    """
+    rng = random.Random(seed)
+    start = 1_546_300_800 + launch_day * 86400  # 2019-01-01
+    dates = [start + day * 86400 for day in range(num_days)]
+    dates.append(dates[-1] + 3600)  # Current value, same calendar day as the last close
+    symbols = [f"TOKEN{i}" for i in range(num_tokens)]
+    listed = {symbol: rng.randrange(0, num_days // 2) for symbol in symbols}
+
+    def series(scale: float):
+        tvl = [{"date": date, "totalLiquidityUSD": rng.random() * scale} for date in dates]
+        tokens, tokens_usd = [], []
+        for day, date in enumerate(dates):
+            held = [symbol for symbol in symbols if listed[symbol] <= day]
+            tokens.append({"date": date, "tokens": {s: rng.random() * 1e6 for s in held}})
+            tokens_usd.append({"date": date, "tokens": {s: rng.random() * 1e7 for s in held}})
+        return {"tvl": tvl, "tokens": tokens, "tokensInUsd": tokens_usd}
+
+    chains = [f"Chain{i}" for i in range(num_chains)]
+    protocol: Dict[str, Any] = {"name": "Synthetic", "chains": chains,
+                                "chainTvls": {chain: series(1e9) for chain in chains}}
+    protocol.update(series(num_chains * 1e9))
+    return protocol
+
+
+def load_protocol(path: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    """Recorded DeFiLlama /protocol/{slug} response, or a synthetic stand-in.
+
+    kwargs are passed to synthetic_protocol and ignored for recordings.
+    """
+    if path is None:
+        return synthetic_protocol(**kwargs)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+CHAINS = ["Ethereum", "Arbitrum", "Optimism", "Polygon", "BSC", "Avalanche", "Base",
+          "Solana", "Fantom", "Tron"]
+CATEGORIES = ["Dexes", "Lending", "Liquid Staking", "Bridge", "CDP", "Yield", "Derivatives",
+              "Services"]
+
+
+def synthetic_protocols(num_protocols: int = 3000, seed: int = 0) -> List[Dict[str, Any]]:
+    """A DeFiLlama /protocols response, one listing per protocol with per chain TVL."""
+    rng = random.Random(seed)
+    protocols = []
+    for i in range(num_protocols):
+        chains = rng.sample(CHAINS, rng.randint(1, 4))
+        chain_tvls = {chain: rng.lognormvariate(14, 3) for chain in chains}
+        protocols.append({
+            "id": str(i), "name": f"Protocol {i}", "slug": f"protocol-{i}",
+            "symbol": f"P{i}", "url": f"https://protocol-{i}.example",
+            "chain": chains[0] if len(chains) == 1 else "Multi-Chain", "chains": chains,
+            "category": rng.choice(CATEGORIES), "tvl": sum(chain_tvls.values()),
+            "chainTvls": chain_tvls, "change_1h": rng.gauss(0, 1),
+            "change_1d": rng.gauss(0, 3), "change_7d": None if i % 7 == 0 else rng.gauss(0, 8),
+            "mcap": rng.lognormvariate(16, 2) if i % 3 else None,
+            "listedAt": 1_600_000_000 + i * 3600,
+        })
+    return protocols
+
+
+def load_protocols(path: Optional[str] = None, **kwargs) -> List[Dict[str, Any]]:
+    """Recorded DeFiLlama /protocols response, or a synthetic stand-in."""
+    if path is None:
+        return synthetic_protocols(**kwargs)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthetic_event_logs(num_logs: int = 1000, seed: int = 0) -> List[Dict[str, Any]]:
+    """The 'result' of an Etherscan module=logs&action=getLogs response."""
+    rng = random.Random(seed)
+    return [{
+        "address": "0x" + "ab" * 20,
+        "topics": ["0x" + f"{rng.getrandbits(256):064x}" for _ in range(3)],
+        "data": "0x" + f"{rng.getrandbits(256):064x}",
+        "blockNumber": hex(15_000_000 + i // 4), "timeStamp": hex(1_650_000_000 + i * 3),
+        "gasPrice": hex(rng.randrange(10**9, 10**11)), "gasUsed": hex(rng.randrange(21000, 10**6)),
+        "logIndex": hex(i % 4), "transactionHash": "0x" + f"{rng.getrandbits(256):064x}",
+        "transactionIndex": hex(i % 200),
+    } for i in range(num_logs)]
+
+
+def synthetic_cmc_map(num_coins: int = 5000, seed: int = 0) -> List[Dict[str, Any]]:
+    """The 'data' of a CoinMarketCap /v1/cryptocurrency/map response."""
+    rng = random.Random(seed)
+    return [{
+        "id": i + 1, "rank": i + 1, "name": f"Coin {i}", "symbol": f"C{i}",
+        "slug": f"coin-{i}", "is_active": 1,
+        "first_historical_data": "2019-01-01T00:00:00.000Z",
+        "last_historical_data": "2022-06-01T00:00:00.000Z",
+        "platform": None if i % 3 else {"id": 1027, "name": "Ethereum", "symbol": "ETH",
+                                        "slug": "ethereum",
+                                        "token_address": "0x" + f"{rng.getrandbits(160):040x}"},
+    } for i in range(num_coins)]
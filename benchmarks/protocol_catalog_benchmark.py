@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Benchmark ProtocolCatalog lookups against filtering the get_protocols frame.
+
+Usage:
+    python -m benchmarks.protocol_catalog_benchmark [--payload recorded_protocols.json]
+        [--repeat 200]
+"""
+import argparse
+import time
+import timeit
+
+import pandas as pd
+from typing import Any, Dict, List
+
+from benchmarks import payloads
+from pycaw.defillama.protocol_catalog import ProtocolCatalog
+
+
+def baseline(protocols: List[Dict[str, Any]]) -> List[str]:
+    """Arbitrum lending protocols above $10M on Arbitrum, from the get_protocols frame."""
+    protocols_df = pd.DataFrame({protocol["slug"]: protocol for protocol in protocols})
+    return [slug for slug, protocol in protocols_df.items()
+            if "Arbitrum" in protocol["chains"] and protocol["category"] == "Lending"
+            and protocol["chainTvls"]["Arbitrum"] >= 10e6]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="recorded DeFiLlama /protocols JSON")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    protocols = payloads.load_protocols(args.payload)
+    start = time.perf_counter()
+    catalog = ProtocolCatalog.from_protocols(protocols)
+    build = time.perf_counter() - start
+    expected = baseline(protocols)
+    assert catalog.find(chain="Arbitrum", category="Lending", min_tvl=10e6) == expected
+
+    print(f"{len(catalog)} protocols, catalog built in {build * 1e3:.1f} ms")
+    frame_time = min(timeit.repeat(lambda: baseline(protocols), number=1, repeat=5))
+    print(f"{'get_protocols frame':<22} {frame_time * 1e6:10.1f} us")
+    lookups = {
+        "find": lambda: catalog.find(chain="Arbitrum", category="Lending", min_tvl=10e6),
+        "query": lambda: catalog.query(chain="Arbitrum", category="Lending", min_tvl=10e6),
+        "get": lambda: catalog.get("protocol-42"),
+    }
+    for name, lookup in lookups.items():
+        best = min(timeit.repeat(lookup, number=1, repeat=args.repeat))
+        print(f"{'catalog.' + name:<22} {best * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
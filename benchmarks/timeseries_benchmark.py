@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Benchmark 'helpers.timeseries_to_dataframe' against the per-asset concat builder.
+
+Reports the best wall time and the peak traced memory of each builder.
+
+Usage:
+    python -m benchmarks.timeseries_benchmark [--assets 200] [--points 2016] [--repeat 5]
+"""
+import argparse
+import timeit
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks import payloads
+from pycaw.messari import helpers
+
+
+def peak_memory(func, response_data) -> int:
+    tracemalloc.start()
+    try:
+        result = func(response_data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--points", type=int, default=2016)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    response_data = payloads.synthetic_timeseries(args.assets, args.points)
+    expected = helpers._timeseries_to_dataframe_concat(response_data)
+    result = helpers.timeseries_to_dataframe(response_data)
+    pd.testing.assert_frame_equal(expected, result, check_freq=False)
+
+    print(f"{len(response_data)} assets, {result.shape[0]} rows, {result.shape[1]} columns")
+    builders = [
+        ("from_records + concat", helpers._timeseries_to_dataframe_concat),
+        ("preallocated float64", helpers.timeseries_to_dataframe),
+        ("preallocated float32",
+         lambda data: helpers.timeseries_to_dataframe(data, dtype="float32")),
+    ]
+    timings = {}
+    for name, func in builders:
+        best = min(timeit.repeat(lambda: func(response_data), number=1, repeat=args.repeat))
+        timings[name] = best
+        peak = peak_memory(func, response_data)
+        print(f"{name:<25} {best * 1e3:8.1f} ms {peak / 2**20:8.1f} MiB peak")
+    speedup = timings["from_records + concat"] / timings["preallocated float64"]
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark 'helpers.tvl_decomposition' against the per-chain clean_tvl_data
+of the tvl_monitor example, on one protocol and on a batch of protocols.
+
+Usage:
+    python -m benchmarks.tvl_decomposition_benchmark [--payload recorded_protocol.json]
+        [--protocols 50] [--repeat 5]
+"""
+import argparse
+import timeit
+
+import pandas as pd
+
+from benchmarks import payloads
+from pycaw.defillama import helpers
+
+
+def baseline_clean_tvl_data(protocol_df: pd.DataFrame) -> pd.DataFrame:
+    """clean_tvl_data of 'pycaw/messari/examples/tvl_monitor.py', on (chain, asset)
+    columns. The '_usd' suffix is stripped instead of cutting names at the
+    first underscore, and chains keep their input order."""
+    chains = list(dict.fromkeys(protocol_df.columns.get_level_values(0)))
+    chain_dfs = []
+    for chain in chains:
+        chain_df = protocol_df[chain]
+        chain_df = chain_df[[x for x in chain_df.columns if x.endswith("_usd")]].copy()
+        if len(chain_df.columns) > 9:
+            # Calculate top 10 protocols by TVL and sum the rest as other
+            current_tvl = chain_df.iloc[-1].fillna(0)
+            cols_to_keep = list(current_tvl.sort_values(ascending=False, kind="stable")
+                                .index[:9])
+            cols_to_sum_as_other = [x for x in chain_df.columns if x not in cols_to_keep]
+            chain_df["Other"] = chain_df[cols_to_sum_as_other].sum(axis=1)
+            chain_df = chain_df[cols_to_keep + ["Other"]]
+        chain_df = chain_df.interpolate(method="linear", limit_direction="forward", axis=0)
+        chain_df.columns = [x[:-len("_usd")] if x.endswith("_usd") else x
+                            for x in chain_df.columns]
+        chain_dfs.append(chain_df)
+    return pd.concat(chain_dfs, keys=chains, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="recorded DeFiLlama /protocol/{slug} JSON")
+    parser.add_argument("--protocols", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    protocol_df = helpers.protocol_tvl_df(payloads.load_protocol(
+        args.payload, num_days=1500, num_chains=8, num_tokens=40))
+    batch = [helpers.protocol_tvl_df(payloads.synthetic_protocol(
+        num_days=700, num_chains=4, num_tokens=25, seed=seed)) for seed in range(args.protocols)]
+    pd.testing.assert_frame_equal(baseline_clean_tvl_data(protocol_df),
+                                  helpers.tvl_decomposition(protocol_df))
+
+    for label, frames in (("one protocol", [protocol_df]),
+                          (f"{args.protocols} protocols", batch)):
+        timings = {}
+        for name, func in (("clean_tvl_data", baseline_clean_tvl_data),
+                           ("tvl_decomposition", helpers.tvl_decomposition)):
+            timings[name] = min(timeit.repeat(lambda: [func(df) for df in frames],
+                                              number=1, repeat=args.repeat))
+            print(f"{label:<14} {name:<18} {timings[name] * 1e3:9.1f} ms")
+        print(f"{label:<14} speedup: {timings['clean_tvl_data'] / timings['tvl_decomposition']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
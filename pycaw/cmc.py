@@ -2,26 +2,92 @@
 
 Classes:
     CoinMarketCapAPI
+    CmcIdMapIndex
     CoinMarketCapEndpoint
 """
 import requests
 from requests import exceptions
+from requests.adapters import HTTPAdapter
 import os
 import json
 import logging
-from typing import Any, Dict, List, Optional, Sequence, Union
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 
 # https://pro-api.coinmarketcap.com/v1/cryptocurrency/map
 
+# The quotes/info endpoints take any number of ids, a request is only bounded
+# by the length of its URL. CMC bills 1 call credit per 100 ids returned, so
+# larger requests save round trips but not credits.
+MAX_URL_LENGTH = 2048
+# An id costs its digits plus a percent-encoded comma in the query string
+_ID_SEPARATOR_LENGTH = len("%2C")
+# Maximum 'limit' of the map endpoint
+ID_MAP_PAGE_SIZE = 5000
+# Symbols the map endpoint knows under another symbol
+DEFAULT_SYMBOL_ALIASES: Dict[str, str] = {"EWTB": "EWT"}
+
+
 class CoinMarketCapAPI:
     """Python connector the Coin Market Cap API.
 
+    Requests go through one pooled requests.Session, so connections are
+    reused across calls. Close it with close() or use the connector as a
+    context manager.
+
+    Args:
+        api_key (Optional[str]): API key, defaults to the
+            COINMARKETCAP_API_KEY environment variable.
+        max_workers (int): Maximum number of requests in flight for batch
+            methods, also the size of the connection pool.
+        id_map_path (Optional[str]): JSON file the id_map index is loaded
+            from and saved to. Kept in memory only if not given.
+        symbol_aliases (Optional[Dict[str, str]]): Symbol aliases of the
+            id_map index, defaults to DEFAULT_SYMBOL_ALIASES.
+
     Attributes:
         API_KEY (str)
+        session (requests.Session)
+        id_map (CmcIdMapIndex)
     """
 
     endpoint_preamble: str = "" # TODO
-    API_KEY: str = os.environ["COINMARKETCAP_API_KEY"]
+    API_KEY: Optional[str] = os.environ.get("COINMARKETCAP_API_KEY")
+
+    def __init__(self, 
+                 api_key: Optional[str] = None, 
+                 max_workers: int = 4,
+                 id_map_path: Optional[str] = None,
+                 symbol_aliases: Optional[Dict[str, str]] = None):
+        if api_key is not None:
+            self.API_KEY = api_key
+        self.max_workers = max_workers
+        self.id_map_path = id_map_path
+        self.symbol_aliases = symbol_aliases
+        self._id_map: Optional[CmcIdMapIndex] = None
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accepts": "application/json",
+            "Accept-Encoding": "deflate, gzip",
+            "X-CMC_PRO_API_KEY": self.API_KEY or ""})
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "CoinMarketCapAPI":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self):
+        session = getattr(self, "session", None)
+        if session is not None:
+            session.close()
 
     def run_query(self, 
                   endpoint: str, 
@@ -29,24 +95,14 @@ class CoinMarketCapAPI:
         """Note, Etherscan restricts the token_info query to 2 calls per second.
         
         Args: 
-            endpoint (str): URL/API endpoint to query with `Requests.request.get()`
-            params (Dict[str, str]): TODO
+            endpoint (str): URL/API endpoint to query with the pooled session
+            params (Dict[str, str]): Query parameters
         
         Returns: 
             (dict): Component of the Requests.Response object
         """
-
-        headers = {
-            "Accepts": "application/json", 
-            "Accept-Encoding": "deflate, gzip",
-            "X-CMC_PRO_API_KEY": self.API_KEY}
-
-        session = requests.Session()
-        session.headers.update(headers)
-
         try:
-            response: requests.Response = session.get(
-                endpoint, headers=headers, params=params)
+            response: requests.Response = self.session.get(endpoint, params=params)
             if response and response.ok:
                 return response.json()
             else:
@@ -57,51 +113,193 @@ class CoinMarketCapAPI:
         except (exceptions.ConnectionError, 
                 exceptions.Timeout, 
                 exceptions.TooManyRedirects) as e:
-            logging.exception("\n".join([
-                f"ConnectionError: {e[0]}", f"Timeout: {e[1]}", 
-                f"TooManyRedirects: {e[2]}"]))
+            logging.exception(f"{type(e).__name__}: {e}")
             raise # Raise so retry can retry
         except Exception as e:
             logging.exception(f"Exception raised: {e}")
             raise # Raise so retry can retry
+
+    def _query_by_ids(self,
+                      endpoint: str,
+                      ids: Sequence[int],
+                      params: Optional[Dict[str, str]] = None,
+                      chunk_size: Optional[int] = None) -> Dict[int, dict]:
+        """Queries an endpoint taking a comma-separated 'id' list, in concurrent
+        chunks whose URLs fit in MAX_URL_LENGTH, of at most chunk_size ids.
+
+        Returns:
+            (Dict[int, dict]): 'data' entries of all chunks keyed by CMC id
+        """
+        unique_ids: List[int] = list(dict.fromkeys(int(id_) for id_ in ids))
+        base_params = dict(params or {}, id="", skip_invalid="true")
+        base_url = requests.Request("GET", endpoint, params=base_params).prepare().url
+        chunks = _id_chunks(unique_ids, MAX_URL_LENGTH - len(base_url), chunk_size)
+
+        def query(chunk: List[int]) -> Dict[str, dict]:
+            chunk_params = dict(base_params, id=",".join(map(str, chunk)))
+            return self.run_query(endpoint=endpoint, params=chunk_params)["data"]
+
+        if len(chunks) <= 1 or self.max_workers <= 1:
+            results = [query(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                results = list(executor.map(query, chunks))
+        return {int(id_): entry for data in results for id_, entry in data.items()}
+
+    def quotes_latest(self,
+                      ids: Sequence[int],
+                      convert: str = "USD",
+                      chunk_size: Optional[int] = None) -> pd.DataFrame:
+        """Latest market quotes of many cryptocurrencies.
+
+        Docs: https://coinmarketcap.com/api/documentation/v1/#operation/getV1CryptocurrencyQuotesLatest
+
+        Args:
+            ids (Sequence[int]): CMC ids, i.e. [1, 1027]. Invalid ids are skipped.
+            convert (str): Comma-separated quote currencies. Defaults to "USD".
+            chunk_size (Optional[int]): Maximum ids per request. By default
+                requests take as many ids as fit in MAX_URL_LENGTH.
+
+        Returns:
+            (pd.DataFrame): One row per CMC id. Quote fields are flattened
+                into "{currency}_{field}" columns, i.e. "USD_price".
+        """
+        endpoint = CoinMarketCapEndpoint(category="cryptocurrency", path="quotes/latest")
+        data = self._query_by_ids(endpoint, ids, dict(convert=convert), chunk_size)
+        records = []
+        for entry in data.values():
+            record = {key: value for key, value in entry.items() if key != "quote"}
+            for currency, quote in (entry.get("quote") or {}).items():
+                record.update({f"{currency}_{field}": value
+                               for field, value in quote.items()})
+            records.append(record)
+        return _id_indexed_df(records)
+
+    def metadata(self,
+                 ids: Sequence[int],
+                 chunk_size: Optional[int] = None) -> pd.DataFrame:
+        """Static metadata (description, logo, urls, tags, ...) of many cryptocurrencies.
+
+        Docs: https://coinmarketcap.com/api/documentation/v1/#operation/getV1CryptocurrencyInfo
+
+        Args:
+            ids (Sequence[int]): CMC ids. Invalid ids are skipped.
+            chunk_size (Optional[int]): Maximum ids per request. By default
+                requests take as many ids as fit in MAX_URL_LENGTH.
+
+        Returns:
+            (pd.DataFrame): One row per CMC id.
+        """
+        endpoint = CoinMarketCapEndpoint(category="cryptocurrency", path="info")
+        return _id_indexed_df(list(self._query_by_ids(endpoint, ids, None, chunk_size)
+                                   .values()))
+
+    def quotes_with_metadata(self,
+                             ids: Sequence[int],
+                             convert: str = "USD",
+                             chunk_size: Optional[int] = None) -> pd.DataFrame:
+        """Latest quotes joined with metadata on the CMC id, the quote and
+        metadata requests running concurrently.
+
+        Returns:
+            (pd.DataFrame): quotes_latest columns, then the metadata columns
+                the quotes don't have. Indexed by CMC id.
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            quotes = executor.submit(self.quotes_latest, ids, convert, chunk_size)
+            info = executor.submit(self.metadata, ids, chunk_size)
+            quotes_df, info_df = quotes.result(), info.result()
+        info_df = info_df.drop(columns=info_df.columns.intersection(quotes_df.columns))
+        return quotes_df.join(info_df, how="outer")
     
+    @property
+    def id_map(self) -> "CmcIdMapIndex":
+        """Local index of CMC id maps, loaded from id_map_path on first use."""
+        if self._id_map is None:
+            self._id_map = CmcIdMapIndex(aliases=self.symbol_aliases)
+            if self.id_map_path is not None:
+                self._id_map.load(self.id_map_path)
+        return self._id_map
+
     def cmc_id_map(self, 
                    symbols: Union[str, Sequence[str]], 
                    save: bool = False) -> List[dict]:
-        """
+        """CMC id maps of cryptocurrency symbols.
+
+        Symbols are resolved in the local id_map index. Only the symbols it
+        doesn't know are queried, in one request, and merged into it. "all"
+        refreshes the whole map instead.
+
         Docs: https://coinmarketcap.com/api/documentation/v1/#operation/getV1CryptocurrencyMap 
+
+        Args:
+            symbols (Union[str, Sequence[str]]): Symbols, i.e. ["BTC", "ETH"],
+                or "all". Aliases are applied, see CmcIdMapIndex.
+            save (bool): Write the index to id_map_path. Without one, merge
+                it into "cmc_id_maps.json", keeping the id maps saved there.
+                Defaults to False.
+
+        Returns:
+            (List[dict]): Id maps of every coin having one of the symbols, in
+                the order of the symbols, or of all coins by id for "all".
         """
-        endpoint: str = CoinMarketCapEndpoint(
-            category="cryptocurrency", path="map")
         if isinstance(symbols, str):
             symbols = [symbols]
-        assert isinstance(symbols, list)
-
-        # Query expects a comma-separated list of cryptocurrency symbols.
-        excluded_symbols = ['EWTB']
+        symbols = list(symbols)
 
-        if symbols != ["all"]:    
-            symbols: str = ",".join(symbols)
-            symbols = symbols.replace("EWTB", "EWT")
-            params: Dict[str, str] = dict(symbol=symbols)
+        if symbols == ["all"]:
+            self.refresh_id_map()
+            cmc_id_maps = self.id_map.to_list()
         else:
-            params = {}
-
-        cmc_id_maps: List[dict] = self.run_query(
-            endpoint=endpoint, params=params)["data"]
+            missing = self.id_map.missing(symbols)
+            if missing:
+                # Query expects a comma-separated list of cryptocurrency symbols.
+                self.id_map.merge(self.run_query(
+                    endpoint=CoinMarketCapEndpoint(category="cryptocurrency", path="map"),
+                    params=dict(symbol=",".join(missing)))["data"])
+            cmc_id_maps = [map_ for symbol in dict.fromkeys(symbols)
+                           for map_ in self.id_map.by_symbol(symbol)]
 
         if save: 
-            self._save_cmc_id_maps(cmc_id_maps=cmc_id_maps)
+            if self.id_map_path is None:
+                # The index didn't load the file, merge into it to keep its id maps
+                self._save_cmc_id_maps(cmc_id_maps=self.id_map.to_list())
+            else:
+                self.id_map.save(self.id_map_path)
 
         return cmc_id_maps
+
+    def refresh_id_map(self, 
+                       listing_status: str = "active", 
+                       page_size: int = ID_MAP_PAGE_SIZE) -> int:
+        """Fetches the full CMC id map page by page and merges it into id_map.
+
+        Args:
+            listing_status (str): "active", "inactive" or "untracked", or a
+                comma-separated combination. Defaults to "active".
+            page_size (int): Id maps per request, at most 5000.
+
+        Returns:
+            (int): Number of id maps that were added or changed.
+        """
+        endpoint = CoinMarketCapEndpoint(category="cryptocurrency", path="map")
+        changed = 0
+        start = 1
+        while True:
+            page: List[dict] = self.run_query(endpoint=endpoint, params=dict(
+                listing_status=listing_status, start=start, limit=page_size,
+                sort="id"))["data"]
+            changed += self.id_map.merge(page)
+            if len(page) < page_size:
+                return changed
+            start += page_size
     
     def _save_cmc_id_maps(self, 
                           cmc_id_maps: List[dict], 
                           filename: Optional[str] = None, 
                           save_dir: Optional[str] = None) -> None:
-        cmc_id_maps: List[dict] = sorted(
-            cmc_id_maps, key=lambda dict_: dict_["id"])
-
+        """Merges id maps into a saved id map file, keyed by id, the given
+        id maps replacing saved ones with the same id."""
         if filename is None:
             filename = "cmc_id_maps.json"
         if filename[-5:] != ".json":
@@ -109,23 +307,120 @@ class CoinMarketCapAPI:
         
         if save_dir:
             if not os.path.exists(save_dir):
-                raise ValueError("")
+                raise ValueError(f"Save directory {save_dir} doesn't exist.")
             save_path: str = os.path.join(save_dir, filename)
         else:
             save_path = filename
 
-        if os.path.exists(save_path):
-            with open(file=save_path, mode="r") as f:
-                current_cmc_id_maps = json.load(f)
-                if current_cmc_id_maps is None:
-                    current_cmc_id_maps = {}
-            for map_ in current_cmc_id_maps:
-                if map_ not in cmc_id_maps:
-                    cmc_id_maps.append(map_)
-        cmc_id_maps_json: List[dict] = cmc_id_maps
-        
-        with open(save_path, "w") as f:
-            json.dump(cmc_id_maps_json, f, indent=3)
+        index = CmcIdMapIndex(aliases=self.symbol_aliases)
+        index.load(save_path)
+        index.merge(cmc_id_maps)
+        index.save(save_path)
+
+
+class CmcIdMapIndex:
+    """In-memory index of CMC id maps, keyed by id, with secondary indexes by
+    symbol and by slug.
+
+    Several coins can share a symbol, so a symbol resolves to a list of id
+    maps. Lookups and merges are dict operations, merging N id maps is O(N).
+    Saved as the JSON list of id maps the map endpoint returns, sorted by id.
+
+    Args:
+        cmc_id_maps (Iterable[dict]): Optional initial id maps.
+        aliases (Dict[str, str]): Symbols to look up under another symbol,
+            i.e. {"EWTB": "EWT"}. Defaults to DEFAULT_SYMBOL_ALIASES.
+
+    Attributes:
+        aliases (Dict[str, str])
+    """
+
+    def __init__(self,
+                 cmc_id_maps: Iterable[dict] = (),
+                 aliases: Optional[Dict[str, str]] = None):
+        self.aliases: Dict[str, str] = {
+            symbol.upper(): alias.upper() for symbol, alias in
+            (DEFAULT_SYMBOL_ALIASES if aliases is None else aliases).items()}
+        self._by_id: Dict[int, dict] = {}
+        self._by_symbol: Dict[str, Dict[int, None]] = {}
+        self._by_slug: Dict[str, int] = {}
+        self.merge(cmc_id_maps)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, id_: int) -> bool:
+        return id_ in self._by_id
+
+    def merge(self, cmc_id_maps: Iterable[dict]) -> int:
+        """Adds id maps, replacing indexed ones with the same id.
+
+        Returns:
+            (int): Number of id maps that were added or changed.
+        """
+        changed = 0
+        for map_ in cmc_id_maps:
+            id_ = int(map_["id"])
+            current = self._by_id.get(id_)
+            if current == map_:
+                continue
+            if current is not None:
+                self._unindex(id_, current)
+            self._by_id[id_] = map_
+            self._by_symbol.setdefault(map_["symbol"].upper(), {})[id_] = None
+            self._by_slug[map_["slug"]] = id_
+            changed += 1
+        return changed
+
+    def _unindex(self, id_: int, map_: dict) -> None:
+        ids = self._by_symbol[map_["symbol"].upper()]
+        del ids[id_]
+        if not ids:
+            del self._by_symbol[map_["symbol"].upper()]
+        if self._by_slug.get(map_["slug"]) == id_:
+            del self._by_slug[map_["slug"]]
+
+    def get(self, id_: int) -> Optional[dict]:
+        """Id map of a CMC id, None if it isn't indexed"""
+        return self._by_id.get(int(id_))
+
+    def by_slug(self, slug: str) -> Optional[dict]:
+        """Id map of a slug, i.e. "bitcoin", None if it isn't indexed"""
+        id_ = self._by_slug.get(slug)
+        return None if id_ is None else self._by_id[id_]
+
+    def by_symbol(self, symbol: str) -> List[dict]:
+        """Id maps of the coins having a symbol (or its alias), by id"""
+        symbol = symbol.upper()
+        ids = self._by_symbol.get(self.aliases.get(symbol, symbol), ())
+        return [self._by_id[id_] for id_ in sorted(ids)]
+
+    def missing(self, symbols: Iterable[str]) -> List[str]:
+        """Symbols, after aliasing, that no indexed id map has"""
+        aliased = (self.aliases.get(symbol.upper(), symbol.upper()) for symbol in symbols)
+        return [symbol for symbol in dict.fromkeys(aliased) if symbol not in self._by_symbol]
+
+    def to_list(self) -> List[dict]:
+        """Id maps sorted by id"""
+        return [self._by_id[id_] for id_ in sorted(self._by_id)]
+
+    def load(self, path: str) -> int:
+        """Merges the id maps saved in a JSON file, if it exists.
+
+        Returns:
+            (int): Number of id maps that were added or changed.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return self.merge(json.load(f) or [])
+
+    def save(self, path: str) -> None:
+        """Atomically writes the id maps sorted by id to a JSON file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_list(), f, indent=3)
+        os.replace(tmp_path, path)
 
 
 class CoinMarketCapEndpoint(str): 
@@ -155,14 +450,17 @@ class CoinMarketCapEndpoint(str):
             like OHLCV data or data for use in charting libraries.
         info: Metadata. Cryptocurrency and exchange metadata like block explorer
             URLs and logos.
-        map: ID maps. Utility endpoints to get a map of resources to 
+        map: ID maps. Utility endpoints to get a map of resources to
             CoinMarketCap IDs.
+        quotes/latest: Latest market quotes of one or more resources by id.
+        listings/latest: Latest market data of all active resources, paginated.
     """
 
     endpoint_categories: List[str] = [
         "cryptocurrency", "exchange", "global-metrics", "tools", "blockchain", 
         "fiat", "partners", "key"]
-    endpoint_paths: List[str] = ["latest", "historical", "info", "map"]
+    endpoint_paths: List[str] = [
+        "latest", "historical", "info", "map", "quotes/latest", "listings/latest"]
     preamble_v1: str = "https://pro-api.coinmarketcap.com/v1"
 
     def __new__(cls, category: str, path: str) -> str:
@@ -173,4 +471,31 @@ class CoinMarketCapEndpoint(str):
 
         url_components = [cls.preamble_v1, category, path]
         url = "/".join(url_components)
-        return url
\ No newline at end of file
+        return url
+
+
+def _id_chunks(ids: List[int], max_length: int,
+               chunk_size: Optional[int] = None) -> List[List[int]]:
+    """Splits ids into chunks whose comma-separated lists are at most
+    max_length long once URL-encoded, and at most chunk_size ids long."""
+    chunks: List[List[int]] = []
+    chunk: List[int] = []
+    length = 0
+    for id_ in ids:
+        id_length = len(str(id_)) + _ID_SEPARATOR_LENGTH
+        if chunk and (len(chunk) == chunk_size or length + id_length > max_length):
+            chunks.append(chunk)
+            chunk, length = [], 0
+        chunk.append(id_)
+        length += id_length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _id_indexed_df(records: List[dict]) -> pd.DataFrame:
+    """DataFrame of CMC 'data' entries, indexed by their id in ascending order."""
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return pd.DataFrame(index=pd.Index([], dtype="int64", name="id"))
+    return df.set_index("id").sort_index()
@@ -5,3 +5,6 @@ DeFiLLama API Docs: https://defillama.com/docs/api
 
 
 from .defillama import *
+from .async_defillama import AsyncDeFiLlama
+from .protocol_catalog import ProtocolCatalog
+from .tvl_store import TvlHistoryStore
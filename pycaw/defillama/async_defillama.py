@@ -0,0 +1,189 @@
+"""This module is meant to contain the AsyncDeFiLlama class
+
+DeFiLLama API Docs: https://defillama.com/docs/api
+"""
+
+import asyncio
+import datetime
+import logging
+
+from pycaw.defillama import helpers
+from pycaw.defillama.defillama import DeFiLlama
+from pycaw.defillama.protocol_catalog import CatalogSnapshot
+from pycaw.messari import async_dataloader
+from pycaw.messari import dataloader
+from pycaw.messari.response_cache import ResponseCache
+from pycaw.messari import utils
+
+import pandas as pd
+from typing import Any, Union, List, Dict, AsyncIterator, Optional, Tuple
+
+
+class AsyncDeFiLlama(async_dataloader.AsyncDataLoader):
+    """asyncio wrapper around the DeFi Llama API
+
+    Methods are coroutines with the same parameters and results as their
+    DeFiLlama counterparts. Per protocol and per chain requests run
+    concurrently on the event loop.
+
+    Args:
+        max_connections (int): Maximum number of requests in flight.
+        response_cache (ResponseCache): Optional cache of responses.
+        retry_policy (RetryPolicy): Retries of transient failures.
+    """
+
+    # Same endpoints as the blocking client
+    api_urls = DeFiLlama.api_urls
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        response_cache: ResponseCache = None,
+        retry_policy: dataloader.RetryPolicy = None,
+    ):
+        async_dataloader.AsyncDataLoader.__init__(
+            self,
+            api_dict=None,
+            taxonomy_dict="messari_to_dl.json",
+            max_connections=max_connections,
+            response_cache=response_cache,
+            retry_policy=retry_policy,
+        )
+        # '/protocols' snapshot of get_current_tvl(snapshot=True)
+        self._protocol_snapshot: Optional[CatalogSnapshot] = None
+
+    async def get_protocol_tvl_timeseries(
+        self,
+        asset_slugs: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+        output: str = "wide",
+    ) -> pd.DataFrame:
+        """Returns times TVL of a protocol with token amounts as a pandas DataFrame.
+        See DeFiLlama.get_protocol_tvl_timeseries.
+        """
+        if output not in helpers.TVL_OUTPUTS:
+            raise ValueError(f"output must be one of {helpers.TVL_OUTPUTS}")
+        slugs = self.translate(asset_slugs)
+        urls = [self.api_urls["get_protocol_tvl"].format(_slug=slug) for slug in slugs]
+        protocols = await self.get_responses(urls)
+
+        start, end = helpers.date_window(start_date, end_date)
+        protocols = {slug: helpers.window_protocol(protocol, start, end)
+                     for slug, protocol in zip(slugs, protocols)}
+        return helpers.protocols_tvl_df(protocols, output=output)
+
+    async def iter_protocol_tvl_timeseries(
+        self,
+        asset_slugs: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+        output: str = "wide",
+    ) -> AsyncIterator[Tuple[str, pd.DataFrame]]:
+        """Yields (slug, DataFrame) pairs as each protocol is downloaded and parsed.
+        See DeFiLlama.iter_protocol_tvl_timeseries.
+        """
+        if output not in helpers.TVL_OUTPUTS:
+            raise ValueError(f"output must be one of {helpers.TVL_OUTPUTS}")
+        slugs = self.translate(asset_slugs)
+        start, end = helpers.date_window(start_date, end_date)
+
+        async def protocol_df(slug: str) -> Tuple[str, pd.DataFrame]:
+            endpoint_url = self.api_urls["get_protocol_tvl"].format(_slug=slug)
+            protocol = helpers.window_protocol(await self.get_response(endpoint_url), start, end)
+            return slug, helpers.protocols_tvl_df({slug: protocol}, output=output)
+
+        tasks = [asyncio.ensure_future(protocol_df(slug)) for slug in slugs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_global_tvl_timeseries(
+        self,
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+    ) -> pd.DataFrame:
+        """Returns timeseries TVL from total of all Defi Llama supported protocols.
+        See DeFiLlama.get_global_tvl_timeseries.
+        """
+        global_tvl = await self.get_response(self.api_urls["global_tvl"])
+        global_tvl = helpers.window_points(global_tvl, *helpers.date_window(start_date, end_date))
+        global_tvl_df = pd.DataFrame(global_tvl)
+        global_tvl_df = helpers.format_df(global_tvl_df)
+        return global_tvl_df
+
+    async def get_chain_tvl_timeseries(
+        self,
+        chains_in: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+    ) -> pd.DataFrame:
+        """Retrive timeseries TVL for a given chain.
+        See DeFiLlama.get_chain_tvl_timeseries.
+        """
+        chains = utils.validate_input(chains_in)
+        urls = [self.api_urls["chain_tvl"].format(_chain=chain) for chain in chains]
+        responses = await self.get_responses(urls)
+
+        start, end = helpers.date_window(start_date, end_date)
+        chain_df_list = [
+            helpers.format_df(pd.DataFrame(helpers.window_points(response, start, end)))
+            for response in responses
+        ]
+        chains_df = pd.concat(chain_df_list, axis=1)
+        chains_df.columns = chains
+        return chains_df.sort_index()
+
+    async def get_current_tvl(
+        self,
+        asset_slugs: Union[str, List],
+        snapshot: bool = False,
+        max_age: float = 60.0,
+        return_errors: bool = False,
+    ) -> Union[pd.DataFrame, Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Retrive current protocol tvl for an asset.
+        See DeFiLlama.get_current_tvl.
+        """
+        slugs = utils.validate_input(asset_slugs)
+
+        responses: Dict[str, Any] = {}
+        if snapshot:
+            if self._protocol_snapshot is None or self._protocol_snapshot.age > max_age:
+                protocols = await self.get_response(self.api_urls["protocols"])
+                self._protocol_snapshot = CatalogSnapshot(protocols)
+            responses.update(self._protocol_snapshot.current_tvl(slugs))
+
+        async def fetch_tvl(slug: str) -> Any:
+            endpoint_url = self.api_urls["current_protocol_tvl"].format(_slug=slug)
+            # Errors become rows of errors_df, one failing slug never aborts the batch
+            try:
+                return await self.get_response(endpoint_url)
+            except Exception as e:
+                return e
+
+        missing = [slug for slug in dict.fromkeys(slugs) if slug not in responses]
+        responses.update(zip(missing, await asyncio.gather(*map(fetch_tvl, missing))))
+
+        tvl_df, errors_df = helpers.current_tvl_df(slugs, responses)
+        for slug, error in errors_df.iterrows():
+            logging.warning("Current TVL of %s failed (%s): %s", slug, error["type"],
+                            error["message"])
+        if return_errors:
+            return tvl_df, errors_df
+        return tvl_df
+
+    async def get_protocols(self) -> pd.DataFrame:
+        """Returns basic information on all listed protocols.
+        See DeFiLlama.get_protocols.
+        """
+        protocols = await self.get_response(self.api_urls["protocols"])
+
+        protocol_dict = {}
+        for protocol in protocols:
+            protocol_dict[protocol["slug"]] = protocol
+
+        protocols_df = pd.DataFrame(protocol_dict)
+        return protocols_df
@@ -4,13 +4,16 @@ DeFiLLama API Docs: https://defillama.com/docs/api
 """
 
 import datetime
+import logging
 
 from pycaw.defillama import helpers
+from pycaw.defillama.protocol_catalog import ProtocolCatalog
 from pycaw.messari import dataloader
+from pycaw.messari.response_cache import ResponseCache
 from pycaw.messari import utils
 
 import pandas as pd
-from typing import Union, List, Dict
+from typing import Any, Union, List, Dict, Iterator, Optional, Tuple
 
 
 ##########################
@@ -19,15 +22,36 @@ from typing import Union, List, Dict
 
 
 class DeFiLlama(dataloader.DataLoader):
-    """This class is a wrapper around the DeFi Llama API"""
+    """This class is a wrapper around the DeFi Llama API
+
+    Args:
+        max_workers (int): Maximum number of requests in flight when fetching
+            several protocols or chains.
+        response_cache (ResponseCache): Optional cache of responses. Large,
+            rarely changing endpoints such as /protocols are then served from
+            memory/disk or revalidated with a conditional request.
+        retry_policy (RetryPolicy): Retries of transient failures (429, 5xx,
+            connection errors). Defaults to dataloader.RetryPolicy().
+    """
 
     api_urls: Dict[str, str]
 
-    def __init__(self):
-        messari_to_dl_dict = utils.get_taxonomy_dict("messari_to_dl.json")
+    def __init__(
+        self,
+        max_workers: int = 8,
+        response_cache: ResponseCache = None,
+        retry_policy: dataloader.RetryPolicy = None,
+    ):
         dataloader.DataLoader.__init__(
-            self, api_dict=None, taxonomy_dict=messari_to_dl_dict
+            self,
+            api_dict=None,
+            taxonomy_dict="messari_to_dl.json",
+            max_workers=max_workers,
+            response_cache=response_cache,
+            retry_policy=retry_policy,
         )
+        # '/protocols' snapshot of get_current_tvl(snapshot=True)
+        self._protocol_catalog: Optional[ProtocolCatalog] = None
 
     @property
     def api_urls(self) -> Dict[str, str]:
@@ -54,6 +78,7 @@ class DeFiLlama(dataloader.DataLoader):
         asset_slugs: Union[str, List],
         start_date: Union[str, datetime.datetime] = None,
         end_date: Union[str, datetime.datetime] = None,
+        output: str = "wide",
     ) -> pd.DataFrame:
         """Returns times TVL of a protocol with token amounts as a pandas DataFrame.
         Returned DataFrame is indexed by df[protocol][chain][asset].
@@ -69,6 +94,12 @@ class DeFiLlama(dataloader.DataLoader):
            end_date: str, datetime.datetime
                Optional end date to set filter for tvl timeseries ("YYYY-MM-DD")
 
+           output: str
+               'wide' (default), 'sparse' for the same frame with sparse columns, or
+               'long' for one row per (date, protocol, chain, token) with categorical
+               protocol, chain and token columns and amount, amount_usd values.
+               See helpers.protocols_tvl_df
+
         Returns
         -------
            DataFrame
@@ -77,107 +108,64 @@ class DeFiLlama(dataloader.DataLoader):
                to look at total tvl across all tokens of a chain, asset='totalLiquidityUSD'
                tokens can be indexed by asset='tokenName' or by asset='tokenName_usd'
         """
+        if output not in helpers.TVL_OUTPUTS:
+            raise ValueError(f"output must be one of {helpers.TVL_OUTPUTS}")
         slugs = self.translate(asset_slugs)
 
-        slug_df_list: List = []
-        for slug in slugs:
+        # Concurrent, max_workers at a time
+        urls = [self.api_urls["get_protocol_tvl"].format(_slug=slug) for slug in slugs]
+        responses = self.get_responses(urls)
+
+        # Drop points outside of the dates before building any frame
+        start, end = helpers.date_window(start_date, end_date)
+        protocols = {slug: helpers.window_protocol(protocol, start, end)
+                     for slug, protocol in zip(slugs, responses)}
+        return helpers.protocols_tvl_df(protocols, output=output)
+
+    def iter_protocol_tvl_timeseries(
+        self,
+        asset_slugs: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+        output: str = "wide",
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yields the TVL of each protocol as soon as it is downloaded and parsed.
+
+        Protocols are fetched and parsed on max_workers threads, so a sweep
+        over many protocols is not a serial chain of round trips and only a
+        few payloads are held in memory at once.
+
+        Parameters
+        ----------
+           asset_slugs: str, list
+               Single asset slug string or list of asset slugs (i.e. bitcoin)
+
+           start_date: str, datetime.datetime
+               Optional start date to set filter for tvl timeseries ("YYYY-MM-DD")
+
+           end_date: str, datetime.datetime
+               Optional end date to set filter for tvl timeseries ("YYYY-MM-DD")
+
+           output: str
+               'wide', 'sparse' or 'long', see get_protocol_tvl_timeseries
+
+        Returns
+        -------
+           Iterator
+               (slug, DataFrame) pairs in completion order. Each DataFrame is the
+               get_protocol_tvl_timeseries result for that slug alone.
+        """
+        if output not in helpers.TVL_OUTPUTS:
+            raise ValueError(f"output must be one of {helpers.TVL_OUTPUTS}")
+        slugs = self.translate(asset_slugs)
+        start, end = helpers.date_window(start_date, end_date)
+
+        def protocol_df(slug: str) -> pd.DataFrame:
             endpoint_url = self.api_urls["get_protocol_tvl"].format(_slug=slug)
-            protocol = self.get_response(endpoint_url)
-
-            ###########################
-            # This portion is basically grabbing tvl metrics on a per chain basis
-
-            # TODO this is gonna be difficult
-            chain_tvls = protocol["chainTvls"]
-            chains = protocol["chains"]
-            chain_list = []
-            chain_df_list = []
-            for chain in chains:
-                chain_list.append(chain)
-
-                # get timeseries
-                chain_tvl = chain_tvls[chain]["tvl"]
-                chain_tvl_tokens = chain_tvls[chain]["tokens"]
-                chain_tvl_tokens_usd = chain_tvls[chain]["tokensInUsd"]
-
-                # convert tokens & tokensInUsd
-                for token in chain_tvl_tokens:
-                    for key, value in token["tokens"].items():
-                        token[key] = value
-                    token.pop("tokens", None)
-
-                for token in chain_tvl_tokens_usd:
-                    for key, value in token["tokens"].items():
-                        token[key] = value
-                    token.pop("tokens", None)
-
-                # convert to df
-                chain_tvl_df = pd.DataFrame(chain_tvl)
-                chain_tvl_tokens_df = pd.DataFrame(chain_tvl_tokens)
-                chain_tvl_tokens_usd_df = pd.DataFrame(chain_tvl_tokens_usd)
-
-                # fix indexes
-                chain_tvl_df = helpers.format_df(chain_tvl_df)
-                chain_tvl_tokens_df = helpers.format_df(chain_tvl_tokens_df)
-                chain_tvl_tokens_usd_df = helpers.format_df(chain_tvl_tokens_usd_df)
-                chain_tvl_tokens_usd_df = chain_tvl_tokens_usd_df.add_suffix("_usd")
-
-                # concat tokens and tokensInUsd
-                joint_tokens_df = pd.concat(
-                    [chain_tvl_tokens_df, chain_tvl_tokens_usd_df], axis=1
-                )
-                # Join total chain TVL w/ token TVL
-                chain_df = chain_tvl_df.join(joint_tokens_df)
-                chain_df_list.append(chain_df)
-
-            ###########################
-            # This portion is basically grabbing tvl metrics for all chains combined
-
-            ######################################
-            # Get protocol token balances
-
-            ## tokens in native amount
-            tokens = protocol["tokens"]
-            for token in tokens:
-                for key, value in token["tokens"].items():
-                    token[key] = value
-                token.pop("tokens", None)
-            tokens_df = pd.DataFrame(tokens)
-            tokens_df = helpers.format_df(tokens_df)
-
-            ## tokens in USD
-            tokens_usd = protocol["tokensInUsd"]
-            for token in tokens_usd:
-                for key, value in token["tokens"].items():
-                    token[key] = value
-                token.pop("tokens", None)
-            tokens_usd_df = pd.DataFrame(tokens_usd)
-            tokens_usd_df = helpers.format_df(tokens_usd_df)
-            tokens_usd_df = tokens_usd_df.add_suffix("_usd")
-
-            # Get total tvl across chains
-            tvl = protocol["tvl"]
-            total_tvl_df = pd.DataFrame(tvl)
-            total_tvl_df = helpers.format_df(total_tvl_df)
-
-            # Working
-            joint_tokens_df = pd.concat([tokens_df, tokens_usd_df], axis=1)
-            total_df = total_tvl_df.join(joint_tokens_df)
-
-            # Now create multi index
-            chain_list.append("all")
-            chain_df_list.append(total_df)
-
-            slug_df = pd.concat(chain_df_list, keys=chain_list, axis=1)
-            slug_df_list.append(slug_df)
-
-        total_slugs_df = pd.concat(slug_df_list, keys=slugs, axis=1)
-        total_slugs_df.sort_index(inplace=True)
-
-        total_slugs_df = utils.time_filter_df(
-            total_slugs_df, start_date=start_date, end_date=end_date
-        )
-        return total_slugs_df
+            protocol = helpers.window_protocol(self.get_response(endpoint_url), start, end)
+            return helpers.protocols_tvl_df({slug: protocol}, output=output)
+
+        return self.map_completed(protocol_df, slugs)
 
     def get_global_tvl_timeseries(
         self,
@@ -200,11 +188,9 @@ class DeFiLlama(dataloader.DataLoader):
                DataFrame containing timeseries tvl data for every protocol
         """
         global_tvl = self.get_response(self.api_urls["global_tvl"])
+        global_tvl = helpers.window_points(global_tvl, *helpers.date_window(start_date, end_date))
         global_tvl_df = pd.DataFrame(global_tvl)
         global_tvl_df = helpers.format_df(global_tvl_df)
-        global_tvl_df = utils.time_filter_df(
-            global_tvl_df, start_date=start_date, end_date=end_date
-        )
         return global_tvl_df
 
     def get_chain_tvl_timeseries(
@@ -233,23 +219,26 @@ class DeFiLlama(dataloader.DataLoader):
         """
         chains = utils.validate_input(chains_in)
 
+        urls = [self.api_urls["chain_tvl"].format(_chain=chain) for chain in chains]
+        start, end = helpers.date_window(start_date, end_date)
         chain_df_list = []
-        for chain in chains:
-            endpoint_url = self.api_urls["chain_tvl"].format(_chain=chain)
-            response = self.get_response(endpoint_url)
-            chain_df = pd.DataFrame(response)
+        for response in self.get_responses(urls):
+            chain_df = pd.DataFrame(helpers.window_points(response, start, end))
             chain_df = helpers.format_df(chain_df)
             chain_df_list.append(chain_df)
 
         # Join DataFrames from each chain & return
         chains_df = pd.concat(chain_df_list, axis=1)
         chains_df.columns = chains
-        chains_df = utils.time_filter_df(
-            chains_df, start_date=start_date, end_date=end_date
-        )
-        return chains_df
+        return chains_df.sort_index()
 
-    def get_current_tvl(self, asset_slugs: Union[str, List]) -> Dict:
+    def get_current_tvl(
+        self,
+        asset_slugs: Union[str, List],
+        snapshot: bool = False,
+        max_age: float = 60.0,
+        return_errors: bool = False,
+    ) -> Union[pd.DataFrame, Tuple[pd.DataFrame, pd.DataFrame]]:
         """Retrive current protocol tvl for an asset
 
         Parameters
@@ -257,24 +246,50 @@ class DeFiLlama(dataloader.DataLoader):
            asset_slugs: str, list
                Single asset slug string or list of asset slugs (i.e. bitcoin)
 
+           snapshot: bool
+               Answer from one '/protocols' fetch, shared with later calls for
+               max_age seconds. Only slugs missing from it are requested one by one.
+
+           max_age: float
+               Seconds a '/protocols' snapshot is reused for
+
+           return_errors: bool
+               Also return the slugs which failed
+
         Returns
         -------
            DataFrame
-               Pandas Series for tvl indexed by each slug {slug: tvl, ...}
+               Pandas DataFrame of tvl indexed by each slug. With return_errors, a
+               tuple of it and a DataFrame of errors indexed by slug, with columns
+               'type' ('http', 'api' or 'decode') and 'message'. Errors are logged
+               either way.
         """
         slugs = utils.validate_input(asset_slugs)
 
-        tvl_dict = {}
-        for slug in slugs:
+        responses: Dict[str, Any] = {}
+        if snapshot:
+            if self._protocol_catalog is None:
+                self._protocol_catalog = ProtocolCatalog(self)
+            protocol_snapshot = self._protocol_catalog.fresh_snapshot(max_age)
+            responses.update(protocol_snapshot.current_tvl(slugs))
+
+        def fetch_tvl(slug: str) -> Any:
             endpoint_url = self.api_urls["current_protocol_tvl"].format(_slug=slug)
-            tvl = self.get_response(endpoint_url)
-            if isinstance(tvl, float):
-                tvl_dict[slug] = tvl
-            else:
-                print(f"ERROR: slug={slug}, MESSAGE: {tvl['message']}")
-
-        tvl_series = pd.Series(tvl_dict)
-        tvl_df = tvl_series.to_frame("tvl")
+            # Errors become rows of errors_df, one failing slug never aborts the batch
+            try:
+                return self.get_response(endpoint_url)
+            except Exception as e:
+                return e
+
+        missing = [slug for slug in dict.fromkeys(slugs) if slug not in responses]
+        responses.update(self.map_completed(fetch_tvl, missing))
+
+        tvl_df, errors_df = helpers.current_tvl_df(slugs, responses)
+        for slug, error in errors_df.iterrows():
+            logging.warning("Current TVL of %s failed (%s): %s", slug, error["type"],
+                            error["message"])
+        if return_errors:
+            return tvl_df, errors_df
         return tvl_df
 
     def get_protocols(self) -> pd.DataFrame:
@@ -294,3 +309,22 @@ class DeFiLlama(dataloader.DataLoader):
 
         protocols_df = pd.DataFrame(protocol_dict)
         return protocols_df
+
+    def get_protocol_catalog(self, refresh_interval: float = None) -> ProtocolCatalog:
+        """Returns an indexed catalog of all listed protocols, one row per protocol
+
+        Parameters
+        ----------
+           refresh_interval: float
+               Optional seconds between background refreshes of the catalog
+
+        Returns
+        -------
+        ProtocolCatalog
+           Catalog with typed columns and lookups by slug, name, chain,
+           category and TVL
+        """
+        catalog = ProtocolCatalog(self, refresh_interval=refresh_interval)
+        if refresh_interval is None:
+            catalog.refresh()
+        return catalog
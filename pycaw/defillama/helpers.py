@@ -2,10 +2,23 @@
 
 Methods:
     format_df: Replaces dates and drops duplicates.
+    protocol_tvl_df: Builds the per chain TVL DataFrame of a protocol response.
+    protocols_tvl_df: Builds the TVL DataFrame of several protocol responses.
+    current_tvl_df: Splits current TVL responses into values and structured errors.
+    date_window: Epoch second bounds of a start_date/end_date filter.
+    window_points: Slices a date sorted series to a window by binary search.
+    window_protocol: Slices every series of a protocol response to a window.
+    tvl_decomposition: USD TVL per chain and token, top tokens plus 'Other'.
 """
 
 
+import datetime
+
+import numpy as np
 import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pycaw.messari import utils
 
 
 def format_df(df_in: pd.DataFrame) -> pd.DataFrame:
@@ -31,3 +44,435 @@ def format_df(df_in: pd.DataFrame) -> pd.DataFrame:
     # TODO: Investigate which data should be kept (currently assuming last is more recent
     df_new = df_new[~df_new.index.duplicated(keep="last")]
     return df_new
+
+
+SECONDS_PER_DAY = 86400
+
+TVL_OUTPUTS = ("wide", "sparse", "long")
+
+# (days, column names, values) of one table, rows sorted by day
+Block = Tuple[np.ndarray, List[str], np.ndarray]
+
+# (day, symbol code, value) of every kept token amount, with the symbols
+# and the sorted days of the kept rows
+TokenEntries = Tuple[np.ndarray, np.ndarray, np.ndarray, List[str], np.ndarray]
+
+
+def date_window(
+    start_date: Union[str, datetime.datetime] = None,
+    end_date: Union[str, datetime.datetime] = None,
+) -> Tuple[Optional[int], Optional[int]]:
+    """Epoch second bounds [start, end) of the days from start_date to end_date
+
+    Args:
+       start_date (Union[str, datetime.datetime]): optional first day ("YYYY-MM-DD")
+       end_date (Union[str, datetime.datetime]): optional last day, included
+
+    Returns:
+       (Tuple[Optional[int], Optional[int]]): bounds, None where there is no filter
+    """
+    epoch = datetime.date(1970, 1, 1)
+    start = end = None
+    if start_date:
+        start = (utils.validate_datetime(start_date) - epoch).days * SECONDS_PER_DAY
+    if end_date:
+        end = ((utils.validate_datetime(end_date) - epoch).days + 1) * SECONDS_PER_DAY
+    return start, end
+
+
+def window_points(points: List[Dict[str, Any]], start: Optional[int] = None,
+                  end: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Points of a date sorted series with start <= date < end
+
+    The bounds are found by binary search, points outside of them are never
+    parsed. Whole days are kept or dropped together, so the last point of a
+    day is the same as in the full series.
+
+    Args:
+       points (List[Dict[str, Any]]): series of {date, ...} points, oldest first
+       start (Optional[int]): epoch seconds, see date_window
+       end (Optional[int]): epoch seconds, excluded
+
+    Returns:
+       (List[Dict[str, Any]]): the points in the window
+    """
+    if start is None and end is None:
+        return points
+    dates = np.array([point["date"] for point in points], dtype="int64")
+    lo = 0 if start is None else int(np.searchsorted(dates, start, side="left"))
+    hi = len(points) if end is None else int(np.searchsorted(dates, end, side="left"))
+    return points[lo:hi]
+
+
+def window_protocol(protocol: Dict[str, Any], start: Optional[int] = None,
+                    end: Optional[int] = None) -> Dict[str, Any]:
+    """Shallow copy of a '/protocol/{slug}' response with every series windowed
+
+    Args:
+       protocol (Dict[str, Any]): decoded JSON response of the endpoint
+       start (Optional[int]): epoch seconds, see date_window
+       end (Optional[int]): epoch seconds, excluded
+
+    Returns:
+       (Dict[str, Any]): response with the series used by protocol_tvl_df
+    """
+    if start is None and end is None:
+        return protocol
+
+    def window_series(series: Dict[str, Any]) -> Dict[str, List]:
+        return {key: window_points(series[key], start, end)
+                for key in ("tvl", "tokens", "tokensInUsd")}
+
+    windowed = window_series(protocol)
+    windowed["chains"] = protocol["chains"]
+    windowed["chainTvls"] = {chain: window_series(protocol["chainTvls"][chain])
+                             for chain in protocol["chains"]}
+    return windowed
+
+
+def _keep_last_per_day(dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted unique calendar days and the position of the last point of each day,
+    i.e. the rows format_df keeps."""
+    days = dates // SECONDS_PER_DAY
+    unique_days, first_from_end = np.unique(days[::-1], return_index=True)
+    return unique_days, len(days) - 1 - first_from_end
+
+
+def _tvl_block(points: List[Dict[str, Any]]) -> Block:
+    """Block of a [{date, totalLiquidityUSD}, ...] series."""
+    dates = np.array([point["date"] for point in points], dtype="int64")
+    values = np.array([point["totalLiquidityUSD"] for point in points], dtype="float64")
+    days, keep = _keep_last_per_day(dates)
+    return days, ["totalLiquidityUSD"], values[keep].reshape(-1, 1)
+
+
+def _token_entries(points: List[Dict[str, Any]]) -> TokenEntries:
+    """Flattens a [{date, tokens: {symbol: amount}}, ...] series, symbols are
+    numbered in order of first appearance."""
+    dates = np.array([point["date"] for point in points], dtype="int64")
+    rows: List[int] = []
+    symbols: List[str] = []
+    amounts: List[float] = []
+    for row, point in enumerate(points):
+        tokens = point["tokens"]
+        rows.extend([row] * len(tokens))
+        symbols.extend(tokens)
+        amounts.extend(tokens.values())
+    codes, names = pd.factorize(pd.Index(symbols, dtype=object), sort=False)
+    row_array = np.array(rows, dtype="int64")
+    days, keep = _keep_last_per_day(dates)
+    kept = np.zeros(len(points), dtype=bool)
+    kept[keep] = True
+    kept_entries = kept[row_array]
+    return (dates[row_array[kept_entries]] // SECONDS_PER_DAY, codes[kept_entries],
+            np.array(amounts, dtype="float64")[kept_entries], list(names), days)
+
+
+def _tokens_block(points: List[Dict[str, Any]], suffix: str = "") -> Block:
+    """Block of a [{date, tokens: {symbol: amount}}, ...] series, one column per symbol."""
+    entry_days, codes, amounts, names, days = _token_entries(points)
+    values = np.full((len(days), len(names)), np.nan)
+    values[np.searchsorted(days, entry_days), codes] = amounts
+    return days, [f"{name}{suffix}" for name in names], values
+
+
+def _chain_block(series: Dict[str, List[Dict[str, Any]]]) -> Block:
+    """tvl joined with tokens and tokensInUsd on the days of tvl, like
+    tvl_df.join(pd.concat([tokens_df, tokens_usd_df], axis=1))."""
+    days, names, tvl = _tvl_block(series["tvl"])
+    blocks = [tvl]
+    for token_days, token_names, token_values in (
+            _tokens_block(series["tokens"]),
+            _tokens_block(series["tokensInUsd"], suffix="_usd")):
+        aligned = np.full((len(days), len(token_names)), np.nan)
+        positions = np.searchsorted(days, token_days)
+        found = positions < len(days)
+        found[found] = days[positions[found]] == token_days[found]
+        aligned[positions[found]] = token_values[found]
+        blocks.append(aligned)
+        names = names + token_names
+    return days, names, np.hstack(blocks)
+
+
+def _date_index(days: np.ndarray) -> pd.Index:
+    return pd.Index(pd.to_datetime(days, unit="D", origin="unix").date)
+
+
+def _assemble(blocks: List[Tuple[tuple, Block]], sparse: bool = False) -> pd.DataFrame:
+    """Outer join of keyed blocks into one frame with MultiIndex columns, either
+    preallocated or made of sparse columns."""
+    all_days = np.unique(np.concatenate([days for _, (days, _, _) in blocks]))
+    columns = pd.MultiIndex.from_tuples([key + (name,) for key, (_, names, _) in blocks
+                                         for name in names])
+    if sparse:
+        arrays = []
+        for _, (days, names, values) in blocks:
+            rows = np.searchsorted(all_days, days)
+            for j in range(len(names)):
+                column = np.full(len(all_days), np.nan)
+                column[rows] = values[:, j]
+                arrays.append(pd.arrays.SparseArray(column))
+        sparse_df = pd.DataFrame(dict(enumerate(arrays)), index=_date_index(all_days))
+        sparse_df.columns = columns
+        return sparse_df
+
+    data = np.full((len(all_days), len(columns)), np.nan)
+    offset = 0
+    for _, (days, names, values) in blocks:
+        data[np.searchsorted(all_days, days), offset:offset + len(names)] = values
+        offset += len(names)
+    return pd.DataFrame(data, index=_date_index(all_days), columns=columns, copy=False)
+
+
+def _protocol_series(protocol: Dict[str, Any]) -> List[Tuple[str, Dict[str, List]]]:
+    """(chain, series) pairs of a protocol, chain='all' holds the totals across chains."""
+    return [(chain, protocol["chainTvls"][chain]) for chain in protocol["chains"]] + \
+        [("all", protocol)]
+
+
+def _protocol_blocks(protocol: Dict[str, Any]) -> List[Tuple[tuple, Block]]:
+    return [((chain,), _chain_block(series)) for chain, series in _protocol_series(protocol)]
+
+
+def _chain_long(series: Dict[str, List[Dict[str, Any]]],
+                token_codes: Dict[str, int]) -> Tuple[np.ndarray, ...]:
+    """(day, token code, amount, amount_usd) rows of a chain. Token rows are kept
+    on the days of tvl, like _chain_block."""
+    tvl_days, _, tvl = _tvl_block(series["tvl"])
+    amount_entries = _token_entries(series["tokens"])
+    usd_entries = _token_entries(series["tokensInUsd"])
+
+    # Key token amounts on (day, global token code) to merge both series, the
+    # code taking the low bits. Sized from the code count, so codes never collide.
+    lookups = [np.array([token_codes.setdefault(name, len(token_codes)) for name in names],
+                        dtype="int64")
+               for _, _, _, names, _ in (amount_entries, usd_entries)]
+    shift = max(len(token_codes), 1).bit_length()
+    keys = [(entry_days.astype("int64") << shift) + lookup[codes]
+            for (entry_days, codes, _, _, _), lookup in zip((amount_entries, usd_entries),
+                                                            lookups)]
+    all_keys = np.union1d(keys[0], keys[1])
+    all_keys = all_keys[np.isin(all_keys >> shift, tvl_days)]
+    columns = []
+    for entry_keys, (_, _, values, _, _) in zip(keys, (amount_entries, usd_entries)):
+        column = np.full(len(all_keys), np.nan)
+        positions = np.searchsorted(all_keys, entry_keys)
+        found = positions < len(all_keys)
+        found[found] = all_keys[positions[found]] == entry_keys[found]
+        column[positions[found]] = values[found]
+        columns.append(column)
+
+    total_code = token_codes.setdefault("totalLiquidityUSD", len(token_codes))
+    return (np.concatenate([tvl_days, all_keys >> shift]),
+            np.concatenate([np.full(len(tvl_days), total_code), all_keys & ((1 << shift) - 1)]),
+            np.concatenate([np.full(len(tvl_days), np.nan), columns[0]]),
+            np.concatenate([tvl[:, 0], columns[1]]))
+
+
+def _protocols_long(protocols: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """Long table of protocol TVL, one row per (date, protocol, chain, token)."""
+    chain_codes: Dict[str, int] = {}
+    token_codes: Dict[str, int] = {}
+    parts = []
+    part_protocols: List[int] = []
+    part_chains: List[int] = []
+    for protocol_code, protocol in enumerate(protocols.values()):
+        for chain, series in _protocol_series(protocol):
+            parts.append(_chain_long(series, token_codes))
+            part_protocols.append(protocol_code)
+            part_chains.append(chain_codes.setdefault(chain, len(chain_codes)))
+    lengths = [len(part[0]) for part in parts]
+
+    # Stable, so rows of a day stay in protocol, chain order
+    days = np.concatenate([part[0] for part in parts])
+    order = np.argsort(days, kind="stable")
+    days = days[order]
+
+    def column(values: np.ndarray, dtype: str) -> np.ndarray:
+        return values.astype(dtype, copy=False)[order]
+
+    def codes(part_codes: List[int]) -> np.ndarray:
+        return column(np.repeat(np.array(part_codes, dtype="int32"), lengths), "int32")
+
+    long_df = pd.DataFrame({
+        "protocol": pd.Categorical.from_codes(codes(part_protocols),
+                                              categories=list(protocols)),
+        "chain": pd.Categorical.from_codes(codes(part_chains), categories=list(chain_codes)),
+        "token": pd.Categorical.from_codes(
+            column(np.concatenate([part[1] for part in parts]), "int32"),
+            categories=list(token_codes)),
+        "amount": column(np.concatenate([part[2] for part in parts]), "float64"),
+        "amount_usd": column(np.concatenate([part[3] for part in parts]), "float64"),
+    }, index=pd.DatetimeIndex((days * SECONDS_PER_DAY).astype("datetime64[s]"), name="date"))
+    return long_df
+
+
+def protocol_tvl_df(protocol: Dict[str, Any]) -> pd.DataFrame:
+    """Build the TVL DataFrame of one '/protocol/{slug}' response
+
+    Every series is converted to NumPy arrays in one pass and written into a
+    single preallocated frame. Like format_df, only the last point of each
+    day is kept. The payload is not modified.
+
+    Args:
+       protocol (Dict[str, Any]): decoded JSON response of the endpoint
+
+    Returns:
+       (pd.DataFrame): float TVL timeseries indexed by date, with (chain, asset)
+          columns. chain='all' holds the total across chains.
+    """
+    return _assemble(_protocol_blocks(protocol))
+
+
+def protocols_tvl_df(protocols: Dict[str, Dict[str, Any]],
+                     output: str = "wide") -> pd.DataFrame:
+    """Build the TVL DataFrame of several '/protocol/{slug}' responses
+
+    Args:
+       protocols (Dict[str, Dict[str, Any]]): decoded responses keyed by slug
+       output (str): layout of the result, one of
+          'wide': dense float frame with (protocol, chain, asset) columns, see
+             protocol_tvl_df.
+          'sparse': same frame with sparse columns, NaN is not stored.
+          'long': one row per (date, protocol, chain, token) with columns
+             protocol, chain, token (categoricals), amount and amount_usd,
+             indexed by date. Chain totals are the rows with
+             token='totalLiquidityUSD' and only have an amount_usd.
+          No dense frame is built for the 'sparse' and 'long' outputs.
+
+    Returns:
+       (pd.DataFrame): TVL timeseries of the protocols
+    """
+    if output not in TVL_OUTPUTS:
+        raise ValueError(f"output must be one of {TVL_OUTPUTS}")
+    if output == "long":
+        return _protocols_long(protocols)
+    blocks = [((slug,) + key, block) for slug, protocol in protocols.items()
+              for key, block in _protocol_blocks(protocol)]
+    return _assemble(blocks, sparse=output == "sparse")
+
+
+def current_tvl_df(slugs: List[str],
+                   responses: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Split current TVL results into values and structured errors
+
+    Args:
+       slugs (List[str]): requested slugs, in the order of the results
+       responses (Dict[str, Any]): per slug, the TVL number, the decoded error
+          payload ({'message': ...}) or the exception raised by the request
+
+    Returns:
+       (Tuple[pd.DataFrame, pd.DataFrame]): TVL indexed by slug in column 'tvl', and
+          errors indexed by slug with columns 'type' ('http', 'api' or 'decode')
+          and 'message'
+    """
+    tvl_dict: Dict[str, float] = {}
+    error_dict: Dict[str, Dict[str, str]] = {}
+    for slug in dict.fromkeys(slugs):
+        response = responses[slug]
+        if isinstance(response, (int, float)) and not isinstance(response, bool):
+            tvl_dict[slug] = float(response)
+        elif isinstance(response, SystemError):
+            error_dict[slug] = {"type": "http", "message": str(response)}
+        elif isinstance(response, ValueError):
+            error_dict[slug] = {"type": "decode", "message": f"Invalid JSON: {response}"}
+        elif isinstance(response, Exception):
+            # Connection errors and timeouts left after the retries
+            error_dict[slug] = {"type": "http",
+                                "message": f"{type(response).__name__}: {response}"}
+        elif isinstance(response, dict) and "message" in response:
+            error_dict[slug] = {"type": "api", "message": str(response["message"])}
+        else:
+            error_dict[slug] = {"type": "api", "message": f"Unexpected response: {response!r}"}
+
+    tvl_df = pd.Series(tvl_dict, dtype="float64").to_frame("tvl")
+    errors_df = pd.DataFrame.from_dict(error_dict, orient="index",
+                                       columns=["type", "message"])
+    return tvl_df, errors_df
+
+
+def tvl_decomposition(protocol_df: pd.DataFrame, top_n: int = 9,
+                      other: str = "Other") -> pd.DataFrame:
+    """USD TVL of a protocol per chain and token, the small tokens summed up
+
+    Keeps the '_usd' token columns of every chain. In chains with more than
+    top_n tokens, the top_n tokens by latest TVL are kept and the rest is
+    summed into an 'other' column. Gaps are then filled by linear
+    interpolation, forward only. Ranking, summing and interpolation each run
+    once over the arrays of all chains.
+
+    Args:
+       protocol_df (pd.DataFrame): TVL of one protocol with (chain, asset)
+          columns like protocol_tvl_df builds, or with (protocol, chain, asset)
+          columns holding a single protocol
+       top_n (int): tokens kept per chain
+       other (str): name of the column of the summed remaining tokens
+
+    Returns:
+       (pd.DataFrame): USD TVL indexed by date with (chain, token) columns.
+          Collapsed chains list their kept tokens by decreasing latest TVL,
+          then 'other'.
+    """
+    if protocol_df.columns.nlevels == 3:
+        protocols = protocol_df.columns.get_level_values(0).unique()
+        if len(protocols) != 1:
+            raise ValueError(f"Expected the TVL of one protocol, got {len(protocols)}")
+        protocol_df = protocol_df[protocols[0]]
+    assets = protocol_df.columns.get_level_values(1).astype(str)
+    usd = np.asarray(assets.str.endswith("_usd"))
+    chain_codes, chain_names = pd.factorize(protocol_df.columns.get_level_values(0)[usd])
+    tokens = np.asarray(assets[usd].str[:-len("_usd")], dtype=object)
+    values = protocol_df.to_numpy(dtype="float64")[:, usd]
+    num_chains = len(chain_names)
+
+    # Rank the tokens of each chain by latest TVL, missing values last
+    latest = np.nan_to_num(values[-1]) if len(values) else np.zeros(len(tokens))
+    order = np.lexsort((-latest, chain_codes))
+    sorted_codes = chain_codes[order]
+    rank = np.empty(len(order), dtype="int64")
+    rank[order] = np.arange(len(order)) - np.searchsorted(sorted_codes, sorted_codes)
+    collapsed = np.bincount(chain_codes, minlength=num_chains) > top_n
+    kept = np.flatnonzero(~collapsed[chain_codes] | (rank < top_n))
+
+    # Sum the dropped tokens per chain with one product against a chain indicator
+    dropped = np.ones(len(tokens), dtype=bool)
+    dropped[kept] = False
+    indicator = np.zeros((int(dropped.sum()), num_chains))
+    indicator[np.arange(len(indicator)), chain_codes[dropped]] = 1.0
+    other_values = (np.nan_to_num(values[:, dropped]) @ indicator)[:, collapsed]
+    other_codes = np.flatnonzero(collapsed)
+
+    # Collapsed chains list their tokens by rank, the others keep the input order
+    input_order = np.argsort(chain_codes, kind="stable")
+    position = np.empty(len(order), dtype="int64")
+    position[input_order] = np.arange(len(order)) - np.searchsorted(
+        chain_codes[input_order], chain_codes[input_order])
+    column_rank = np.where(collapsed[chain_codes], rank, position)
+
+    column_codes = np.concatenate([chain_codes[kept], other_codes])
+    column_ranks = np.concatenate([column_rank[kept], np.full(len(other_codes), top_n)])
+    column_names = np.concatenate([tokens[kept], np.full(len(other_codes), other, dtype=object)])
+    columns_order = np.lexsort((column_ranks, column_codes))
+    data = np.hstack([values[:, kept], other_values])[:, columns_order]
+    columns = pd.MultiIndex.from_arrays([np.asarray(chain_names, dtype=object)[
+        column_codes[columns_order]], column_names[columns_order]])
+    return pd.DataFrame(_interpolate_forward(data), index=protocol_df.index, columns=columns,
+                        copy=False)
+
+
+def _interpolate_forward(values: np.ndarray) -> np.ndarray:
+    """Column-wise linear interpolation over row positions, like
+    DataFrame.interpolate(method='linear', limit_direction='forward'), for all
+    columns at once. Gaps after the last value repeat it, leading gaps stay NaN."""
+    num_rows = len(values)
+    rows = np.arange(num_rows).reshape(-1, 1)
+    valid = ~np.isnan(values)
+    prev_rows = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    next_rows = np.minimum.accumulate(np.where(valid, rows, num_rows)[::-1], axis=0)[::-1]
+    prev_values = np.take_along_axis(values, np.maximum(prev_rows, 0), axis=0)
+    next_values = np.take_along_axis(values, np.minimum(next_rows, num_rows - 1), axis=0)
+    inside = next_rows < num_rows
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(inside, (rows - prev_rows) / (next_rows - prev_rows), 0.0)
+        filled = prev_values + weight * np.where(inside, next_values - prev_values, 0.0)
+    return np.where(valid, values, np.where(prev_rows >= 0, filled, np.nan))
@@ -0,0 +1,243 @@
+"""This module is meant to contain the ProtocolCatalog class
+
+A ProtocolCatalog holds the '/protocols' listing of DeFi Llama as one row per
+protocol, with hash indexes by slug, name, chain and category so lookups
+don't scan the frame.
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+# Numeric fields of the '/protocols' payload, missing or null values become NaN
+NUMERIC_FIELDS = ["tvl", "change_1h", "change_1d", "change_7d", "mcap", "fdv", "listedAt"]
+CATEGORICAL_FIELDS = ["chain", "category"]
+
+
+class CatalogSnapshot:
+    """Immutable, indexed view of one '/protocols' response.
+
+    Args:
+        protocols (List[Dict[str, Any]]): decoded '/protocols' response
+    """
+
+    def __init__(self, protocols: List[Dict[str, Any]]):
+        self.fetched_at = time.time()
+        df = pd.DataFrame(protocols)
+        for field in NUMERIC_FIELDS:
+            if field in df.columns:
+                df[field] = pd.to_numeric(df[field], errors="coerce").astype("float64")
+        for field in CATEGORICAL_FIELDS:
+            if field in df.columns:
+                df[field] = df[field].astype("category")
+        if "slug" in df.columns:
+            df = df.set_index("slug", drop=False)
+            df.index.name = None
+        self.df = df
+
+        self.slugs = np.array(df.index, dtype=object)
+        self.tvl = df["tvl"].to_numpy() if "tvl" in df.columns else np.full(len(df), np.nan)
+        self.by_slug = {slug: row for row, slug in enumerate(self.slugs)}
+        self.by_name: Dict[str, int] = {}
+        for row, name in enumerate(df.get("name", [])):
+            self.by_name.setdefault(str(name).casefold(), row)
+
+        # chain -> (rows, TVL of each protocol on that chain)
+        by_chain: Dict[str, List] = {}
+        by_category: Dict[str, List[int]] = {}
+        for row, protocol in enumerate(protocols):
+            chain_tvls = protocol.get("chainTvls") or {}
+            for chain in protocol.get("chains") or []:
+                rows, tvls = by_chain.setdefault(chain, ([], []))
+                rows.append(row)
+                tvls.append(chain_tvls.get(chain, np.nan))
+            by_category.setdefault(protocol.get("category"), []).append(row)
+        self.by_chain = {chain: (np.array(rows, dtype="int64"), np.array(tvls, dtype="float64"))
+                         for chain, (rows, tvls) in by_chain.items()}
+        self.by_category = {category: np.array(rows, dtype="int64")
+                            for category, rows in by_category.items()}
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was fetched"""
+        return time.time() - self.fetched_at
+
+    def current_tvl(self, slugs: List[str]) -> Dict[str, float]:
+        """Current TVL of the given slugs, leaving out unlisted slugs and missing TVLs"""
+        tvl_dict = {}
+        for slug in slugs:
+            row = self.by_slug.get(slug)
+            if row is not None and not np.isnan(self.tvl[row]):
+                tvl_dict[slug] = float(self.tvl[row])
+        return tvl_dict
+
+    def find_rows(self, chain: str = None, category: str = None,
+                  min_tvl: float = None, max_tvl: float = None) -> np.ndarray:
+        """Sorted row positions of the protocols matching every given filter.
+        With a chain, the TVL bounds apply to the TVL on that chain."""
+        no_rows = np.empty(0, dtype="int64")
+        if chain is not None:
+            rows, tvl = self.by_chain.get(chain, (no_rows, np.empty(0)))
+        else:
+            rows, tvl = np.arange(len(self.slugs)), self.tvl
+        keep = np.ones(len(rows), dtype=bool)
+        if min_tvl is not None:
+            keep &= tvl >= min_tvl
+        if max_tvl is not None:
+            keep &= tvl <= max_tvl
+        rows = rows[keep]
+        if category is not None:
+            rows = np.intersect1d(rows, self.by_category.get(category, no_rows),
+                                  assume_unique=True)
+        return rows
+
+
+class ProtocolCatalog:
+    """Indexed catalog of the protocols listed on DeFi Llama
+
+    Lookups run against an immutable CatalogSnapshot which a refresh swaps
+    atomically, so readers never lock and never see a half built catalog.
+    With refresh_interval the catalog is refreshed on a background thread;
+    a failed refresh is logged and the previous snapshot kept.
+
+    Args:
+        llama (DeFiLlama): client used to fetch '/protocols'. Give it a
+            ResponseCache to make refreshes conditional requests.
+        refresh_interval (float): Optional seconds between background refreshes.
+
+    Examples:
+        >>> catalog = DeFiLlama().get_protocol_catalog(refresh_interval=600)
+        >>> catalog.find(chain="Arbitrum", category="Lending", min_tvl=10e6)
+        ['aave-v3', 'radiant-v2', ...]
+    """
+
+    def __init__(self, llama: Any = None, refresh_interval: Optional[float] = None):
+        self.llama = llama
+        self.refresh_interval = refresh_interval
+        self.last_error: Optional[Exception] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if refresh_interval is not None:
+            self.start()
+
+    @classmethod
+    def from_protocols(cls, protocols: List[Dict[str, Any]]) -> "ProtocolCatalog":
+        """Catalog of an already decoded '/protocols' response, without refreshes."""
+        catalog = cls()
+        catalog._snapshot = CatalogSnapshot(protocols)
+        return catalog
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot, fetched on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """One row per protocol, indexed by slug. Do not modify in place."""
+        return self.snapshot.df
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.snapshot.by_slug
+
+    def refresh(self) -> CatalogSnapshot:
+        """Fetch '/protocols' and swap in a new snapshot"""
+        if self.llama is None:
+            raise ValueError("A DeFiLlama client is needed to refresh the catalog")
+        with self._refresh_lock:
+            protocols = self.llama.get_response(self.llama.api_urls["protocols"])
+            self._snapshot = CatalogSnapshot(protocols)
+            return self._snapshot
+
+    def fresh_snapshot(self, max_age: float) -> CatalogSnapshot:
+        """Current snapshot, refreshed first if it is older than max_age seconds"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age > max_age:
+            snapshot = self.refresh()
+        return snapshot
+
+    def start(self) -> None:
+        """Start refreshing every refresh_interval seconds on a daemon thread"""
+        if self.refresh_interval is None:
+            raise ValueError("refresh_interval must be set to refresh in the background")
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True,
+                                        name="pycaw-protocol-catalog")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refreshes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                logging.warning("Protocol catalog refresh failed: %s", e)
+            self._stop.wait(self.refresh_interval)
+
+    def get(self, slug: str) -> Optional[pd.Series]:
+        """Row of a protocol by slug, None if it isn't listed"""
+        snapshot = self.snapshot
+        row = snapshot.by_slug.get(slug)
+        return None if row is None else snapshot.df.iloc[row]
+
+    def get_by_name(self, name: str) -> Optional[pd.Series]:
+        """Row of a protocol by display name, case insensitive"""
+        snapshot = self.snapshot
+        row = snapshot.by_name.get(name.casefold())
+        return None if row is None else snapshot.df.iloc[row]
+
+    def find(self, chain: str = None, category: str = None,
+             min_tvl: float = None, max_tvl: float = None) -> List[str]:
+        """Slugs of the protocols matching every given filter
+
+        Args:
+            chain (str): Optional chain the protocol is deployed on, i.e. 'Arbitrum'
+            category (str): Optional category, i.e. 'Lending'
+            min_tvl (float): Optional lower TVL bound in USD. With a chain, the
+                bounds apply to the TVL on that chain.
+            max_tvl (float): Optional upper TVL bound in USD
+
+        Returns:
+            (List[str]): matching slugs in catalog order
+        """
+        snapshot = self.snapshot
+        return snapshot.slugs[snapshot.find_rows(chain, category, min_tvl, max_tvl)].tolist()
+
+    def query(self, chain: str = None, category: str = None,
+              min_tvl: float = None, max_tvl: float = None) -> pd.DataFrame:
+        """Rows of the protocols matching every given filter, see find"""
+        snapshot = self.snapshot
+        return snapshot.df.iloc[snapshot.find_rows(chain, category, min_tvl, max_tvl)]
+
+    def chains(self) -> List[str]:
+        """All chains with at least one protocol"""
+        return list(self.snapshot.by_chain)
+
+    def categories(self) -> List[str]:
+        """All protocol categories"""
+        return [category for category in self.snapshot.by_category if category is not None]
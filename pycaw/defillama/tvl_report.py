@@ -0,0 +1,215 @@
+"""Headless TVL decomposition reports of many DeFi Llama protocols
+
+Batch version of 'pycaw/messari/examples/tvl_monitor.py'. Histories are
+synced into a TvlHistoryStore, so a nightly run only parses the new days,
+then every protocol is decomposed with helpers.tvl_decomposition and
+written as a CSV table and, with matplotlib installed, a PNG chart.
+Protocols are rendered in parallel worker processes reading the store, and
+nothing is drawn on a display. A protocol that fails is reported in
+summary.csv and doesn't stop the others.
+
+Usage:
+    python -m pycaw.defillama.tvl_report aave curve uniswap --out-dir reports
+        [--slugs-file slugs.txt] [--start 2022-01-01] [--end 2022-12-31]
+        [--formats csv png] [--top-n 9] [--workers 4] [--store-dir DIR] [--no-sync]
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import math
+import os
+import sys
+
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+
+from pycaw.defillama import helpers
+from pycaw.defillama.defillama import DeFiLlama
+from pycaw.defillama.tvl_store import DEFAULT_STORE_DIR, PROTOCOL, TvlHistoryStore
+
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+except ImportError:
+    Figure = None
+
+REPORT_FORMATS = ("csv", "png")
+SUMMARY_COLUMNS = ["status", "days", "chains", "tvl", "error"]
+COLORS = ["#233A4F", "#C767DD", "#CDE5BA", "#75D9E3", "#4A90FF",
+          "#FF9400", "#75AAFD", "#FFA7A7", "#7030A0", "#FFC000"]
+
+
+def _billions(x: float, pos: int) -> str:
+    return "${:1.0f}B".format(x * 1e-9)
+
+
+def plot_decomposition(decomposition: pd.DataFrame, title: str) -> "Figure":
+    """Stacked area chart of each chain of a tvl_decomposition, one subplot per chain
+
+    Draws on a standalone matplotlib Figure, without pyplot or a display.
+    """
+    if Figure is None:
+        raise ImportError("matplotlib is needed to plot TVL decompositions")
+    chains = list(dict.fromkeys(decomposition.columns.get_level_values(0)))
+    num_cols = 2
+    num_rows = max(1, math.ceil(len(chains) / num_cols))
+    fig = Figure(figsize=(20, num_rows * 6), constrained_layout=True)
+    fig.suptitle(title, fontsize=25)
+    dates = pd.to_datetime(decomposition.index)
+    for k, chain in enumerate(chains):
+        ax = fig.add_subplot(num_rows, num_cols, k + 1)
+        chain_df = decomposition[chain].fillna(0)
+        ax.stackplot(dates, chain_df.to_numpy().T, labels=list(chain_df.columns),
+                     colors=COLORS, linewidth=0)
+        total_current_tvl = chain_df.sum(axis=1).iloc[-1]
+        ax.axhline(y=total_current_tvl, color="#244666", linestyle="--", linewidth=2)
+        ax.annotate("${:.2f}B".format(total_current_tvl * 1e-9),
+                    xy=(dates[len(dates) // 2], total_current_tvl * (1 + 1 / 70)),
+                    fontsize="x-large", fontfamily="sans-serif", weight="bold",
+                    color="#244666")
+        ax.yaxis.set_major_formatter(FuncFormatter(_billions))
+        ax.set_xlim([dates[0], dates[-1]])
+        ax.set_xlabel("Date")
+        ax.set_title("Aggregate TVL Decomposition" if chain == "all"
+                     else f"{chain} TVL Decomposition")
+        ax.legend(loc="lower center", ncol=4, fancybox=True, shadow=True)
+    return fig
+
+
+def build_report(slug: str, store_dir: str, out_dir: str, start_day: Optional[int] = None,
+                 end_day: Optional[int] = None, formats: Sequence[str] = ("csv",),
+                 top_n: int = 9) -> Dict[str, Any]:
+    """Decompose the stored TVL history of a protocol and write its report files
+
+    Runs in a worker process, so it only takes picklable arguments and reads
+    the history from the store itself.
+
+    Args:
+        slug (str): protocol slug
+        store_dir (str): directory of the TvlHistoryStore
+        out_dir (str): directory the '{slug}.csv' and '{slug}.png' files go to
+        start_day (int): Optional first calendar day (days since epoch)
+        end_day (int): Optional last calendar day (days since epoch)
+        formats (Sequence[str]): report files to write, see REPORT_FORMATS
+        top_n (int): tokens kept per chain, see helpers.tvl_decomposition
+
+    Returns:
+        (Dict[str, Any]): summary row of the protocol
+    """
+    history = TvlHistoryStore(None, store_dir).load(PROTOCOL, slug)
+    if not len(history.days):
+        return {"status": "empty", "error": "no stored history"}
+    decomposition = helpers.tvl_decomposition(history.to_frame(start_day, end_day), top_n)
+    if not len(decomposition):
+        return {"status": "empty", "error": "no history in the date range"}
+    if "csv" in formats:
+        decomposition.to_csv(os.path.join(out_dir, f"{slug}.csv"))
+    if "png" in formats:
+        fig = plot_decomposition(decomposition, f"{slug.capitalize()} TVL Decomposition by Chain")
+        fig.savefig(os.path.join(out_dir, f"{slug}.png"))
+    chains = list(dict.fromkeys(decomposition.columns.get_level_values(0)))
+    total = decomposition["all"] if "all" in chains else decomposition
+    return {"status": "ok", "days": len(decomposition), "chains": len(chains),
+            "tvl": float(total.iloc[-1].sum())}
+
+
+def run_reports(slugs: List[str], out_dir: str, store: TvlHistoryStore,
+                start_date: Optional[str] = None, end_date: Optional[str] = None,
+                formats: Sequence[str] = ("csv", "png"), top_n: int = 9,
+                workers: int = 4, sync: bool = True) -> pd.DataFrame:
+    """Sync and write the TVL decomposition reports of many protocols
+
+    Args:
+        slugs (List[str]): protocol slugs
+        out_dir (str): output directory, created if needed
+        store (TvlHistoryStore): store the histories are synced into and read from
+        start_date (str): Optional start date ("YYYY-MM-DD")
+        end_date (str): Optional end date ("YYYY-MM-DD")
+        formats (Sequence[str]): report files to write, see REPORT_FORMATS
+        top_n (int): tokens kept per chain
+        workers (int): processes rendering reports, 1 renders in this process
+        sync (bool): Sync the histories first, otherwise only read the store
+
+    Returns:
+        (pd.DataFrame): summary indexed by slug, also written to summary.csv
+    """
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"formats must be in {REPORT_FORMATS}, got {sorted(unknown)}")
+    if "png" in formats and Figure is None:
+        raise ImportError("matplotlib is needed for 'png' reports, install it or use csv only")
+    os.makedirs(out_dir, exist_ok=True)
+    # Stored under the translated slugs, see TvlHistoryStore.sync_protocols
+    slugs = list(dict.fromkeys(store.llama.translate(slugs) if store.llama else slugs))
+
+    sync_errors: Dict[str, Exception] = {}
+    if sync:
+        store.sync_protocols(slugs, errors=sync_errors)
+        for slug, error in sync_errors.items():
+            logging.warning("Cannot sync %s: %s", slug, error)
+
+    # Protocols that failed to sync are still reported from what the store holds
+    start_day, end_day = store._day_range(start_date, end_date)
+    args = (store.store_dir, out_dir, start_day, end_day, tuple(formats), top_n)
+    if workers <= 1:
+        summary = {slug: _safe_build_report(slug, *args) for slug in slugs}
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {slug: executor.submit(_safe_build_report, slug, *args) for slug in slugs}
+            summary = {slug: future.result() for slug, future in futures.items()}
+    for slug, error in sync_errors.items():
+        status = "stale" if summary[slug]["status"] == "ok" else "sync_failed"
+        summary[slug].update(status=status, error=str(error))
+
+    summary_df = pd.DataFrame.from_dict(summary, orient="index").reindex(
+        index=slugs, columns=SUMMARY_COLUMNS)
+    summary_df.to_csv(os.path.join(out_dir, "summary.csv"), index_label="slug")
+    return summary_df
+
+
+def _safe_build_report(slug: str, *args) -> Dict[str, Any]:
+    try:
+        return build_report(slug, *args)
+    except Exception as e:
+        logging.exception("Cannot build the TVL report of %s", slug)
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Write TVL decomposition reports of DeFi Llama protocols")
+    parser.add_argument("slugs", nargs="*", help="protocol slugs, i.e. aave curve")
+    parser.add_argument("--slugs-file", help="file with one protocol slug per line")
+    parser.add_argument("-o", "--out-dir", default="tvl_reports")
+    parser.add_argument("-s", "--start", help="start date used to filter results")
+    parser.add_argument("-e", "--end", help="end date used to filter results")
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS,
+                        default=list(REPORT_FORMATS) if Figure is not None else ["csv"])
+    parser.add_argument("--top-n", type=int, default=9, help="tokens kept per chain")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes rendering reports")
+    parser.add_argument("--fetch-workers", type=int, default=8,
+                        help="requests in flight while syncing")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--no-sync", action="store_true",
+                        help="only use the stored histories, don't fetch")
+    args = parser.parse_args(argv)
+
+    slugs = list(args.slugs)
+    if args.slugs_file:
+        with open(args.slugs_file, "r", encoding="utf-8") as f:
+            slugs += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not slugs:
+        parser.error("no protocol slugs given")
+
+    store = TvlHistoryStore(DeFiLlama(max_workers=args.fetch_workers), args.store_dir)
+    summary_df = run_reports(slugs, args.out_dir, store, args.start, args.end,
+                             formats=args.formats, top_n=args.top_n, workers=args.workers,
+                             sync=not args.no_sync)
+    print(summary_df.to_string())
+    return 0 if (summary_df["status"] == "ok").all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
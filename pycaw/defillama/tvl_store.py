@@ -0,0 +1,277 @@
+"""This module is meant to contain the TvlHistoryStore class
+
+DeFiLLama API Docs: https://defillama.com/docs/api
+"""
+
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pycaw.defillama import helpers
+from pycaw.messari import utils
+
+DEFAULT_STORE_DIR = os.path.join(".pycaw_cache", "defillama_tvl")
+
+PROTOCOL = "protocol"
+CHAIN = "chain"
+
+
+class TvlHistory:
+    """TVL history stored for one protocol or chain.
+
+    Args:
+        days (np.ndarray): Sorted, unique calendar day numbers (days since epoch).
+        columns (List[tuple]): Column keys, (chain, asset) for protocols and
+            ('totalLiquidityUSD',) for chains.
+        values (np.ndarray): float64 array of shape (len(days), len(columns)).
+    """
+
+    def __init__(self, days: np.ndarray, columns: List[tuple], values: np.ndarray):
+        self.days = days
+        self.columns = columns
+        self.values = values
+
+    @classmethod
+    def empty(cls) -> "TvlHistory":
+        return cls(np.empty(0, dtype="int64"), [], np.empty((0, 0)))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TvlHistory":
+        """History of a DataFrame indexed by date, like the helpers build"""
+        days = pd.to_datetime(df.index).values.astype("datetime64[D]").astype("int64")
+        columns = [column if isinstance(column, tuple) else (column,) for column in df.columns]
+        return cls(days, columns, df.to_numpy(dtype="float64"))
+
+    @property
+    def last_day(self) -> Optional[int]:
+        return int(self.days[-1]) if len(self.days) else None
+
+    def merge(self, new: "TvlHistory") -> int:
+        """Append a history starting on or after last_day
+
+        Rows from the first day of new on are replaced, so the latest point of
+        a day wins as in helpers.format_df. Columns are the union of both,
+        grouped by chain.
+
+        Returns:
+            (int): number of rows added or replaced
+        """
+        if not len(new.days):
+            return 0
+        keep = self.days < new.days[0]
+        groups: Dict[tuple, List[tuple]] = {}
+        for column in dict.fromkeys(self.columns + new.columns):
+            groups.setdefault(column[:-1], []).append(column)
+        columns = [column for group in groups.values() for column in group]
+        position = {column: i for i, column in enumerate(columns)}
+
+        num_kept = int(keep.sum())
+        values = np.full((num_kept + len(new.days), len(columns)), np.nan)
+        values[:num_kept, [position[column] for column in self.columns]] = self.values[keep]
+        values[num_kept:, [position[column] for column in new.columns]] = new.values
+        self.days = np.concatenate([self.days[keep], new.days])
+        self.columns, self.values = columns, values
+        return len(new.days)
+
+    def to_frame(self, start_day: int = None, end_day: int = None) -> pd.DataFrame:
+        """Rows between two calendar days (inclusive), indexed by date"""
+        lo = 0 if start_day is None else np.searchsorted(self.days, start_day, side="left")
+        hi = len(self.days) if end_day is None else np.searchsorted(self.days, end_day,
+                                                                     side="right")
+        if self.columns and len(self.columns[0]) > 1:
+            columns = pd.MultiIndex.from_tuples(self.columns)
+        else:
+            columns = pd.Index([column[0] for column in self.columns])
+        index = pd.Index(pd.to_datetime(self.days[lo:hi], unit="D", origin="unix").date)
+        return pd.DataFrame(self.values[lo:hi], index=index, columns=columns)
+
+
+class TvlHistoryStore:
+    """Incremental on-disk store of DeFi Llama TVL histories
+
+    Histories are stored column-wise in one .npz file per protocol or chain.
+    A sync downloads the response as usual, since DeFi Llama has no way to
+    ask for recent points only, but parses and appends only the points from
+    the last stored day on. That day is re-parsed because its latest point
+    may have changed. With a ResponseCache on the client, an unchanged
+    history costs a 304 instead of a download. Range queries are served from
+    disk with a binary search on the stored days.
+
+    Args:
+        llama (DeFiLlama): Client used to fetch histories, protocols and chains
+            are synced concurrently on its max_workers threads.
+        store_dir (str): Directory holding the store files.
+
+    Examples:
+        >>> store = TvlHistoryStore(DeFiLlama())
+        >>> store.sync_protocols(["aave", "curve"])
+        {'aave': 1, 'curve': 1}
+        >>> tvl = store.get_protocol_tvl_timeseries(["aave", "curve"], start_date="2022-01-01")
+    """
+
+    def __init__(self, llama: Any, store_dir: str = DEFAULT_STORE_DIR):
+        self.llama = llama
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, kind: str, name: str) -> str:
+        key = re.sub(r"[^A-Za-z0-9._-]", "_", f"{kind}__{name}")
+        return os.path.join(self.store_dir, f"{key}.npz")
+
+    def load(self, kind: str, name: str) -> TvlHistory:
+        """Load the stored history of a protocol or chain, or an empty one"""
+        path = self._path(kind, name)
+        if not os.path.exists(path):
+            return TvlHistory.empty()
+        with np.load(path, allow_pickle=False) as data:
+            columns = [tuple(column) for column in data["columns"].tolist()]
+            return TvlHistory(data["days"], columns, data["values"])
+
+    def save(self, kind: str, name: str, history: TvlHistory) -> None:
+        """Atomically write a history to disk"""
+        path = self._path(kind, name)
+        tmp_path = f"{path}.tmp.npz"
+        width = len(history.columns[0]) if history.columns else 1
+        np.savez(tmp_path, days=history.days, values=history.values,
+                 columns=np.array(history.columns, dtype=str).reshape(-1, width))
+        os.replace(tmp_path, path)
+
+    def last_date(self, kind: str, name: str) -> Optional[datetime.date]:
+        """Last stored date of a protocol (kind='protocol') or chain (kind='chain')"""
+        last_day = self.load(kind, name).last_day
+        if last_day is None:
+            return None
+        return datetime.date(1970, 1, 1) + datetime.timedelta(days=last_day)
+
+    def _sync_protocol(self, slug: str) -> int:
+        history = self.load(PROTOCOL, slug)
+        endpoint_url = self.llama.api_urls["get_protocol_tvl"].format(_slug=slug)
+        protocol = self.llama.get_response(endpoint_url)
+        if history.last_day is not None:
+            protocol = helpers.window_protocol(protocol,
+                                               start=history.last_day * helpers.SECONDS_PER_DAY)
+        if not len(protocol["tvl"]):
+            return 0
+        added = history.merge(TvlHistory.from_frame(helpers.protocol_tvl_df(protocol)))
+        self.save(PROTOCOL, slug, history)
+        return added
+
+    def _sync_chain(self, chain: str) -> int:
+        history = self.load(CHAIN, chain)
+        endpoint_url = self.llama.api_urls["chain_tvl"].format(_chain=chain)
+        points = self.llama.get_response(endpoint_url)
+        if history.last_day is not None:
+            points = helpers.window_points(points,
+                                           start=history.last_day * helpers.SECONDS_PER_DAY)
+        if not len(points):
+            return 0
+        chain_df = helpers.format_df(pd.DataFrame(points))
+        added = history.merge(TvlHistory.from_frame(chain_df))
+        self.save(CHAIN, chain, history)
+        return added
+
+    def sync_protocols(self, asset_slugs: Union[str, List],
+                       errors: Optional[Dict[str, Exception]] = None) -> Dict[str, int]:
+        """Fetch and store the new TVL points of protocols
+
+        Args:
+            asset_slugs (Union[str, List]): Single asset slug string or list of slugs
+            errors (Dict[str, Exception]): Optional dict collecting the error of
+                each slug that failed to sync, instead of raising the first one.
+                Failed slugs keep their stored history.
+
+        Returns:
+            (Dict[str, int]): number of days added or refreshed per synced slug
+        """
+        slugs = self.llama.translate(asset_slugs)
+        if errors is None:
+            return dict(self.llama.map_completed(self._sync_protocol, dict.fromkeys(slugs)))
+
+        def sync(slug: str) -> Optional[int]:
+            try:
+                return self._sync_protocol(slug)
+            except Exception as e:
+                errors[slug] = e
+                return None
+
+        return {slug: added for slug, added in self.llama.map_completed(sync, dict.fromkeys(slugs))
+                if added is not None}
+
+    def sync_chains(self, chains_in: Union[str, List]) -> Dict[str, int]:
+        """Fetch and store the new TVL points of chains
+
+        Args:
+            chains_in (Union[str, List]): Single chain string or list of chains
+
+        Returns:
+            (Dict[str, int]): number of days added or refreshed per chain
+        """
+        chains = utils.validate_input(chains_in)
+        return dict(self.llama.map_completed(self._sync_chain, dict.fromkeys(chains)))
+
+    def get_protocol_tvl_timeseries(
+        self,
+        asset_slugs: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+        sync: bool = True,
+    ) -> pd.DataFrame:
+        """Stored equivalent of DeFiLlama.get_protocol_tvl_timeseries
+
+        Args:
+            asset_slugs (Union[str, List]): Single asset slug string or list of slugs
+            start_date (Union[str, datetime.datetime]): Optional start date ("YYYY-MM-DD")
+            end_date (Union[str, datetime.datetime]): Optional end date ("YYYY-MM-DD")
+            sync (bool): Sync the protocols first, otherwise only read from disk
+
+        Returns:
+            (pd.DataFrame): TVL indexed by df[protocol][chain][asset]
+        """
+        slugs = self.llama.translate(asset_slugs)
+        if sync:
+            self.sync_protocols(slugs)
+        start_day, end_day = self._day_range(start_date, end_date)
+        slug_df_list = [self.load(PROTOCOL, slug).to_frame(start_day, end_day)
+                        for slug in slugs]
+        return pd.concat(slug_df_list, keys=slugs, axis=1).sort_index()
+
+    def get_chain_tvl_timeseries(
+        self,
+        chains_in: Union[str, List],
+        start_date: Union[str, datetime.datetime] = None,
+        end_date: Union[str, datetime.datetime] = None,
+        sync: bool = True,
+    ) -> pd.DataFrame:
+        """Stored equivalent of DeFiLlama.get_chain_tvl_timeseries
+
+        Args:
+            chains_in (Union[str, List]): Single chain string or list of chains
+            start_date (Union[str, datetime.datetime]): Optional start date ("YYYY-MM-DD")
+            end_date (Union[str, datetime.datetime]): Optional end date ("YYYY-MM-DD")
+            sync (bool): Sync the chains first, otherwise only read from disk
+
+        Returns:
+            (pd.DataFrame): TVL with one column per chain
+        """
+        chains = utils.validate_input(chains_in)
+        if sync:
+            self.sync_chains(chains)
+        start_day, end_day = self._day_range(start_date, end_date)
+        chain_series = []
+        for chain in chains:
+            chain_df = self.load(CHAIN, chain).to_frame(start_day, end_day)
+            # A chain without a stored history gets a column of NaNs
+            chain_series.append(chain_df.iloc[:, 0] if len(chain_df.columns)
+                                else pd.Series(dtype="float64"))
+        return pd.concat(chain_series, axis=1, keys=chains).sort_index()
+
+    @staticmethod
+    def _day_range(start_date: Union[str, datetime.datetime, None],
+                   end_date: Union[str, datetime.datetime, None]) -> Tuple[Optional[int], ...]:
+        start, end = helpers.date_window(start_date, end_date)
+        return (None if start is None else start // helpers.SECONDS_PER_DAY,
+                None if end is None else end // helpers.SECONDS_PER_DAY - 1)
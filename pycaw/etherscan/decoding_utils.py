@@ -7,8 +7,10 @@ import web3
 import web3.auto
 import json
 import hexbytes
+import itertools
 from web3._utils import events 
-from typing import Any, Dict, Mapping, Union
+from pycaw.etherscan import signatures as sigs
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
 from collections.abc import Sequence
 
 def decode_tuple(t: Union[tuple, bytes, bytearray], target_field):
@@ -79,7 +81,16 @@ def _get_contract(address, abi):
     return (contract, abi)
 
 
-def decode_tx(address, input_data, abi):
+def decode_tx(address, input_data, abi,
+              signatures: Optional[sigs.SignatureDB] = None):
+    """Decodes transaction input data with the contract ABI.
+
+    When 'abi' is None and a local signature database is given, the 4-byte
+    selector is looked up there instead, so common functions decode without
+    fetching the ABI. Parameters decoded this way are named 'arg0', 'arg1', ...
+    """
+    if abi is None and signatures is not None:
+        return decode_tx_by_selector(input_data, signatures)
     if abi is not None:
         try:
             (contract, abi) = _get_contract(address, abi)
@@ -114,7 +125,73 @@ def _get_hex_topic(t):
     return hex_t
 
 
-def decode_log(data, topics, abi):
+def decode_tx_by_selector(input_data: str, signatures: sigs.SignatureDB
+                          ) -> Tuple[str, Optional[str], Optional[str]]:
+    """Decodes transaction input data using only a local signature database.
+
+    Every signature registered for the selector is tried in turn, since
+    distinct signatures can share a selector, and the first that decodes the
+    arguments cleanly is returned.
+    """
+    candidates = signatures.functions(input_data)
+    if not candidates:
+        return ('no matching abi', None, None)
+    arg_data = eth_utils.decode_hex(input_data)[4:]
+    error = None
+    for signature in candidates:
+        fn_name, types = sigs.split_signature(signature)
+        try:
+            values = web3.auto.w3.codec.decode_abi(types, arg_data)
+        except Exception as err:
+            error = err
+            continue
+        target_schema = sigs.abi_inputs(types)
+        func_params = {
+            arg['name']: value for arg, value in zip(target_schema, values)}
+        decoded_func_params = convert_to_hex(func_params, target_schema)
+        return (fn_name, json.dumps(decoded_func_params), json.dumps(target_schema))
+    return ('decode error', repr(error), None)
+
+
+def decode_log_by_topic(data, topics, signatures: sigs.SignatureDB
+                        ) -> Tuple[str, Optional[str], Optional[str]]:
+    """Decodes an event log using only a local signature database.
+
+    Text signatures do not say which parameters are indexed, so the number of
+    topics fixes how many are, and placements are tried with the leading
+    parameters indexed first, which is the common convention.
+    """
+    if not topics:
+        return ('no matching abi', None, None)
+    candidates = signatures.events(topics[0])
+    if not candidates:
+        return ('no matching abi', None, None)
+    num_indexed = len(topics) - 1
+    error = None
+    for signature in candidates:
+        evt_name, types = sigs.split_signature(signature)
+        if num_indexed > len(types):
+            continue
+        for indexed in itertools.combinations(range(len(types)), num_indexed):
+            event_abi = {
+                'type': 'event', 'name': evt_name, 'anonymous': False,
+                'inputs': sigs.abi_inputs(types, indexed=set(indexed))}
+            try:
+                return decode_log(data, topics, [event_abi])
+            except Exception as err:
+                error = err
+    return ('decode error', repr(error), None)
+
+
+def decode_log(data, topics, abi,
+               signatures: Optional[sigs.SignatureDB] = None):
+    """Decodes an event log with the contract ABI.
+
+    When 'abi' is None and a local signature database is given, topic0 is
+    looked up there instead. See 'decode_log_by_topic'.
+    """
+    if abi is None and signatures is not None:
+        return decode_log_by_topic(data, topics, signatures)
     if abi is not None:
         topic2abi = _get_topic2abi(abi)
         log = {
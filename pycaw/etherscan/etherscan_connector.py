@@ -104,23 +104,49 @@ class EtherscanConnector:
         tx_receipt: types.TxReceipt = self.run_query(tx_receipt_query)
         return tx_receipt
 
-    def get_event_log(self, address: str, topic0: str) -> Dict[str, Any]:
-        """[summary]
+    def get_event_log(self,
+                      address: str,
+                      topic0: str,
+                      from_block: Optional[Union[int, str]] = None,
+                      to_block: Optional[Union[int, str]] = None,
+                      page: Optional[int] = None,
+                      offset: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Queries the event logs emitted by a contract for a given topic.
 
         Args:
             address (str): A 20 byte Ethereum address.
-            topic0 (str): [description]
+            topic0 (str): Keccak hash of the event signature, i.e. the first
+                topic of the log.
+            from_block (Optional[Union[int, str]]): First block to search.
+                Defaults to None, which leaves the Etherscan default.
+            to_block (Optional[Union[int, str]]): Last block to search, or
+                "latest". Defaults to None.
+            page (Optional[int]): Page number for paginated queries.
+                Defaults to None.
+            offset (Optional[int]): Number of logs per page, at most 1000.
+                Defaults to None.
 
         Returns:
-            [dict]: [description]
-        
-        References: 
+            (List[Dict[str, Any]]): Raw logs with keys like 'address',
+                'topics', 'data', 'blockNumber', 'transactionHash', and
+                'logIndex'.
+
+        References:
             API docs: https://docs.etherscan.io/api-endpoints/logs
             Ethereum docs on events: https://ethereum.org/ig/developers/tutorials/logging-events-smart-contracts/
         """
         event_log_url: List[str] = [
-            self.endpoint_preamble, "module=logs&", "action=getLogs&", 
-            "address={address}&", "topic0={topic0}&", "apikey={api_key}"]
+            self.endpoint_preamble, "module=logs&", "action=getLogs&",
+            "address={address}&", "topic0={topic0}&"]
+        if from_block is not None:
+            event_log_url.append(f"fromBlock={from_block}&")
+        if to_block is not None:
+            event_log_url.append(f"toBlock={to_block}&")
+        if page is not None:
+            event_log_url.append(f"page={page}&")
+        if offset is not None:
+            event_log_url.append(f"offset={offset}&")
+        event_log_url.append("apikey={api_key}")
         event_log_url: str = "".join(event_log_url)
 
         event_log_query = event_log_url.format(
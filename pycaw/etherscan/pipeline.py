@@ -0,0 +1,494 @@
+"""Streaming pipeline that fetches, decodes, and stores Etherscan event logs.
+
+Log pages flow from an `EtherscanConnector` through `decoding_utils.decode_log`
+and into a pluggable sink. Each stage runs on its own worker thread and the
+stages are connected by bounded queues, so only a few pages are ever held in
+memory and fetching overlaps with decoding.
+
+Classes:
+    LogSink
+    JsonlSink
+    ParquetSink
+    SQLiteSink
+    CallbackSink
+    StageMetrics
+    PipelineMetrics
+    EventLogPipeline
+"""
+import abc
+import dataclasses
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from pycaw.etherscan import decoding_utils
+from pycaw.etherscan import etherscan_connector
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+RawLog = Dict[str, Any]
+DecodedLog = Dict[str, Any]
+Decoder = Callable[[str, List[str], Any], Tuple[str, Optional[str], Optional[str]]]
+
+# Etherscan returns at most 1000 logs per page and refuses page * offset
+# beyond 10,000, so long ranges are walked by moving 'fromBlock' forward.
+MAX_PAGE_SIZE: int = 1000
+MAX_RESULT_WINDOW: int = 10_000
+
+_DONE = object()  # Queue sentinel marking the end of a stage's output.
+
+DECODED_LOG_COLUMNS: List[str] = [
+    "address", "block_number", "transaction_hash", "log_index", "event",
+    "args", "schema"]
+
+
+class LogSink(abc.ABC):
+    """Destination for batches of decoded logs.
+
+    Methods:
+        write: Persist a batch of decoded logs.
+        close: Flush and release any underlying resources.
+    """
+
+    @abc.abstractmethod
+    def write(self, records: List[DecodedLog]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "LogSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class JsonlSink(LogSink):
+    """Appends decoded logs to a JSON lines file, one log per line.
+
+    Args:
+        path (str): Output file path.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, mode="a", encoding="utf-8")
+
+    def write(self, records: List[DecodedLog]) -> None:
+        self._file.writelines(json.dumps(record) + "\n" for record in records)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class ParquetSink(LogSink):
+    """Streams decoded logs into a Parquet file, one row group per batch.
+
+    Requires the optional 'pyarrow' dependency.
+
+    Args:
+        path (str): Output file path.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as err:
+            raise ImportError(
+                "ParquetSink requires 'pyarrow'. "
+                "Install it with 'pip install pyarrow'.") from err
+        self.path = path
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([
+            ("address", pyarrow.string()),
+            ("block_number", pyarrow.int64()),
+            ("transaction_hash", pyarrow.string()),
+            ("log_index", pyarrow.int64()),
+            ("event", pyarrow.string()),
+            ("args", pyarrow.string()),
+            ("schema", pyarrow.string())])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, records: List[DecodedLog]) -> None:
+        if not records:
+            return
+        columns = {name: [record[name] for record in records]
+                   for name in DECODED_LOG_COLUMNS}
+        table = self._pa.Table.from_pydict(columns, schema=self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class SQLiteSink(LogSink):
+    """Inserts decoded logs into a SQLite table, one transaction per batch.
+
+    Args:
+        path (str): Database file path, or ":memory:".
+        table (str): Table name. Created if it does not exist.
+            Defaults to "event_logs".
+    """
+
+    def __init__(self, path: str, table: str = "event_logs"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        # The sink is opened on the caller's thread and written on a worker.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "address TEXT, block_number INTEGER, transaction_hash TEXT, "
+            "log_index INTEGER, event TEXT, args TEXT, schema TEXT, "
+            "PRIMARY KEY (transaction_hash, log_index))")
+        self._insert = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(DECODED_LOG_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in DECODED_LOG_COLUMNS)})")
+
+    def write(self, records: List[DecodedLog]) -> None:
+        rows = [tuple(record[name] for name in DECODED_LOG_COLUMNS)
+                for record in records]
+        with self.connection:
+            self.connection.executemany(self._insert, rows)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CallbackSink(LogSink):
+    """Hands each batch of decoded logs to a user-supplied callable.
+
+    Args:
+        callback (Callable[[List[DecodedLog]], None]): Called once per batch.
+    """
+
+    def __init__(self, callback: Callable[[List[DecodedLog]], None]):
+        self.callback = callback
+
+    def write(self, records: List[DecodedLog]) -> None:
+        self.callback(records)
+
+
+@dataclasses.dataclass
+class StageMetrics:
+    """Throughput and back-pressure counters for one pipeline stage.
+
+    Attributes:
+        name (str): Stage name, i.e. "fetch", "decode", or "sink".
+        batches (int): Number of pages the stage has processed.
+        records (int): Number of logs the stage has processed.
+        busy_seconds (float): Time spent doing work, excluding queue waits.
+        max_queue_depth (int): Largest observed size of the stage's input
+            queue. Always 0 for the fetch stage, which has no input queue.
+        queue_depth_total (int): Sum of sampled input queue sizes, used for
+            'mean_queue_depth'.
+    """
+    name: str
+    batches: int = 0
+    records: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_total: int = 0
+
+    @property
+    def records_per_sec(self) -> float:
+        if self.busy_seconds == 0:
+            return 0.0
+        return self.records / self.busy_seconds
+
+    @property
+    def mean_queue_depth(self) -> float:
+        if self.batches == 0:
+            return 0.0
+        return self.queue_depth_total / self.batches
+
+    def _sample_queue(self, q: queue.Queue) -> None:
+        depth = q.qsize()
+        self.queue_depth_total += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+
+@dataclasses.dataclass
+class PipelineMetrics:
+    """Metrics for a full pipeline run.
+
+    Attributes:
+        stages (Dict[str, StageMetrics]): Metrics keyed by stage name.
+        wall_seconds (float): Elapsed time of the run.
+    """
+    stages: Dict[str, StageMetrics]
+    wall_seconds: float = 0.0
+
+    def report(self) -> str:
+        lines = [f"pipeline finished in {self.wall_seconds:.2f}s"]
+        for stage in self.stages.values():
+            lines.append(
+                f"  {stage.name:<6} batches={stage.batches} "
+                f"records={stage.records} busy={stage.busy_seconds:.2f}s "
+                f"rate={stage.records_per_sec:.1f}/s "
+                f"queue_max={stage.max_queue_depth} "
+                f"queue_mean={stage.mean_queue_depth:.1f}")
+        return "\n".join(lines)
+
+
+def decode_raw_log(raw_log: RawLog, abi: Any,
+                   decoder: Decoder = decoding_utils.decode_log) -> DecodedLog:
+    """Decodes one raw Etherscan log into a flat, sink-friendly record.
+
+    Decoding failures are recorded on the row rather than raised, mirroring
+    'decoding_utils.decode_tx'.
+
+    Args:
+        raw_log (RawLog): A log as returned by 'EtherscanConnector.get_event_log'.
+        abi (Any): Contract ABI as a JSON string or list.
+        decoder (Decoder): Function with the signature of
+            'decoding_utils.decode_log'.
+
+    Returns:
+        (DecodedLog): Dict with the keys in 'DECODED_LOG_COLUMNS'.
+    """
+    try:
+        event, args, schema = decoder(raw_log["data"], raw_log["topics"], abi)
+    except Exception as err:
+        event, args, schema = "decode error", repr(err), None
+    return dict(
+        address=raw_log.get("address"),
+        block_number=_hex_to_int(raw_log.get("blockNumber")),
+        transaction_hash=raw_log.get("transactionHash"),
+        log_index=_hex_to_int(raw_log.get("logIndex")),
+        event=event,
+        args=args,
+        schema=schema)
+
+
+def _hex_to_int(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    if value == "0x":  # Etherscan encodes a zero log index as "0x"
+        return 0
+    return int(value, base=16) if value.startswith("0x") else int(value)
+
+
+class EventLogPipeline:
+    """Fetches event log pages, decodes them, and writes them to a sink.
+
+    The fetch stage pages through 'EtherscanConnector.get_event_log', the
+    decode stage runs 'decoding_utils.decode_log' on a pool of worker threads,
+    and the sink stage writes each decoded page. Stages communicate through
+    bounded queues, so a slow sink applies back-pressure to fetching instead
+    of letting logs pile up in memory.
+
+    Args:
+        connector (EtherscanConnector): Connector used to query logs.
+        abi (Any): Contract ABI as a JSON string or list.
+        sink (LogSink): Destination for decoded logs.
+        page_size (int): Logs per Etherscan request, at most 1000.
+            Defaults to 1000.
+        queue_size (int): Maximum number of pages buffered between two
+            stages. Defaults to 4.
+        decode_workers (int): Number of decode threads. Defaults to 1.
+        decoder (Decoder): Decoding function. Defaults to
+            'decoding_utils.decode_log'.
+
+    Example:
+        >>> connector = EtherscanConnector()
+        >>> abi = connector.get_contract_abi(address)
+        >>> with JsonlSink("transfers.jsonl") as sink:
+        ...     pipeline = EventLogPipeline(connector, abi=abi, sink=sink)
+        ...     metrics = pipeline.run(address, topic0, from_block=15_000_000)
+        >>> print(metrics.report())
+    """
+
+    def __init__(self,
+                 connector: etherscan_connector.EtherscanConnector,
+                 abi: Any,
+                 sink: LogSink,
+                 page_size: int = MAX_PAGE_SIZE,
+                 queue_size: int = 4,
+                 decode_workers: int = 1,
+                 decoder: Decoder = decoding_utils.decode_log):
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be in [1, {MAX_PAGE_SIZE}]")
+        if queue_size < 1 or decode_workers < 1:
+            raise ValueError("queue_size and decode_workers must be positive")
+        self.connector = connector
+        self.abi = abi
+        self.sink = sink
+        self.page_size = page_size
+        self.queue_size = queue_size
+        self.decode_workers = decode_workers
+        self.decoder = decoder
+
+    def iter_pages(self,
+                   address: str,
+                   topic0: str,
+                   from_block: int = 0,
+                   to_block: Union[int, str] = "latest") -> Iterator[List[RawLog]]:
+        """Yields pages of raw logs in block order until the range is exhausted.
+
+        Once the Etherscan result window is used up, the query restarts at
+        the last block seen, and logs already yielded from that block are
+        skipped.
+        """
+        max_page = MAX_RESULT_WINDOW // self.page_size
+        page = 1
+        seen_in_last_block: set = set()
+        last_block: Optional[int] = None
+        while True:
+            logs: List[RawLog] = self.connector.get_event_log(
+                address=address, topic0=topic0, from_block=from_block,
+                to_block=to_block, page=page, offset=self.page_size)
+            if not isinstance(logs, list):
+                raise Exception(logs)  # Etherscan reports errors as a string
+            fresh = [log for log in logs
+                     if (log["transactionHash"], log["logIndex"])
+                     not in seen_in_last_block]
+            if fresh:
+                yield fresh
+            if len(logs) < self.page_size:
+                return
+
+            newest_block = _hex_to_int(logs[-1]["blockNumber"])
+            if newest_block != last_block:
+                seen_in_last_block = set()
+                last_block = newest_block
+            seen_in_last_block.update(
+                (log["transactionHash"], log["logIndex"]) for log in logs
+                if _hex_to_int(log["blockNumber"]) == newest_block)
+
+            if page < max_page:
+                page += 1
+            elif newest_block == from_block:
+                raise RuntimeError(
+                    f"Block {from_block} holds more than {MAX_RESULT_WINDOW} "
+                    "matching logs and cannot be paged through.")
+            else:
+                from_block, page = newest_block, 1
+
+    def run(self,
+            address: str,
+            topic0: str,
+            from_block: int = 0,
+            to_block: Union[int, str] = "latest") -> PipelineMetrics:
+        """Runs the pipeline to completion and returns per-stage metrics.
+
+        Raises:
+            Exception: The first error raised by any stage. The remaining
+                stages are stopped before it is re-raised.
+        """
+        metrics = PipelineMetrics(stages={
+            name: StageMetrics(name) for name in ("fetch", "decode", "sink")})
+        raw_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        decoded_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def put(q: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def guarded(target: Callable[[], None]) -> Callable[[], None]:
+            def wrapper():
+                try:
+                    target()
+                except BaseException as err:
+                    logging.exception("Event log pipeline stage failed")
+                    errors.append(err)
+                    stop.set()
+            return wrapper
+
+        def fetch():
+            stage = metrics.stages["fetch"]
+            pages = self.iter_pages(address, topic0, from_block, to_block)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    page = next(pages, None)
+                    stage.busy_seconds += time.perf_counter() - start
+                    if page is None:
+                        break
+                    stage.batches += 1
+                    stage.records += len(page)
+                    if not put(raw_queue, page):
+                        return
+            finally:
+                for _ in range(self.decode_workers):
+                    put(raw_queue, _DONE)
+
+        decode_lock = threading.Lock()
+        remaining_decoders = [self.decode_workers]
+
+        def decode():
+            stage = metrics.stages["decode"]
+            try:
+                while True:
+                    page = get(raw_queue)
+                    if page is _DONE:
+                        return
+                    start = time.perf_counter()
+                    records = [decode_raw_log(log, self.abi, self.decoder)
+                               for log in page]
+                    elapsed = time.perf_counter() - start
+                    with decode_lock:
+                        stage._sample_queue(raw_queue)
+                        stage.busy_seconds += elapsed
+                        stage.batches += 1
+                        stage.records += len(records)
+                    if not put(decoded_queue, records):
+                        return
+            finally:
+                with decode_lock:
+                    remaining_decoders[0] -= 1
+                    if remaining_decoders[0] == 0:
+                        put(decoded_queue, _DONE)
+
+        def write():
+            stage = metrics.stages["sink"]
+            while True:
+                records = get(decoded_queue)
+                if records is _DONE:
+                    return
+                stage._sample_queue(decoded_queue)
+                start = time.perf_counter()
+                self.sink.write(records)
+                stage.busy_seconds += time.perf_counter() - start
+                stage.batches += 1
+                stage.records += len(records)
+
+        threads = [threading.Thread(target=guarded(fetch), name="logs-fetch")]
+        threads += [
+            threading.Thread(target=guarded(decode), name=f"logs-decode-{i}")
+            for i in range(self.decode_workers)]
+        threads.append(threading.Thread(target=guarded(write), name="logs-sink"))
+
+        wall_start = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.wall_seconds = time.perf_counter() - wall_start
+
+        logging.info(metrics.report())
+        if errors:
+            raise errors[0]
+        return metrics
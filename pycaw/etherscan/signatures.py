@@ -0,0 +1,417 @@
+"""Local function-selector and event-signature database for ABI-less decoding.
+
+The database maps 4-byte function selectors to text signatures such as
+"transfer(address,uint256)" and event topics (topic0) to event signatures such
+as "Transfer(address,address,uint256)". It is stored in a single compact
+binary file that is memory-mapped on open, so lookups touch only the pages
+they need and many processes can share one copy.
+
+File layout (little-endian), one section for functions then one for events:
+    header: magic (8s), version (I), num_functions (I), num_events (I)
+    section: keys (uint32 selectors | uint64 topic prefixes), padded to 8
+             bytes, offsets (uint64, n + 1), utf-8 signature blob.
+
+Keys are sorted, so a lookup is a binary search on an integer array.
+Event keys are the first 8 bytes of topic0 and candidates are confirmed
+against the full topic hash.
+
+Classes:
+    SignatureDB
+    SignatureDBBuilder
+"""
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+
+import eth_utils
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+MAGIC: bytes = b"PYCAWSIG"
+VERSION: int = 1
+_HEADER = struct.Struct("<8sIII")
+
+_SIGNATURE_PATTERN = re.compile(r"^[A-Za-z_$][A-Za-z0-9_$]*\(.*\)$")
+
+COMMON_FUNCTION_SIGNATURES: List[str] = [
+    # ERC-20
+    "transfer(address,uint256)",
+    "transferFrom(address,address,uint256)",
+    "approve(address,uint256)",
+    "increaseAllowance(address,uint256)",
+    "decreaseAllowance(address,uint256)",
+    # ERC-721 / ERC-1155
+    "safeTransferFrom(address,address,uint256)",
+    "safeTransferFrom(address,address,uint256,bytes)",
+    "setApprovalForAll(address,bool)",
+    "safeTransferFrom(address,address,uint256,uint256,bytes)",
+    "safeBatchTransferFrom(address,address,uint256[],uint256[],bytes)",
+    # WETH
+    "deposit()",
+    "withdraw(uint256)",
+    # Uniswap V2 router
+    "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+    "swapTokensForExactTokens(uint256,uint256,address[],address,uint256)",
+    "swapExactETHForTokens(uint256,address[],address,uint256)",
+    "swapExactTokensForETH(uint256,uint256,address[],address,uint256)",
+    "addLiquidity(address,address,uint256,uint256,uint256,uint256,address,uint256)",
+    "removeLiquidity(address,address,uint256,uint256,uint256,address,uint256)",
+    # Multicall
+    "multicall(bytes[])",
+    "multicall(uint256,bytes[])",
+]
+
+COMMON_EVENT_SIGNATURES: List[str] = [
+    "Transfer(address,address,uint256)",
+    "Approval(address,address,uint256)",
+    "ApprovalForAll(address,address,bool)",
+    "TransferSingle(address,address,address,uint256,uint256)",
+    "TransferBatch(address,address,address,uint256[],uint256[])",
+    "Deposit(address,uint256)",
+    "Withdrawal(address,uint256)",
+    "Swap(address,uint256,uint256,uint256,uint256,address)",
+    "Swap(address,address,int256,int256,uint160,uint128,int24)",
+    "Sync(uint112,uint112)",
+    "Mint(address,uint256,uint256)",
+    "Burn(address,uint256,uint256,address)",
+    "PairCreated(address,address,address,uint256)",
+    "OwnershipTransferred(address,address)",
+]
+
+
+def normalize_signature(signature: str) -> str:
+    """Strips whitespace from a text signature and checks its shape.
+
+    Raises:
+        ValueError: If 'signature' does not look like 'name(type,...)'.
+    """
+    signature = "".join(signature.split())
+    if not _SIGNATURE_PATTERN.match(signature):
+        raise ValueError(f"Invalid text signature: {signature!r}")
+    return signature
+
+
+def split_signature(signature: str) -> Tuple[str, List[str]]:
+    """Splits 'name(type0,(type1,type2)[])' into its name and top-level types.
+
+    Returns:
+        (Tuple[str, List[str]]): The function or event name and a list of
+            canonical ABI type strings, e.g. ['uint256', '(address,bool)[]'].
+    """
+    name, _, args = signature.partition("(")
+    return name, _split_types(args[:-1])
+
+
+def _split_types(args: str) -> List[str]:
+    types, depth, start = [], 0, 0
+    for i, char in enumerate(args):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            types.append(args[start:i])
+            start = i + 1
+    if args:
+        types.append(args[start:])
+    return types
+
+
+def abi_to_signature(abi_entry: Dict[str, Any]) -> str:
+    """Text signature of a function or event ABI entry, e.g. 'f(uint256)'."""
+    types = [_collapse_type(arg) for arg in abi_entry.get("inputs", [])]
+    return f"{abi_entry['name']}({','.join(types)})"
+
+
+def _collapse_type(arg: Dict[str, Any]) -> str:
+    type_: str = arg["type"]
+    if not type_.startswith("tuple"):
+        return type_
+    components = ",".join(_collapse_type(c) for c in arg["components"])
+    return f"({components}){type_[len('tuple'):]}"
+
+
+def abi_inputs(types: List[str], indexed: Optional[Set[int]] = None
+               ) -> List[Dict[str, Any]]:
+    """Builds ABI 'inputs' entries, with tuple components, from type strings.
+
+    Parameters are named 'arg0', 'arg1', ... since text signatures carry no
+    parameter names.
+
+    Args:
+        types (List[str]): Top-level ABI type strings.
+        indexed (Optional[Set[int]]): Positions of indexed event parameters.
+            Leave as None for function inputs.
+    """
+    inputs = []
+    for i, type_ in enumerate(types):
+        entry: Dict[str, Any] = {"name": f"arg{i}"}
+        if type_.startswith("("):
+            closing = type_.rindex(")")
+            entry["type"] = "tuple" + type_[closing + 1:]
+            entry["components"] = abi_inputs(_split_types(type_[1:closing]))
+        else:
+            entry["type"] = type_
+        if indexed is not None:
+            entry["indexed"] = i in indexed
+        inputs.append(entry)
+    return inputs
+
+
+def selector_key(selector: Union[str, bytes]) -> int:
+    """Integer key for a 4-byte selector given as bytes or a hex string.
+
+    Longer inputs such as full transaction input data are truncated to the
+    first 4 bytes.
+    """
+    if isinstance(selector, str):
+        selector = eth_utils.decode_hex(selector[:10])
+    return int.from_bytes(selector[:4], "big")
+
+
+def topic_key(topic: Union[str, bytes]) -> int:
+    """Integer key for topic0: its first 8 bytes as a big-endian integer."""
+    if isinstance(topic, str):
+        topic = eth_utils.decode_hex(topic)
+    return int.from_bytes(bytes(topic)[:8], "big")
+
+
+class SignatureDB:
+    """A read-only, memory-mapped signature database.
+
+    Args:
+        path (str): Database file written by 'SignatureDBBuilder.write'.
+
+    Example:
+        >>> db = SignatureDB("signatures.db")
+        >>> db.functions("0xa9059cbb")
+        ['transfer(address,uint256)']
+        >>> db.events("0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef")
+        ['Transfer(address,address,uint256)']
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, mode="rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_functions, num_events = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a signature database.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported signature database version: {version}")
+
+        self._num_functions, self._num_events = num_functions, num_events
+        position = _HEADER.size
+        self._fn_keys, self._fn_offsets, self._fn_blob, position = self._read_section(
+            position, num_functions, np.dtype("<u4"))
+        self._ev_keys, self._ev_offsets, self._ev_blob, position = self._read_section(
+            position, num_events, np.dtype("<u8"))
+
+    def _read_section(self, position: int, count: int, key_dtype: np.dtype):
+        keys = np.frombuffer(self._mmap, dtype=key_dtype, count=count, offset=position)
+        position = _align8(position + keys.nbytes)
+        offsets = np.frombuffer(
+            self._mmap, dtype="<u8", count=count + 1, offset=position)
+        position += offsets.nbytes
+        blob_start = position
+        position += int(offsets[-1])
+        return keys, offsets, blob_start, position
+
+    def __len__(self) -> int:
+        return self._num_functions + self._num_events
+
+    @property
+    def num_functions(self) -> int:
+        return self._num_functions
+
+    @property
+    def num_events(self) -> int:
+        return self._num_events
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def _lookup(self, keys: np.ndarray, offsets: np.ndarray, blob_start: int,
+                key: int) -> List[str]:
+        if keys is None:
+            raise ValueError(f"Signature database {self.path} is closed.")
+        key = keys.dtype.type(key)
+        left = int(np.searchsorted(keys, key, side="left"))
+        right = int(np.searchsorted(keys, key, side="right"))
+        return [
+            self._mmap[blob_start + int(offsets[i]): blob_start + int(offsets[i + 1])
+                       ].decode("utf-8")
+            for i in range(left, right)]
+
+    def functions(self, selector: Union[str, bytes]) -> List[str]:
+        """Returns every known text signature for a 4-byte selector.
+
+        Args:
+            selector (Union[str, bytes]): The selector, or full transaction
+                input data, as bytes or a "0x"-prefixed hex string.
+        """
+        return self._lookup(self._fn_keys, self._fn_offsets, self._fn_blob,
+                            selector_key(selector))
+
+    def events(self, topic0: Union[str, bytes]) -> List[str]:
+        """Returns the known event signatures whose hash equals 'topic0'."""
+        if self.closed:
+            raise ValueError(f"Signature database {self.path} is closed.")
+        if isinstance(topic0, str):
+            topic0 = eth_utils.decode_hex(topic0)
+        topic0 = bytes(topic0)
+        candidates = self._lookup(self._ev_keys, self._ev_offsets, self._ev_blob,
+                                  topic_key(topic0))
+        return [signature for signature in candidates
+                if eth_utils.event_signature_to_log_topic(signature) == topic0]
+
+    def close(self) -> None:
+        # Drop the numpy views first; an mmap with live exports can't close.
+        self._fn_keys = self._fn_offsets = None
+        self._ev_keys = self._ev_offsets = None
+        self._mmap.close()
+
+    def __enter__(self) -> "SignatureDB":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SignatureDBBuilder:
+    """Collects function and event signatures and writes a 'SignatureDB' file.
+
+    Signatures can be added one at a time, from contract ABIs, or in bulk
+    from files. Bulk files may be plain text with one signature per line
+    (optionally prefixed by its hex selector, e.g. "0xa9059cbb,transfer(...)"),
+    or CSV exports with a 'text_signature' column such as those from
+    4byte.directory.
+
+    Example:
+        >>> builder = SignatureDBBuilder().add_common()
+        >>> builder.import_file("4byte_functions.csv", kind="function")
+        >>> builder.import_file("event_signatures.txt", kind="event")
+        >>> builder.write("signatures.db")
+    """
+
+    def __init__(self):
+        self.function_signatures: Set[str] = set()
+        self.event_signatures: Set[str] = set()
+
+    def add_function(self, signature: str) -> "SignatureDBBuilder":
+        self.function_signatures.add(normalize_signature(signature))
+        return self
+
+    def add_event(self, signature: str) -> "SignatureDBBuilder":
+        self.event_signatures.add(normalize_signature(signature))
+        return self
+
+    def add_common(self) -> "SignatureDBBuilder":
+        """Adds the bundled ERC-20/721/1155, WETH, and Uniswap signatures."""
+        for signature in COMMON_FUNCTION_SIGNATURES:
+            self.add_function(signature)
+        for signature in COMMON_EVENT_SIGNATURES:
+            self.add_event(signature)
+        return self
+
+    def add_abi(self, abi: Union[str, List[Dict[str, Any]]]) -> "SignatureDBBuilder":
+        """Adds every function and event of a contract ABI."""
+        if isinstance(abi, str):
+            abi = json.loads(abi)
+        for entry in abi:
+            if entry.get("type") == "function":
+                self.add_function(abi_to_signature(entry))
+            elif entry.get("type") == "event" and not entry.get("anonymous"):
+                self.add_event(abi_to_signature(entry))
+        return self
+
+    def import_file(self, path: str, kind: str = "function") -> int:
+        """Imports signatures in bulk from a text or CSV file.
+
+        Args:
+            path (str): File path.
+            kind (str): "function" or "event".
+
+        Returns:
+            (int): Number of signatures read, before de-duplication.
+        """
+        if kind not in ("function", "event"):
+            raise ValueError("Value for 'kind' must be 'function' or 'event'.")
+        add = self.add_function if kind == "function" else self.add_event
+
+        count = 0
+        with open(path, mode="r", encoding="utf-8", newline="") as f:
+            first_line = f.readline()
+            f.seek(0)
+            if "text_signature" in first_line:
+                signatures = (row["text_signature"] for row in csv.DictReader(f))
+            else:
+                signatures = (_signature_from_line(line) for line in f)
+            for signature in signatures:
+                if not signature:
+                    continue
+                try:
+                    add(signature)
+                except ValueError:
+                    continue
+                count += 1
+        return count
+
+    def write(self, path: str) -> None:
+        """Writes the collected signatures as a memory-mappable database."""
+        functions = sorted(
+            (selector_key(eth_utils.function_signature_to_4byte_selector(sig)), sig)
+            for sig in self.function_signatures)
+        events = sorted(
+            (topic_key(eth_utils.event_signature_to_log_topic(sig)), sig)
+            for sig in self.event_signatures)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, mode="wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(functions), len(events)))
+            _write_section(f, functions, np.dtype("<u4"))
+            _write_section(f, events, np.dtype("<u8"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_signatures(cls,
+                        functions: Iterable[str] = (),
+                        events: Iterable[str] = ()) -> "SignatureDBBuilder":
+        builder = cls()
+        for signature in functions:
+            builder.add_function(signature)
+        for signature in events:
+            builder.add_event(signature)
+        return builder
+
+
+def _signature_from_line(line: str) -> Optional[str]:
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    # Accept "0x<hex>,<signature>", "0x<hex> <signature>" or a bare signature.
+    if line.startswith("0x"):
+        parts = re.split(r"[,\s]+", line, maxsplit=1)
+        return parts[1] if len(parts) == 2 else None
+    return line
+
+
+def _align8(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def _write_section(f, entries: List[Tuple[int, str]], key_dtype: np.dtype) -> None:
+    keys = np.array([key for key, _ in entries], dtype=key_dtype)
+    encoded = [signature.encode("utf-8") for _, signature in entries]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(blob) for blob in encoded], out=offsets[1:])
+
+    f.write(keys.tobytes())
+    f.write(b"\x00" * (_align8(f.tell()) - f.tell()))
+    f.write(offsets.tobytes())
+    f.write(b"".join(encoded))
@@ -3,3 +3,7 @@
 # https://github.com/messari/messari-python-api
 
 from pycaw.messari.messari_api import *
+from pycaw.messari.timeseries_cache import MetricTimeseriesCache
+from pycaw.messari.response_cache import ResponseCache
+from pycaw.messari.taxonomy import TaxonomyIndex
+from pycaw.messari.async_messari import AsyncMessari
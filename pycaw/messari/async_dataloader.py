@@ -0,0 +1,189 @@
+"""This module is meant to contain the AsyncDataLoader class"""
+
+
+import asyncio
+from typing import List, Union, Dict, Optional
+
+from pycaw.messari.dataloader import AsyncSingleFlight, BaseDataLoader, RateLimiter, \
+    RetryPolicy, request_key
+from pycaw.messari.response_cache import ResponseCache
+from pycaw.messari.json_decoding import accept_encoding
+
+
+class AsyncRateLimiter(RateLimiter):
+    """RateLimiter whose acquire waits on the event loop instead of blocking a thread."""
+    async def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AsyncResponse:
+    """Status, headers and body of a finished aiohttp request."""
+    def __init__(self, url: str, status_code: int, headers: Dict, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+class AsyncDataLoader(BaseDataLoader):
+    """asyncio counterpart of DataLoader built on a pooled aiohttp session.
+
+    Rate limits, retries, circuit breakers, the response cache and translate
+    behave as in DataLoader. Requires the optional 'aiohttp' dependency, the
+    'async' extra. The session is opened on first use inside the running event
+    loop; close it with 'await loader.close()' or use the loader as an async
+    context manager.
+
+    :param api_dict: dict
+        API key headers sent with each request.
+    :param taxonomy_dict: dict
+        Mapping used by translate.
+    :param max_connections: int
+        Size of the connection pool, i.e. the maximum number of requests in flight.
+    :param timeout: float
+        Total timeout of a single request in seconds.
+
+    Examples
+    --------
+        >>> async with AsyncMessari(api_key) as messari:
+        ...     metrics = await messari.get_asset_metrics(['bitcoin', 'ethereum'])
+    """
+    rate_limiter_class = AsyncRateLimiter
+    single_flight_class = AsyncSingleFlight
+
+    def __init__(self, api_dict: Dict, taxonomy_dict: Dict, max_connections: int = 32,
+                 timeout: float = 30.0, calls_per_sec: Optional[float] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 host_calls_per_sec: Optional[Dict[str, float]] = None,
+                 breaker_threshold: int = 5, breaker_timeout: float = 30.0,
+                 coalesce: bool = True, json_backend: str = 'json'):
+        BaseDataLoader.__init__(self, api_dict, taxonomy_dict, calls_per_sec=calls_per_sec,
+                                response_cache=response_cache, retry_policy=retry_policy,
+                                host_calls_per_sec=host_calls_per_sec,
+                                breaker_threshold=breaker_threshold,
+                                breaker_timeout=breaker_timeout, coalesce=coalesce,
+                                json_backend=json_backend)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self) -> 'AsyncDataLoader':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _get_session(self):
+        if self.session is None:
+            try:
+                import aiohttp
+            except ImportError as err:
+                raise ImportError("AsyncDataLoader requires 'aiohttp'. Install it with "
+                                  "'pip install python-caw[async]'.") from err
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept-Encoding': accept_encoding()})
+        return self.session
+
+    async def close(self) -> None:
+        """Closes the pooled session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_response(self, endpoint_url: str, params: Dict = None,
+                           headers: Dict = None) -> Dict:
+        """Gets response from endpoint and checks for HTTP errors when requesting data.
+
+        :param endpoint_url: str
+            URL API string.
+        :param params: dict
+            Dictionary of query parameters.
+        :param headers: dict
+            Dictionary of headers.
+        :return: JSON with requested data
+        :raises SystemError if HTTP error occurs
+        """
+        lookup = self._cached_lookup(endpoint_url, params, headers)
+        if lookup.fresh:
+            return lookup.entry.payload(self.json_decoder.decode)
+        response = await self._request(endpoint_url, params, lookup.headers)
+        return self._finish_cached(endpoint_url, lookup, response)
+
+    async def _request(self, endpoint_url: str, params: Dict = None,
+                       headers: Dict = None) -> AsyncResponse:
+        """GET, shared with identical requests already in flight on the loop."""
+        if self.single_flight is None:
+            return await self._send(endpoint_url, params, headers)
+        return await self.single_flight.do(request_key(endpoint_url, params, headers),
+                                           lambda: self._send(endpoint_url, params, headers))
+
+    async def _send(self, endpoint_url: str, params: Dict = None,
+                    headers: Dict = None) -> AsyncResponse:
+        """GET with retries, the host's rate limit and its circuit breaker."""
+        session = self._get_session()
+        import aiohttp
+        # aiohttp rejects None values, requests silently drops them
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        if headers:
+            headers = {key: value for key, value in headers.items() if value is not None}
+        limiter, breaker = self._host_state(endpoint_url)
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_call()
+            await limiter.acquire()
+            try:
+                async with session.get(endpoint_url, params=params, headers=headers) as resp:
+                    response = AsyncResponse(str(resp.url), resp.status, dict(resp.headers),
+                                             await resp.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = self._retry_delay(limiter, breaker, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(limiter, breaker, attempt, response.status_code,
+                                          response.headers.get('Retry-After'))
+                if delay is None:
+                    break
+            await asyncio.sleep(delay)
+            attempt += 1
+        if response.status_code >= 400:
+            raise SystemError(f'{response.status_code} Error for url: {response.url}')
+        return response
+
+    async def get_responses(self, endpoint_urls: List[str],
+                            params: Union[Dict, List[Dict]] = None,
+                            headers: Dict = None) -> List[Dict]:
+        """Gets responses from several endpoints concurrently on the event loop.
+
+        At most max_connections requests are in flight at once. If one
+        request fails the others are cancelled and the error is raised.
+
+        :param endpoint_urls: list
+            URL API strings.
+        :param params: dict, list
+            Dictionary of query parameters sent with every request, or a list
+            with one dictionary per URL.
+        :param headers: dict
+            Dictionary of headers sent with every request.
+        :return: List of JSON responses in the same order as endpoint_urls
+        :raises SystemError if HTTP error occurs
+        """
+        if not isinstance(params, list):
+            params = [params] * len(endpoint_urls)
+        if len(params) != len(endpoint_urls):
+            raise ValueError("params must have one entry per endpoint URL")
+        tasks = [asyncio.ensure_future(self.get_response(url, params=url_params, headers=headers))
+                 for url, url_params in zip(endpoint_urls, params)]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
@@ -0,0 +1,164 @@
+"""This module is meant to contain the AsyncMessari class"""
+
+from string import Template
+from typing import Union, List, Dict
+import pandas as pd
+
+from pycaw.messari.async_dataloader import AsyncDataLoader
+from pycaw.messari.dataloader import RetryPolicy
+from pycaw.messari.response_cache import ResponseCache
+from pycaw.messari.messari_api import BASE_URL, BASE_URL_V1, BASE_URL_V2, BASE_URL_MARKETS
+from pycaw.messari.utils import validate_input, convert_flatten, unpack_list_of_dicts, \
+    flatten_to_dataframe
+from pycaw.messari.helpers import fields_payload, format_metric_timeseries, \
+    timeseries_windows, stitch_timeseries, all_assets_payload, MAX_TIMESERIES_POINTS
+
+
+class AsyncMessari(AsyncDataLoader):
+    """asyncio wrapper around the Messari API
+
+    Methods are coroutines with the same parameters and results as their
+    Messari counterparts, see Messari for the available fields and metrics.
+    Multi-asset requests run concurrently on the event loop, with at most
+    max_connections in flight.
+
+    Examples
+    --------
+        >>> async with AsyncMessari(api_key) as messari:
+        ...     metrics, prices = await asyncio.gather(
+        ...         messari.get_asset_metrics(['bitcoin', 'ethereum']),
+        ...         messari.get_metric_timeseries('bitcoin', 'price', start, end))
+    """
+    def __init__(self, api_key=None, max_connections: int = 32, calls_per_sec: float = None,
+                 response_cache: ResponseCache = None, retry_policy: RetryPolicy = None):
+        messari_api_key = {'x-messari-api-key': api_key}
+        AsyncDataLoader.__init__(self, api_dict=messari_api_key, taxonomy_dict=None,
+                                 max_connections=max_connections, calls_per_sec=calls_per_sec,
+                                 response_cache=response_cache, retry_policy=retry_policy)
+
+    async def _get_asset_data(self, base_url_template: Template, asset_slugs: List[str],
+                              payload: Dict, flatten: bool = True) -> Dict:
+        """Concurrently request one endpoint per asset, see Messari._get_asset_data."""
+        urls = [base_url_template.substitute(asset_key=asset) for asset in asset_slugs]
+        responses = await self.get_responses(urls, params=payload, headers=self.api_dict)
+        return {asset: convert_flatten(response['data']) if flatten else response['data']
+                for asset, response in zip(asset_slugs, responses)}
+
+    async def _get_windowed_timeseries(self, base_url_template: Template,
+                                       asset_slugs: List[str], payload: Dict,
+                                       windows: List) -> Dict:
+        """Concurrently request every (asset, window) pair, see Messari._get_windowed_timeseries."""
+        urls, params = [], []
+        for asset in asset_slugs:
+            url = base_url_template.substitute(asset_key=asset)
+            for window_start, window_end in windows:
+                urls.append(url)
+                params.append(dict(payload, start=window_start, end=window_end))
+        responses = await self.get_responses(urls, params=params, headers=self.api_dict)
+
+        response_data = {}
+        for i, asset in enumerate(asset_slugs):
+            asset_responses = responses[i * len(windows):(i + 1) * len(windows)]
+            response_data[asset] = stitch_timeseries(
+                [convert_flatten(response['data']) for response in asset_responses])
+        return response_data
+
+    async def get_all_markets(self, page: int = 1, limit: int = 20,
+                              to_dataframe: bool = True) -> Union[List[Dict], pd.DataFrame]:
+        """Get the list of all exchanges and pairs, see Messari.get_all_markets."""
+        payload = {'page': page, 'limit': limit}
+        response_data = await self.get_response(BASE_URL_MARKETS, params=payload,
+                                                headers=self.api_dict)
+        if to_dataframe:
+            return pd.DataFrame(response_data['data']).set_index('exchange_slug')
+        return response_data['data']
+
+    async def get_all_assets(self, page: int = 1, limit: int = 20,
+                             asset_fields: Union[str, List] = None, asset_metric: str = None,
+                             asset_profile_metric: str = None,
+                             to_dataframe: bool = False) -> Union[List[Dict], pd.DataFrame]:
+        """Get the paginated list of all assets, see Messari.get_all_assets."""
+        payload = all_assets_payload(page, limit, asset_fields=asset_fields,
+                                     asset_metric=asset_metric,
+                                     asset_profile_metric=asset_profile_metric,
+                                     to_dataframe=to_dataframe)
+        response_data = await self.get_response(BASE_URL_V2, params=payload,
+                                                headers=self.api_dict)
+        if to_dataframe:
+            return flatten_to_dataframe(unpack_list_of_dicts(response_data['data']))
+        return unpack_list_of_dicts(response_data['data'])
+
+    async def get_asset(self, asset_slugs: Union[str, List],
+                        asset_fields: Union[str, List] = None,
+                        to_dataframe: bool = True) -> Union[Dict, pd.DataFrame]:
+        """Get basic metadata for an asset, see Messari.get_asset."""
+        asset_slugs = validate_input(asset_slugs)
+        payload = {}
+        if asset_fields:
+            payload['fields'] = fields_payload(asset_fields=asset_fields)
+        base_url_template = Template(f'{BASE_URL_V1}/$asset_key')
+        response_data = await self._get_asset_data(base_url_template, asset_slugs, payload,
+                                                   flatten=not to_dataframe)
+        if to_dataframe:
+            return flatten_to_dataframe(response_data)
+        return response_data
+
+    async def get_asset_profile(self, asset_slugs: Union[str, List],
+                                asset_profile_metric: str = None) -> Dict:
+        """Get all the qualitative information for an asset, see Messari.get_asset_profile."""
+        asset_slugs = validate_input(asset_slugs)
+        payload = {}
+        if asset_profile_metric:
+            payload['fields'] = fields_payload(asset_fields='id',
+                                               asset_profile_metric=asset_profile_metric)
+        base_url_template = Template(f'{BASE_URL_V2}/$asset_key/profile')
+        return await self._get_asset_data(base_url_template, asset_slugs, payload)
+
+    async def get_asset_metrics(self, asset_slugs: Union[str, List], asset_metric: str = None,
+                                to_dataframe: bool = True) -> Union[Dict, pd.DataFrame]:
+        """Get all the quantitative metrics for an asset, see Messari.get_asset_metrics."""
+        asset_slugs = validate_input(asset_slugs)
+        payload = {}
+        if asset_metric:
+            payload['fields'] = f'id,symbol,{asset_metric}'
+        base_url_template = Template(f'{BASE_URL_V1}/$asset_key/metrics')
+        response_data = await self._get_asset_data(base_url_template, asset_slugs, payload,
+                                                   flatten=not to_dataframe)
+        if to_dataframe:
+            return flatten_to_dataframe(response_data)
+        return response_data
+
+    async def get_asset_market_data(self, asset_slugs: Union[str, List],
+                                    to_dataframe: bool = True) -> Union[Dict, pd.DataFrame]:
+        """Get the latest market data for an asset, see Messari.get_asset_market_data."""
+        return await self.get_asset_metrics(asset_slugs=asset_slugs,
+                                            asset_metric='market_data',
+                                            to_dataframe=to_dataframe)
+
+    async def get_metric_timeseries(self, asset_slugs: Union[str, List], asset_metric: str,
+                                    start: str = None, end: str = None, interval: str = '1d',
+                                    to_dataframe: bool = True,
+                                    max_points: int = MAX_TIMESERIES_POINTS,
+                                    dtype: str = 'float64') -> Union[Dict, pd.DataFrame]:
+        """Retrieve historical timeseries data for an asset, see Messari.get_metric_timeseries.
+
+        Long ranges are split into windows of at most max_points points which
+        are requested concurrently.
+        """
+        asset_slugs = validate_input(asset_slugs)
+        payload = {'interval': interval}
+        if start:
+            if not end:
+                raise ValueError('End date must be provided')
+            payload['start'] = start
+            payload['end'] = end
+        base_url_template = Template(f'{BASE_URL}/$asset_key/metrics/{asset_metric}/time-series')
+        windows = timeseries_windows(start, end, interval, max_points) if start else []
+        if len(windows) > 1:
+            response_data = await self._get_windowed_timeseries(base_url_template, asset_slugs,
+                                                                payload, windows)
+        else:
+            response_data = await self._get_asset_data(base_url_template, asset_slugs, payload)
+        if to_dataframe:
+            return format_metric_timeseries(response_data, asset_metric, dtype=dtype)
+        return response_data
@@ -1,22 +1,334 @@
 """This module is meant to contain the DataLoader class"""
 
 
-from typing import List, Union, Dict
+import asyncio
+import datetime
+import email.utils
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Union, Dict, Optional, \
+    Tuple
+from urllib.parse import urlparse
+import pandas as pd
 import requests
-from pycaw.messari.utils import validate_input
+from requests.adapters import HTTPAdapter
+from pycaw.messari.taxonomy import TaxonomyIndex, get_taxonomy_index
+from pycaw.messari.response_cache import CacheEntry, ResponseCache
+from pycaw.messari.json_decoding import DecodeStats, accept_encoding, get_decoder
 
 
-class DataLoader:
-    """This class is meant to represent a base wrapper around
-    a variety of different API's used as data sources
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly at a maximum rate.
+
+    :param calls_per_sec: float
+        Maximum number of calls per second across all threads, unlimited if None.
+    """
+    def __init__(self, calls_per_sec: Optional[float]):
+        if calls_per_sec is not None and calls_per_sec <= 0:
+            raise ValueError("calls_per_sec must be positive")
+        self.interval = 1.0 / calls_per_sec if calls_per_sec else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claims the next call slot and returns the seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        return wait
+
+    def acquire(self) -> None:
+        """Blocks until the caller may make its next call."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def defer(self, seconds: float) -> None:
+        """Holds back every caller for the given time, e.g. after a Retry-After."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed request.
+
+    Delays grow exponentially with full jitter, i.e. a random delay between 0
+    and min(max_backoff, backoff_factor * 2 ** attempt), so concurrent workers
+    don't retry in lockstep. A Retry-After header sets the minimum delay.
+
+    :param max_retries: int
+        Retries after the first attempt, 0 disables retrying.
+    :param backoff_factor: float
+        Base delay in seconds.
+    :param max_backoff: float
+        Upper bound of the jittered delay in seconds.
+    :param max_retry_after: float
+        Give up instead of waiting when the server asks for a longer pause.
+    :param retry_statuses: tuple
+        HTTP status codes that are retried. Connection errors and timeouts
+        are always retried.
+    """
+    def __init__(self, max_retries: int = 3, backoff_factor: float = 0.5,
+                 max_backoff: float = 30.0, max_retry_after: float = 120.0,
+                 retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class CircuitOpenError(SystemError):
+    """Raised without a request while a host's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops requests to a host after consecutive failures.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast for reset_timeout seconds. Then a single trial call is let
+    through: success closes the circuit, failure opens it again.
+
+    :param host: str
+        Host name, used in error messages.
+    :param failure_threshold: int
+        Consecutive failures that open the circuit.
+    :param reset_timeout: float
+        Seconds the circuit stays open before a trial call.
     """
-    def __init__(self, api_dict: Dict, taxonomy_dict: Dict):
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout \
+                    and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError(f'Circuit open for {self.host} after {self.failures} '
+                               f'consecutive failures')
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+def request_key(endpoint_url: str, params: Optional[Dict] = None,
+                headers: Optional[Dict] = None) -> str:
+    """Identity of a GET request, used to coalesce identical in-flight requests."""
+    return json.dumps([endpoint_url, params, headers], sort_keys=True, default=str)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls from several threads into one.
+
+    The first caller of a key runs the call, callers arriving while it is in
+    flight wait for it and share its result or exception.
+    """
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {'executed': 0, 'coalesced': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts of calls actually made and of calls served by another in-flight call."""
+        with self._lock:
+            return dict(self._stats)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Coalesces identical concurrent coroutine calls on one event loop into one.
+
+    The call runs as its own task, so cancelling one waiter doesn't cancel it
+    for the others.
+    """
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._stats = {'executed': 0, 'coalesced': 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts of calls actually made and of calls served by another in-flight call."""
+        return dict(self._stats)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._stats['executed'] += 1
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled
+            task.exception()
+
+
+class _CacheLookup:
+    """Response cache state of a request, see BaseDataLoader._cached_lookup."""
+    __slots__ = ('key', 'entry', 'headers', 'fresh')
+
+    def __init__(self, key: Optional[str], entry: Optional[CacheEntry],
+                 headers: Optional[Dict], fresh: bool):
+        self.key = key
+        self.entry = entry
+        self.headers = headers
+        self.fresh = fresh
+
+
+class BaseDataLoader:
+    """Request policy and taxonomy translation shared by DataLoader and AsyncDataLoader.
+
+    :param api_dict: dict
+        API key headers sent with each request.
+    :param taxonomy_dict: dict, str
+        Mapping used by translate, or the name of a JSON mapping file in the
+        mappings directory. A file is loaded once per process, shared with
+        every other loader and reloaded when it changes on disk.
+    :param calls_per_sec: float
+        Optional cap on the request rate to each host, shared by all threads.
+    :param response_cache: ResponseCache
+        Optional cache of responses, revalidated with ETag/Last-Modified.
+    :param retry_policy: RetryPolicy
+        Retries of failed requests. Defaults to RetryPolicy().
+    :param host_calls_per_sec: dict
+        Rate caps for specific hosts, overriding calls_per_sec.
+    :param breaker_threshold: int
+        Consecutive failures after which requests to a host fail fast with
+        CircuitOpenError, 0 disables circuit breaking.
+    :param breaker_timeout: float
+        Seconds before an open circuit lets a trial request through.
+    :param coalesce: bool
+        Serve identical concurrent requests (same URL, params and headers)
+        with a single network call. Default True.
+    :param json_backend: str
+        JSON decoder, 'json' (stdlib, default), 'orjson' or 'auto' for
+        orjson when installed. orjson decodes integers wider than 64 bits as
+        floats, see get_decoder. Decode calls, bytes and time are reported
+        by decode_stats.
+    """
+    rate_limiter_class = RateLimiter
+    single_flight_class = SingleFlight
+
+    def __init__(self, api_dict: Dict, taxonomy_dict: Union[Dict, str, None],
+                 calls_per_sec: Optional[float] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 host_calls_per_sec: Optional[Dict[str, float]] = None,
+                 breaker_threshold: int = 5, breaker_timeout: float = 30.0,
+                 coalesce: bool = True, json_backend: str = 'json'):
         self.api_dict = api_dict
-        self.taxonomy_dict = taxonomy_dict
-        self.session = requests.Session()
+        self._taxonomy: Union[TaxonomyIndex, str] = TaxonomyIndex()
+        self.set_taxonomy_dict(taxonomy_dict)
+        self.calls_per_sec = calls_per_sec
+        self.host_calls_per_sec = host_calls_per_sec or {}
+        self.response_cache = response_cache
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self.rate_limiters: Dict[str, RateLimiter] = {}
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._host_lock = threading.Lock()
+        self.single_flight = self.single_flight_class() if coalesce else None
+        self.json_decoder = DecodeStats(get_decoder(json_backend))
 
-    def __del__(self):
-        self.session.close()
+    @property
+    def decode_stats(self) -> Dict[str, Union[int, float]]:
+        """Number of decoded responses, their total size and the seconds spent decoding."""
+        return self.json_decoder.stats
+
+    @property
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Counts of requests sent and of requests served by an identical in-flight one."""
+        if self.single_flight is None:
+            return {'executed': 0, 'coalesced': 0}
+        return self.single_flight.stats
 
     def set_api_dict(self, api_dict: Dict) -> None:
         """Sets a new dictionary to be used as an API key pair
@@ -26,17 +338,182 @@ class DataLoader:
         """
         self.api_dict = api_dict
 
-    def set_taxonomy_dict(self, taxonomy_dict: Dict) -> None:
+    @property
+    def taxonomy(self) -> TaxonomyIndex:
+        """Index used by translate, the latest one of a mapping file."""
+        if isinstance(self._taxonomy, str):
+            return get_taxonomy_index(self._taxonomy)
+        return self._taxonomy
+
+    @property
+    def taxonomy_dict(self) -> Dict[str, str]:
+        """Read-only view of the taxonomy translations."""
+        return self.taxonomy.forward
+
+    @taxonomy_dict.setter
+    def taxonomy_dict(self, taxonomy_dict: Union[Dict, str, None]) -> None:
+        self.set_taxonomy_dict(taxonomy_dict)
+
+    def set_taxonomy_dict(self, taxonomy_dict: Union[Dict, str, None]) -> None:
         """Sets a new dictionary to be used for taxonomy translations
 
-        :param taxonomy_dict: Dict
-            New taxonomy dictionary
+        :param taxonomy_dict: Dict, str
+            New taxonomy dictionary, or the name of a JSON mapping file
+        """
+        if isinstance(taxonomy_dict, (str, TaxonomyIndex)):
+            self._taxonomy = taxonomy_dict
+        else:
+            self._taxonomy = TaxonomyIndex(taxonomy_dict)
+
+    def _host_state(self, endpoint_url: str) -> Tuple[RateLimiter, Optional[CircuitBreaker]]:
+        host = urlparse(endpoint_url).netloc
+        with self._host_lock:
+            limiter = self.rate_limiters.get(host)
+            if limiter is None:
+                limiter = self.rate_limiter_class(
+                    self.host_calls_per_sec.get(host, self.calls_per_sec))
+                self.rate_limiters[host] = limiter
+            breaker = self.circuit_breakers.get(host)
+            if breaker is None and self.breaker_threshold > 0:
+                breaker = CircuitBreaker(host, self.breaker_threshold, self.breaker_timeout)
+                self.circuit_breakers[host] = breaker
+        return limiter, breaker
+
+    def _retry_delay(self, limiter: RateLimiter, breaker: Optional[CircuitBreaker],
+                     attempt: int, status: Optional[int] = None,
+                     retry_after: Optional[str] = None) -> Optional[float]:
+        """Records the outcome of an attempt and returns the delay before retrying it.
+
+        :param status: int
+            HTTP status code, None for a connection error or timeout.
+        :param retry_after: str
+            Retry-After header of the response.
+        :return: Seconds to wait, or None if the request must not be retried
+        """
+        policy = self.retry_policy
+        retryable = status is None or status in policy.retry_statuses
+        if breaker is not None:
+            if retryable or status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        if not retryable or attempt >= policy.max_retries:
+            return None
+        retry_after_sec = parse_retry_after(retry_after)
+        if retry_after_sec is not None:
+            if retry_after_sec > policy.max_retry_after:
+                return None
+            # Every worker talking to this host waits, not only this one
+            limiter.defer(retry_after_sec)
+        return policy.delay(attempt, retry_after_sec)
+
+    def _cached_lookup(self, endpoint_url: str, params: Dict = None,
+                       headers: Dict = None) -> _CacheLookup:
+        """Response cache step before a request, shared by the blocking and async get_response.
+
+        :return: _CacheLookup. When fresh, answer from entry without a request,
+            otherwise send the request with its headers, which revalidate a
+            stale entry, and pass the response to _finish_cached.
+        """
+        cache = self.response_cache
+        if cache is None:
+            return _CacheLookup(None, None, headers, False)
+        key = cache.key(endpoint_url, params)
+        entry = cache.load(key)
+        if entry is not None:
+            if cache.is_fresh(endpoint_url, entry):
+                cache.record('hits')
+                return _CacheLookup(key, entry, headers, True)
+            headers = {**(headers or {}), **entry.conditional_headers()}
+        return _CacheLookup(key, entry, headers, False)
+
+    def _finish_cached(self, endpoint_url: str, lookup: _CacheLookup, response) -> Any:
+        """Response cache step after a request: decode, refreshing or storing the entry.
+
+        :param response: requests.Response, AsyncResponse
+            Response to the request sent with lookup.headers.
+        :return: JSON with requested data
+        """
+        cache = self.response_cache
+        if cache is None:
+            return self.json_decoder.decode(response.content)
+        entry = lookup.entry
+        if entry is not None and response.status_code == 304:
+            cache.record('revalidated')
+            cache.store(lookup.key, CacheEntry(entry.content, entry.etag, entry.last_modified))
+            return entry.payload(self.json_decoder.decode)
+        cache.record('misses')
+        fetched = CacheEntry(response.content, response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'))
+        if cache.should_store(endpoint_url, fetched):
+            cache.store(lookup.key, fetched)
+        return self.json_decoder.decode(response.content)
+
+    def translate(self, input_slugs: Union[str, List, pd.Series]) -> Union[List, pd.Series]:
+        """Wrapper around messari.utils.validate_input,
+        validate input & check if it's supported by DeFi Llama
+
+        Parameters
+        ----------
+           input_slugs: str, list, pd.Series
+               Single input slug string, list of input slugs (i.e. bitcoin)
+               or Series of slugs
+
+        Returns
+        -------
+           List, pd.Series
+               list of validated & translated slugs, or the translated Series
         """
-        self.taxonomy_dict = taxonomy_dict
+        if isinstance(input_slugs, pd.Series):
+            return self.taxonomy.translate_series(input_slugs)
+        return self.taxonomy.translate(input_slugs)
+
+
+class DataLoader(BaseDataLoader):
+    """This class is meant to represent a base wrapper around
+    a variety of different API's used as data sources
+
+    Requests are made with a pooled requests.Session. See BaseDataLoader
+    for the rate limit, retry, circuit breaker and cache parameters.
+
+    :param api_dict: dict
+        API key headers sent with each request.
+    :param taxonomy_dict: dict
+        Mapping used by translate.
+    :param max_workers: int
+        Maximum number of requests in flight at once for multi-request calls.
+    """
+    def __init__(self, api_dict: Dict, taxonomy_dict: Dict, max_workers: int = 8,
+                 calls_per_sec: Optional[float] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 host_calls_per_sec: Optional[Dict[str, float]] = None,
+                 breaker_threshold: int = 5, breaker_timeout: float = 30.0,
+                 coalesce: bool = True, json_backend: str = 'json'):
+        BaseDataLoader.__init__(self, api_dict, taxonomy_dict, calls_per_sec=calls_per_sec,
+                                response_cache=response_cache, retry_policy=retry_policy,
+                                host_calls_per_sec=host_calls_per_sec,
+                                breaker_threshold=breaker_threshold,
+                                breaker_timeout=breaker_timeout, coalesce=coalesce,
+                                json_backend=json_backend)
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        # Large payloads compress well, ask for brotli too when it can be decoded
+        self.session.headers['Accept-Encoding'] = accept_encoding()
+        # Let every worker keep its own pooled connection to the host.
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __del__(self):
+        self.session.close()
 
     def get_response(self, endpoint_url: str, params: Dict = None, headers: Dict = None) -> Dict:
         """Gets response from endpoint and checks for HTTP errors when requesting data.
 
+        With a response_cache, fresh entries are returned without a request
+        and stale ones are revalidated with a conditional request.
+
         :param endpoint_url: str
             URL API string.
         :param params: dict
@@ -44,34 +521,121 @@ class DataLoader:
         :return: JSON with requested data
         :raises SystemError if HTTP error occurs
         """
+        lookup = self._cached_lookup(endpoint_url, params, headers)
+        if lookup.fresh:
+            return lookup.entry.payload(self.json_decoder.decode)
+        response = self._request(endpoint_url, params, lookup.headers)
+        return self._finish_cached(endpoint_url, lookup, response)
+
+    def _request(self, endpoint_url: str, params: Dict = None,
+                 headers: Dict = None) -> requests.Response:
+        """GET, shared with identical requests already in flight from other threads.
+
+        Waiters share the response object but each decodes its own payload.
+        """
+        if self.single_flight is None:
+            return self._send(endpoint_url, params, headers)
+        return self.single_flight.do(request_key(endpoint_url, params, headers),
+                                     lambda: self._send(endpoint_url, params, headers))
+
+    def _send(self, endpoint_url: str, params: Dict = None,
+              headers: Dict = None) -> requests.Response:
+        """GET with retries, the host's rate limit and its circuit breaker."""
+        limiter, breaker = self._host_state(endpoint_url)
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_call()
+            limiter.acquire()
+            try:
+                response = self.session.get(endpoint_url, params=params, headers=headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                delay = self._retry_delay(limiter, breaker, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(limiter, breaker, attempt, response.status_code,
+                                          response.headers.get('Retry-After'))
+                if delay is None:
+                    break
+            time.sleep(delay)
+            attempt += 1
         try:
-            response = self.session.get(endpoint_url, params=params, headers=headers)
             response.raise_for_status()
-            return response.json()
+            return response
         except requests.exceptions.HTTPError as e:
             # NOTE if this doesn't work remove 'from e'
             raise SystemError(e) from e
 
-    def translate(self, input_slugs: Union[str, List]) -> Union[List, None]:
-        """Wrapper around messari.utils.validate_input,
-        validate input & check if it's supported by DeFi Llama
+    def get_responses(self, endpoint_urls: List[str], params: Union[Dict, List[Dict]] = None,
+                      headers: Dict = None) -> List[Dict]:
+        """Gets responses from several endpoints concurrently over the shared session.
 
-        Parameters
-        ----------
-           input_slugs: str, list
-               Single input slug string or list of input slugs (i.e. bitcoin)
+        At most max_workers requests are in flight at once and the optional
+        rate limit applies across all of them.
 
-        Returns
-        -------
-           List
-               list of validated & translated slugs
+        :param endpoint_urls: list
+            URL API strings.
+        :param params: dict, list
+            Dictionary of query parameters sent with every request, or a list
+            with one dictionary per URL.
+        :param headers: dict
+            Dictionary of headers sent with every request.
+        :return: List of JSON responses in the same order as endpoint_urls
+        :raises SystemError if HTTP error occurs
         """
-        slugs = validate_input(input_slugs)
+        if not isinstance(params, list):
+            params = [params] * len(endpoint_urls)
+        if len(params) != len(endpoint_urls):
+            raise ValueError("params must have one entry per endpoint URL")
+        if len(endpoint_urls) <= 1 or self.max_workers <= 1:
+            return [self.get_response(url, params=url_params, headers=headers)
+                    for url, url_params in zip(endpoint_urls, params)]
+        num_workers = min(self.max_workers, len(endpoint_urls))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(self.get_response, url, params=url_params, headers=headers)
+                       for url, url_params in zip(endpoint_urls, params)]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                # Fail fast, don't keep spending API calls on a failed batch
+                for future in futures:
+                    future.cancel()
+                raise
 
-        translated_slugs = []
-        for slug in slugs:
-            if slug in self.taxonomy_dict.keys():
-                translated_slugs.append(self.taxonomy_dict[slug])
-            else:
-                translated_slugs.append(slug)
-        return translated_slugs
+    def map_completed(self, func: Callable[[Any], Any],
+                      items: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+        """Runs func(item) on max_workers threads, yielding results as they complete.
+
+        Meant for work that requests and then parses, so that parsing one
+        response overlaps with downloading the next ones. At most
+        2 * max_workers items are submitted ahead of the consumer. If func
+        raises, or the consumer stops iterating, items not yet started are
+        cancelled.
+
+        :param func: function
+            Function of one item, typically calling get_response.
+        :param items: iterable
+            Items to run func on.
+        :return: Iterator of (item, func(item)) in completion order
+        """
+        items = iter(items)
+        if self.max_workers <= 1:
+            for item in items:
+                yield item, func(item)
+            return
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = {executor.submit(func, item): item
+                   for item in islice(items, 2 * self.max_workers)}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    result = future.result()
+                    # Refill before handing the result over, keep the workers busy
+                    for next_item in islice(items, 1):
+                        pending[executor.submit(func, next_item)] = next_item
+                    yield item, result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
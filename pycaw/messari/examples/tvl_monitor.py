@@ -1,9 +1,7 @@
-from messari.defillama import DeFiLlama
+from pycaw.defillama import DeFiLlama
+from pycaw.defillama.helpers import tvl_decomposition
 import sys
-from messari.utils import validate_input
-import pandas as pd
-import numpy as np
-import math
+from pycaw.messari.utils import validate_input
 import seaborn as sns
 import matplotlib.pyplot as plt
 import argparse
@@ -12,43 +10,6 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
-
-
-def clean_tvl_data(multiindex_df):
-    # identify chains
-    chains = list(multiindex_df.columns.levels[1])
-    # keep only USD columns
-    protocol_name = multiindex_df.columns.levels[0][0]
-    cols_to_remove = []
-    for chain in chains:
-        cols_to_drop = list(multiindex_df[protocol_name][chain].columns)
-        cols_to_drop = [x for x in cols_to_drop if '_usd' not in x]
-        cols_to_drop = [(chain, x) for x in cols_to_drop]
-        cols_to_remove = cols_to_drop + cols_to_remove
-    multiindex_df = multiindex_df[protocol_name].drop(cols_to_remove, axis=1)
-    chain_dfs = []
-    for chain in chains:
-        chain_df = multiindex_df[chain]
-        if len(chain_df.columns) > 9:
-            # Calculate top 10 protocols by TVL and sum the rest as other
-            current_tvl = chain_df.iloc[-1]
-            current_tvl = current_tvl.to_frame(name='tvl')
-            current_tvl.fillna(0, inplace=True)
-            current_tvl['dom'] = (current_tvl['tvl'] / sum(current_tvl['tvl'])) * 100
-            cols_to_keep = list(current_tvl.sort_values(by='dom', ascending=False).index[:9])
-            cols_to_sum_as_other = [x for x in chain_df.columns if x not in cols_to_keep]
-            chain_df['Other'] = chain_df[cols_to_sum_as_other].sum(axis=1)
-            chain_df = chain_df[cols_to_keep + ['Other']]
-            chain_df = chain_df.interpolate(method='linear', limit_direction='forward', axis=0)
-            chain_df.columns = [x.split('_')[0] for x in list(chain_df.columns)]
-            chain_dfs.append(chain_df)
-        else:
-            chain_df.columns = [x.split('_')[0] for x in list(chain_df.columns)]
-            chain_df = chain_df.interpolate(method='linear', limit_direction='forward', axis=0)
-            chain_dfs.append(chain_df)
-
-    return pd.concat(chain_dfs, keys=chains, axis=1)
-
 def billions(x, pos):
     """The two args are the value and tick position."""
     return '${:1.0f}B'.format(x*1e-9)
@@ -85,7 +46,7 @@ sns.set_palette(sns.color_palette(colors))
 # Get & clean TVL data from DeFiLlama
 dl = DeFiLlama()
 protocol_tvls = dl.get_protocol_tvl_timeseries(protocols, start_date=start, end_date=end)
-df = clean_tvl_data(protocol_tvls)
+df = tvl_decomposition(protocol_tvls)
 
 protocol_name = protocols[0].capitalize()
 total_subplots = len(list(df.columns.levels[0]))
@@ -2,7 +2,8 @@
 
 
 import logging
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 
 from pycaw.messari.utils import validate_input, validate_asset_fields_list_order, find_and_update_asset_field
@@ -43,21 +44,225 @@ def fields_payload(asset_fields: Union[str, List],
     return ','.join(asset_fields)
 
 
-def timeseries_to_dataframe(response: Dict) -> pd.DataFrame:
+def all_assets_payload(page: int, limit: int, asset_fields: Union[str, List] = None,
+                       asset_metric: str = None, asset_profile_metric: str = None,
+                       to_dataframe: bool = False) -> Dict:
+    """Returns query parameters of a request for all assets.
+
+    :param page: int
+        Page number starting at 1.
+    :param limit: int
+        Number of assets per page.
+    :param asset_fields: str, list
+        List of asset fields.
+    :param asset_metric: str
+        Single metric string to filter metric data.
+    :param asset_profile_metric: str
+        Single profile metric string to filter profile data.
+    :param to_dataframe: bool
+        Whether the response is going to be returned as DataFrame.
+    :return: Dictionary of query parameters
+    :raises ValueError if a DataFrame is requested for non-metric data
+    """
+    payload = {'page': page, 'limit': limit}
+    if asset_fields:
+        payload['fields'] = fields_payload(asset_fields=asset_fields, asset_metric=asset_metric,
+                                           asset_profile_metric=asset_profile_metric)
+    # DataFrame returned if asset metric is provided or if metrics is the only asset field
+    if to_dataframe:
+        # DataFrame can't be returned because profile data has been requested.
+        if asset_profile_metric:
+            raise ValueError('Profile data can only be returned as JSON. '
+                             'Only asset metric data can be returned as DataFrame.')
+
+        # DataFrame can be returned because only metrics has been requested
+        if asset_metric and not asset_fields:
+            asset_fields = ['metrics']
+            payload['fields'] = fields_payload(asset_fields=asset_fields,
+                                               asset_metric=asset_metric)
+        # DataFrame can be returned because only metrics has been requested
+        elif asset_fields and all(elem == 'metrics' for elem in asset_fields):
+            # If asset metric is supplied, filter data based on metric
+            if asset_metric:
+                payload['fields'] = fields_payload(asset_fields=asset_fields,
+                                                   asset_metric=asset_metric)
+            # Else return all metrics
+            else:
+                payload['fields'] = fields_payload(asset_fields=asset_fields)
+        else:
+            raise ValueError(
+                'Only asset metrics can be returned as DataFrame. Make sure only '
+                'metrics is specified in asset fields.')
+    return payload
+
+
+# Messari returns at most this many points per timeseries request
+MAX_TIMESERIES_POINTS = 2016
+
+TIMESERIES_INTERVALS = {
+    '1m': pd.Timedelta(minutes=1),
+    '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15),
+    '30m': pd.Timedelta(minutes=30),
+    '1h': pd.Timedelta(hours=1),
+    '1hr': pd.Timedelta(hours=1),
+    '1d': pd.Timedelta(days=1),
+    '1w': pd.Timedelta(weeks=1),
+}
+
+
+def timeseries_windows(start: str, end: str, interval: str,
+                       max_points: int = MAX_TIMESERIES_POINTS) -> List[Tuple[str, str]]:
+    """Split a timeseries date range into windows small enough for one request.
+
+    Consecutive windows share their boundary timestamp so that no point is
+    lost to rounding; stitch_timeseries drops the duplicate.
+
+    :param start: str
+        Starting date or RFC 3339 timestamp.
+    :param end: str
+        Ending date or RFC 3339 timestamp.
+    :param interval: str
+        Interval of timeseries data, i.e. 5m or 1d.
+    :param max_points: int
+        Maximum number of points per window.
+    :return: List of (start, end) RFC 3339 strings, or [(start, end)] unchanged
+        when the range fits in a single request or the interval is unknown.
+    """
+    step = TIMESERIES_INTERVALS.get(interval)
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    if step is None or max_points < 2 or end_ts <= start_ts:
+        return [(start, end)]
+    window = step * (max_points - 1)
+    if end_ts - start_ts <= window:
+        return [(start, end)]
+
+    windows = []
+    window_start = start_ts
+    while window_start < end_ts:
+        window_end = min(window_start + window, end_ts)
+        windows.append((_rfc3339(window_start), _rfc3339(window_end)))
+        window_start = window_end
+    return windows
+
+
+def _rfc3339(timestamp: pd.Timestamp) -> str:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def stitch_timeseries(window_responses: List[Dict]) -> Dict:
+    """Merge flattened timeseries responses for consecutive windows of one asset.
+
+    Values are de-duplicated on timestamp, keeping the first occurrence, and
+    sorted, so the result has the same shape as a single-request response
+    and can be passed to timeseries_to_dataframe.
+
+    :param window_responses: list
+        Flattened response data (convert_flatten of response['data']) per window.
+    :return: Flattened response data covering the whole range
+    """
+    stitched = dict(window_responses[0])
+    values_by_ts = {}
+    has_values = False
+    for window_response in window_responses:
+        values = window_response.get('values')
+        if not isinstance(values, list):
+            continue
+        has_values = True
+        for row in values:
+            values_by_ts.setdefault(row[0], row)
+    stitched['values'] = [values_by_ts[ts] for ts in sorted(values_by_ts)] if has_values else None
+    if 'parameters_start' in stitched:
+        stitched['parameters_start'] = window_responses[0].get('parameters_start')
+        stitched['parameters_end'] = window_responses[-1].get('parameters_end')
+    return stitched
+
+
+def timeseries_to_dataframe(response: Dict, dtype: str = 'float64') -> pd.DataFrame:
     """Convert timeseries data to pandas dataframe
 
+    The result is allocated once: timestamps of every asset are merged into
+    a single sorted int64 epoch-ms index and each asset's values are written
+    into its slice of one preallocated NumPy array, instead of building a
+    DataFrame per asset and concatenating them.
+
     :param response: dict
         Dictionary of asset time series data keyed by symbol
+    :param dtype: str
+        Storage dtype of the values, 'float64' or 'float32'. float32 halves
+        memory at the cost of precision.
     :return: pandas dataframe
     """
-    df_list, key_list = [], []
+    if dtype not in ('float64', 'float32'):
+        raise ValueError("dtype must be 'float64' or 'float32'")
+    key_list, columns_list, timestamps_list, values_list = [], [], [], []
     for key, value in response.items():
+        if not isinstance(value['values'], list):
+            logging.warning('Missing timeseries data for %s', key)
+            continue
+        columns = [f'{name}' for name in value['parameters_columns']]
+        ts_col = columns.index('timestamp')
+        try:
+            array = np.array(value['values'], dtype='float64')
+        except (TypeError, ValueError):
+            # Non-numeric values, fall back to per-asset frames
+            return _timeseries_to_dataframe_concat(response, dtype)
+        array = array.reshape(len(value['values']), len(columns))
         key_list.append(key)
+        columns_list.append(columns[:ts_col] + columns[ts_col + 1:])
+        timestamps_list.append(array[:, ts_col].astype('int64'))
+        values_list.append(np.delete(array, ts_col, axis=1))
+    if not key_list:
+        raise ValueError('No objects to concatenate')
+
+    # Sorted merge of the per-asset (already sorted) timestamps into one index
+    timestamps = np.concatenate(timestamps_list)
+    timestamps.sort(kind='stable')
+    if len(timestamps):
+        keep = np.empty(len(timestamps), dtype=bool)
+        keep[0] = True
+        np.not_equal(timestamps[1:], timestamps[:-1], out=keep[1:])
+        timestamps = timestamps[keep]
+
+    num_columns = sum(len(columns) for columns in columns_list)
+    data = np.full((len(timestamps), num_columns), np.nan, dtype=dtype)
+    column_tuples = []
+    offset = 0
+    for key, columns, asset_ts, values in zip(key_list, columns_list,
+                                              timestamps_list, values_list):
+        rows = np.searchsorted(timestamps, asset_ts)
+        data[rows, offset:offset + len(columns)] = values
+        column_tuples.extend((key, column) for column in columns)
+        offset += len(columns)
+
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='ms', origin='unix'),
+                             name='timestamp')
+    return pd.DataFrame(data, index=index, columns=pd.MultiIndex.from_tuples(column_tuples),
+                        copy=False)
+
+
+def _timeseries_to_dataframe_concat(response: Dict, dtype: Optional[str] = None) -> pd.DataFrame:
+    """Convert timeseries data to pandas dataframe with one frame per asset and a concat
+
+    :param response: dict
+        Dictionary of asset time series data keyed by symbol
+    :param dtype: str
+        Optional storage dtype of the values. Values that are not numbers
+        become NaN, as they would have to for a float dtype.
+    :return: pandas dataframe
+    """
+    df_list, key_list = [], []
+    for key, value in response.items():
         if isinstance(value['values'], list):
             df_columns=[f'{name}' for name in value['parameters_columns']]
             values_df = pd.DataFrame.from_records(value['values'], columns=df_columns)
             values_df.set_index('timestamp', inplace=True)
             values_df.index = pd.to_datetime(values_df.index, unit='ms', origin='unix')  # noqa
+            if dtype is not None:
+                values_df = values_df.apply(pd.to_numeric, errors='coerce').astype(dtype)
+            key_list.append(key)
             df_list.append(values_df)
         else:
             logging.warning('Missing timeseries data for %s', key)
@@ -65,3 +270,25 @@ def timeseries_to_dataframe(response: Dict) -> pd.DataFrame:
     # Create multindex DataFrame using list of dataframes & keys
     metric_data_df = pd.concat(df_list, keys=key_list, axis=1)
     return metric_data_df
+
+
+def format_metric_timeseries(response_data: Dict, asset_metric: str,
+                             dtype: str = 'float64') -> pd.DataFrame:
+    """Convert timeseries response data to the DataFrame get_metric_timeseries returns.
+
+    Metrics other than price have a single value column, which is dropped
+    from the column MultiIndex so the frame is keyed by asset only.
+
+    :param response_data: dict
+        Dictionary of flattened asset time series data keyed by asset
+    :param asset_metric: str
+        Metric the data was requested for
+    :param dtype: str
+        Storage dtype of the values, 'float64' or 'float32'.
+    :return: pandas dataframe
+    """
+    timeseries_df = timeseries_to_dataframe(response_data, dtype=dtype)
+    if asset_metric != 'price':
+        col_name = timeseries_df.columns[0][1]
+        timeseries_df = timeseries_df.xs(col_name, axis=1, level=1)
+    return timeseries_df
@@ -0,0 +1,93 @@
+"""This module is meant to contain the JSON decoding helpers used by DataLoader"""
+
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # noqa: F401
+    BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI = True
+    except ImportError:
+        BROTLI = False
+
+JSON_BACKENDS = ('auto', 'orjson', 'json')
+
+
+def get_decoder(backend: str = 'json') -> Callable[[Union[bytes, str]], Any]:
+    """Returns a JSON decoder taking raw UTF-8 bytes.
+
+    orjson is faster but not a drop-in replacement: it decodes integers wider
+    than 64 bits (token supplies, wei amounts) as lossy floats and rejects
+    the NaN/Infinity literals the stdlib accepts. Payloads it rejects are
+    decoded again with the stdlib, so it is only a fallback for the latter.
+
+    :param backend: str
+        'json' (stdlib, default), 'orjson' or 'auto', which uses orjson when
+        it is installed and the stdlib otherwise.
+    :return: Decoding function
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f'backend must be one of {JSON_BACKENDS}')
+    if backend == 'orjson' or (backend == 'auto' and orjson is not None):
+        if orjson is None:
+            raise ImportError("The 'orjson' JSON backend requires 'orjson'. "
+                              "Install it with 'pip install orjson'.")
+        return _orjson_loads
+    return json.loads
+
+
+def _orjson_loads(content: Union[bytes, str]) -> Any:
+    """orjson.loads, retrying with json.loads what orjson rejects."""
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return json.loads(content)
+
+
+def accept_encoding() -> str:
+    """Accept-Encoding header for the compressions the HTTP clients can decode.
+
+    Brotli is only offered when a brotli package is installed, since neither
+    urllib3 nor aiohttp can decode it otherwise.
+    """
+    return 'gzip, deflate, br' if BROTLI else 'gzip, deflate'
+
+
+class DecodeStats:
+    """Thread-safe totals of JSON decoding work.
+
+    :param decoder: function
+        Decoder from get_decoder.
+    """
+    def __init__(self, decoder: Callable[[Union[bytes, str]], Any]):
+        self.decoder = decoder
+        self._stats = {'calls': 0, 'bytes': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Number of decoded payloads, their total size and the time spent decoding them."""
+        with self._lock:
+            return dict(self._stats)
+
+    def decode(self, content: Union[bytes, str]) -> Any:
+        """Decodes a payload and records its size and decode time."""
+        start = time.perf_counter()
+        payload = self.decoder(content)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['bytes'] += len(content)
+            self._stats['seconds'] += elapsed
+        return payload
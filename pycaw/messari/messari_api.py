@@ -1,27 +1,149 @@
 """This module is meant to contain the Messari class"""
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from string import Template
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Iterator, Optional
 import pandas as pd
 
-from pycaw.messari.dataloader import DataLoader
-from pycaw.messari.utils import validate_input, convert_flatten, unpack_list_of_dicts
-from pycaw.messari.helpers import fields_payload, timeseries_to_dataframe
+from pycaw.messari.dataloader import DataLoader, RetryPolicy
+from pycaw.messari.response_cache import ResponseCache
+from pycaw.messari.utils import validate_input, convert_flatten, unpack_list_of_dicts, \
+    flatten_to_dataframe
+from pycaw.messari.helpers import fields_payload, format_metric_timeseries, \
+    timeseries_windows, stitch_timeseries, all_assets_payload, MAX_TIMESERIES_POINTS
 
 BASE_URL = 'https://data.messari.io/api/v1/assets'
 BASE_URL_V1 = 'https://data.messari.io/api/v1/assets'
 BASE_URL_V2 = 'https://data.messari.io/api/v2/assets'
 BASE_URL_MARKETS = 'https://data.messari.io/api/v1/markets'
 
+MAX_PAGE_LIMIT = 500
+
 
 class Messari(DataLoader):
     """This class is a wrapper around the Messari API
+
+    Multi-asset methods request their assets concurrently, with at most
+    max_workers requests in flight and an optional calls_per_sec rate cap.
+    An optional response_cache serves unchanged responses from memory/disk.
+    Transient failures (429, 5xx, connection errors) are retried with backoff
+    according to retry_policy.
     """
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, max_workers: int = 8, calls_per_sec: float = None,
+                 response_cache: ResponseCache = None, retry_policy: RetryPolicy = None):
         messari_api_key = {'x-messari-api-key': api_key}
-        DataLoader.__init__(self, api_dict=messari_api_key, taxonomy_dict=None)
+        DataLoader.__init__(self, api_dict=messari_api_key, taxonomy_dict=None,
+                            max_workers=max_workers, calls_per_sec=calls_per_sec,
+                            response_cache=response_cache, retry_policy=retry_policy)
         # TODO, look into super() for __init__
 
+    def _get_asset_data(self, base_url_template: Template, asset_slugs: List[str],
+                        payload: Dict, flatten: bool = True) -> Dict:
+        """Concurrently request one endpoint per asset and flatten each response.
+
+        :param base_url_template: Template
+            URL template with an $asset_key placeholder.
+        :param asset_slugs: list
+            List of asset slugs.
+        :param payload: dict
+            Query parameters shared by every request.
+        :param flatten: bool
+            Flatten each response with convert_flatten. Set to False when the
+            data goes to flatten_to_dataframe instead.
+        :return: Dictionary of response data keyed by asset, in input order
+        """
+        urls = [base_url_template.substitute(asset_key=asset) for asset in asset_slugs]
+        responses = self.get_responses(urls, params=payload, headers=self.api_dict)
+        return {asset: convert_flatten(response['data']) if flatten else response['data']
+                for asset, response in zip(asset_slugs, responses)}
+
+    def _get_windowed_timeseries(self, base_url_template: Template, asset_slugs: List[str],
+                                 payload: Dict, windows: List) -> Dict:
+        """Concurrently request every (asset, window) pair and stitch each asset.
+
+        :param base_url_template: Template
+            Timeseries URL template with an $asset_key placeholder.
+        :param asset_slugs: list
+            List of asset slugs.
+        :param payload: dict
+            Query parameters shared by every request.
+        :param windows: list
+            List of (start, end) strings from timeseries_windows.
+        :return: Dictionary of flattened, stitched response data keyed by asset
+        """
+        urls, params = [], []
+        for asset in asset_slugs:
+            url = base_url_template.substitute(asset_key=asset)
+            for window_start, window_end in windows:
+                urls.append(url)
+                params.append(dict(payload, start=window_start, end=window_end))
+        responses = self.get_responses(urls, params=params, headers=self.api_dict)
+
+        response_data = {}
+        for i, asset in enumerate(asset_slugs):
+            asset_responses = responses[i * len(windows):(i + 1) * len(windows)]
+            response_data[asset] = stitch_timeseries(
+                [convert_flatten(response['data']) for response in asset_responses])
+        return response_data
+
+    def _iter_pages(self, endpoint_url: str, payload: Dict, limit: int, prefetch: int,
+                    max_pages: Optional[int] = None) -> Iterator[List[Dict]]:
+        """Yield the 'data' list of each page in order, keeping pages prefetched.
+
+        Up to prefetch page requests are in flight ahead of the consumer.
+        Iteration stops at the first short or empty page, or when the API
+        reports that a page past the first does not exist.
+
+        :param endpoint_url: str
+            Paginated endpoint URL.
+        :param payload: dict
+            Query parameters other than page and limit.
+        :param limit: int
+            Page size.
+        :param prefetch: int
+            Number of pages requested ahead of the one being consumed.
+        :param max_pages: int
+            Optional maximum number of pages to read.
+        :return: Iterator over lists of page records
+        """
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_LIMIT}')
+        prefetch = max(1, prefetch)
+        next_page = 1
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+
+            def submit_next():
+                nonlocal next_page
+                if max_pages is not None and next_page > max_pages:
+                    return
+                page_payload = dict(payload, page=next_page, limit=limit)
+                future = executor.submit(self.get_response, endpoint_url,
+                                         params=page_payload, headers=self.api_dict)
+                pending.append((next_page, future))
+                next_page += 1
+
+            try:
+                for _ in range(prefetch):
+                    submit_next()
+                while pending:
+                    page, future = pending.popleft()
+                    try:
+                        page_data = future.result().get('data') or []
+                    except SystemError as err:
+                        if page > 1 and _is_not_found(err):
+                            return
+                        raise
+                    if page_data:
+                        yield page_data
+                    if len(page_data) < limit:
+                        return
+                    submit_next()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
     #######################
     # markets
     #######################
@@ -50,6 +172,35 @@ class Messari(DataLoader):
             return pd.DataFrame(response_data['data']).set_index('exchange_slug')
         return response_data['data']
 
+    def iter_all_markets(self, limit: int = MAX_PAGE_LIMIT, prefetch: int = 4,
+                         max_pages: int = None) -> Iterator[Dict]:
+        """Stream every market across all pages of get_all_markets.
+
+        Pages are requested at the maximum page size with several pages
+        prefetched concurrently, and iteration stops cleanly after the last page.
+
+        Parameters
+        ----------
+            limit: int
+                Page size. Default and max value is 500.
+            prefetch: int
+                Number of pages requested ahead of the one being read. Default is 4.
+            max_pages: int
+                Optional maximum number of pages to read.
+
+        Returns
+        -------
+            Iterator[dict]
+                One dictionary per market.
+
+        Examples
+        --------
+            >>> markets_df = pd.DataFrame(messari.iter_all_markets()).set_index('exchange_slug')
+        """
+        for page_data in self._iter_pages(BASE_URL_MARKETS, {}, limit=limit,
+                                          prefetch=prefetch, max_pages=max_pages):
+            yield from page_data
+
     #######################
     # assets
     #######################
@@ -124,43 +275,62 @@ class Messari(DataLoader):
             dict, DataFrame
                 Dictionary or pandas DataFrame of asset data.
         """
-        payload = {'page': page, 'limit': limit}
-        if asset_fields:
-            payload['fields'] = fields_payload(asset_fields=asset_fields, asset_metric=asset_metric,
-                                               asset_profile_metric=asset_profile_metric)
-        # DataFrame returned if asset metric is provided or if metrics is the only asset field
-        if to_dataframe:
-            # DataFrame can't be returned because profile data has been requested.
-            if asset_profile_metric:
-                raise ValueError('Profile data can only be returned as JSON. '
-                                 'Only asset metric data can be returned as DataFrame.')
-
-            # DataFrame can be returned because only metrics has been requested
-            if asset_metric and not asset_fields:
-                asset_fields = ['metrics']
-                payload['fields'] = fields_payload(asset_fields=asset_fields,
-                                                   asset_metric=asset_metric)
-            # DataFrame can be returned because only metrics has been requested
-            elif asset_fields and all(elem == 'metrics' for elem in asset_fields):
-                # If asset metric is supplied, filter data based on metric
-                if asset_metric:
-                    payload['fields'] = fields_payload(asset_fields=asset_fields,
-                                                       asset_metric=asset_metric)
-                # Else return all metrics
-                else:
-                    payload['fields'] = fields_payload(asset_fields=asset_fields)
-            else:
-                raise ValueError(
-                    'Only asset metrics can be returned as DataFrame. Make sure only '
-                    'metrics is specified in asset fields.')
-            response_data = self.get_response(BASE_URL_V2, params=payload, headers=self.api_dict)
-            response_data = unpack_list_of_dicts(response_data['data'])
-            for key, value in response_data.items():
-                response_data[key] = convert_flatten(value)
-            return pd.DataFrame.from_dict(response_data, orient='index')
+        payload = all_assets_payload(page, limit, asset_fields=asset_fields,
+                                     asset_metric=asset_metric,
+                                     asset_profile_metric=asset_profile_metric,
+                                     to_dataframe=to_dataframe)
         response_data = self.get_response(BASE_URL_V2, params=payload, headers=self.api_dict)
+        if to_dataframe:
+            return flatten_to_dataframe(unpack_list_of_dicts(response_data['data']))
         return unpack_list_of_dicts(response_data['data'])
 
+    def iter_all_assets(self, asset_fields: Union[str, List] = None, asset_metric: str = None,
+                        asset_profile_metric: str = None, limit: int = MAX_PAGE_LIMIT,
+                        prefetch: int = 4, max_pages: int = None,
+                        flatten: bool = True) -> Iterator[Dict]:
+        """Stream every asset across all pages of get_all_assets.
+
+        Pages are requested at the maximum page size with several pages
+        prefetched concurrently, and iteration stops cleanly after the last page.
+        Rows are flattened with convert_flatten unless flatten is False, so
+        the full asset universe with metrics can be loaded with
+        pd.DataFrame(messari.iter_all_assets(asset_fields='metrics')).
+
+        Parameters
+        ----------
+            asset_fields: str, list
+                Single filter string or list of fields to filter data.
+                See get_all_assets for available fields.
+            asset_metric: str
+                Single metric string to filter metric data.
+                See get_all_assets for available metrics.
+            asset_profile_metric: str
+                Single profile metric string to filter profile data.
+                See get_all_assets for available metrics.
+            limit: int
+                Page size. Default and max value is 500.
+            prefetch: int
+                Number of pages requested ahead of the one being read. Default is 4.
+            max_pages: int
+                Optional maximum number of pages to read.
+            flatten: bool
+                Flatten nested asset data into one level. Default is True.
+
+        Returns
+        -------
+            Iterator[dict]
+                One dictionary per asset.
+        """
+        payload = {}
+        if asset_fields or asset_metric or asset_profile_metric:
+            payload['fields'] = fields_payload(asset_fields=asset_fields or [],
+                                               asset_metric=asset_metric,
+                                               asset_profile_metric=asset_profile_metric)
+        for page_data in self._iter_pages(BASE_URL_V2, payload, limit=limit,
+                                          prefetch=prefetch, max_pages=max_pages):
+            for asset in page_data:
+                yield convert_flatten(asset) if flatten else asset
+
     def get_asset(self, asset_slugs: Union[str, List], asset_fields: Union[str, List] = None,
                   to_dataframe: bool = True) -> \
             Union[Dict, pd.DataFrame]:
@@ -191,15 +361,11 @@ class Messari(DataLoader):
             payload['fields'] = fields_payload(asset_fields=asset_fields)
         base_url_template = Template(f'{BASE_URL_V1}/$asset_key')
 
-        response_data = {}
-        for asset in asset_slugs:
-            url = base_url_template.substitute(asset_key=asset)
-            response = self.get_response(url, params=payload, headers=self.api_dict)
-            response_flat = convert_flatten(response['data'])
-            response_data[asset] = response_flat
+        response_data = self._get_asset_data(base_url_template, asset_slugs, payload,
+                                             flatten=not to_dataframe)
 
         if to_dataframe:
-            return pd.DataFrame.from_dict(response_data, orient='index')
+            return flatten_to_dataframe(response_data)
         return response_data
 
     def get_asset_profile(self, asset_slugs: Union[str, List],
@@ -237,12 +403,7 @@ class Messari(DataLoader):
             payload['fields'] = fields_payload(asset_fields='id',
                                                asset_profile_metric=asset_profile_metric)
         base_url_template = Template(f'{BASE_URL_V2}/$asset_key/profile')
-        response_data = {}
-        for asset in asset_slugs:
-            url = base_url_template.substitute(asset_key=asset)
-            response = self.get_response(url, params=payload, headers=self.api_dict)
-            response_flat = convert_flatten(response['data'])
-            response_data[asset] = response_flat
+        response_data = self._get_asset_data(base_url_template, asset_slugs, payload)
         return response_data
 
     def get_asset_metrics(self, asset_slugs: Union[str, List],
@@ -295,14 +456,10 @@ class Messari(DataLoader):
             # payload['fields'] = fields_payload(asset_fields='id', asset_metric=asset_metric)
             payload['fields'] = f'id,symbol,{asset_metric}'
         base_url_template = Template(f'{BASE_URL_V1}/$asset_key/metrics')
-        response_data = {}
-        for asset in asset_slugs:
-            url = base_url_template.substitute(asset_key=asset)
-            response = self.get_response(url, params=payload, headers=self.api_dict)
-            response_flat = convert_flatten(response['data'])
-            response_data[asset] = response_flat
+        response_data = self._get_asset_data(base_url_template, asset_slugs, payload,
+                                             flatten=not to_dataframe)
         if to_dataframe:
-            return pd.DataFrame.from_dict(response_data, orient='index')
+            return flatten_to_dataframe(response_data)
         return response_data
 
     def get_asset_market_data(self, asset_slugs: Union[str, List],
@@ -329,7 +486,9 @@ class Messari(DataLoader):
     ##############################
     def get_metric_timeseries(self, asset_slugs: Union[str, List], asset_metric: str,
                               start: str = None, end: str = None, interval: str = '1d',
-                              to_dataframe: bool = True) -> Union[Dict, pd.DataFrame]:
+                              to_dataframe: bool = True,
+                              max_points: int = MAX_TIMESERIES_POINTS,
+                              dtype: str = 'float64') -> Union[Dict, pd.DataFrame]:
         """Retrieve historical timeseries data for an asset.
 
         Parameters
@@ -509,6 +668,10 @@ class Messari(DataLoader):
                 Exceeding the maximum range will result in an error,
                 which can be solved by reducing the date range specified in the request.
 
+                Longer ranges are split automatically into windows of at most
+                max_points points, which are fetched concurrently and stitched back
+                together with duplicate boundary timestamps removed.
+
                 Anything under 1 day requires an enterprise subscription.
                 Please email enterprise@messari.io for information.
 
@@ -522,6 +685,11 @@ class Messari(DataLoader):
                     - 1w
             to_dataframe: bool
                 Return data as DataFrame or JSON. Default is set to DataFrame.
+            max_points: int
+                Maximum number of points per request window. Default is 2016.
+            dtype: str
+                Storage dtype of the DataFrame values, 'float64' or 'float32'.
+                float32 halves memory for large minute-level requests.
 
         Returns
         -------
@@ -536,16 +704,18 @@ class Messari(DataLoader):
             payload['start'] = start
             payload['end'] = end
         base_url_template = Template(f'{BASE_URL}/$asset_key/metrics/{asset_metric}/time-series')
-        response_data = {}
-        for asset in asset_slugs:
-            url = base_url_template.substitute(asset_key=asset)
-            response = self.get_response(url, params=payload, headers=self.api_dict)
-            response_flat = convert_flatten(response['data'])
-            response_data[asset] = response_flat
+        windows = timeseries_windows(start, end, interval, max_points) if start else []
+        if len(windows) > 1:
+            response_data = self._get_windowed_timeseries(base_url_template, asset_slugs,
+                                                          payload, windows)
+        else:
+            response_data = self._get_asset_data(base_url_template, asset_slugs, payload)
         if to_dataframe:
-            timeseries_df = timeseries_to_dataframe(response_data)
-            if asset_metric != 'price':
-                col_name = timeseries_df.columns[0][1]
-                timeseries_df = timeseries_df.xs(col_name, axis=1, level=1)
-            return timeseries_df
+            return format_metric_timeseries(response_data, asset_metric, dtype=dtype)
         return response_data
+
+
+def _is_not_found(err: SystemError) -> bool:
+    """Check whether a wrapped HTTP error from get_response is a 404."""
+    response = getattr(err.__cause__, 'response', None)
+    return response is not None and response.status_code == 404
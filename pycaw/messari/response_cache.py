@@ -0,0 +1,173 @@
+"""This module is meant to contain the ResponseCache class"""
+
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join('.pycaw_cache', 'responses')
+
+
+class CacheEntry:
+    """Raw body of a cached response with the validators needed to revalidate it.
+
+    :param content: bytes
+        Raw JSON body as received.
+    :param etag: str
+        ETag header of the response, if any.
+    :param last_modified: str
+        Last-Modified header of the response, if any.
+    :param stored_at: float
+        Epoch seconds at which the body was last fetched or revalidated.
+    """
+    def __init__(self, content: bytes, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, stored_at: Optional[float] = None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def payload(self, decode: Callable[[bytes], Any] = json.loads) -> Dict:
+        """Decode a fresh copy of the body, so callers can't mutate the cached one."""
+        return decode(self.content)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers turning a request for this entry into a conditional request."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Two-level (memory, optional disk) cache of JSON responses for DataLoader.
+
+    Responses are keyed on URL and query parameters. An entry younger than
+    the TTL of its endpoint is served without touching the network. Older
+    entries carrying an ETag or Last-Modified header are revalidated with a
+    conditional request, so an unchanged payload only costs a 304. Entries
+    without validators are only stored when their endpoint has a TTL.
+
+    Subclasses can replace the storage by overriding load and store.
+
+    :param cache_dir: str
+        Optional directory for the on-disk level. Memory only if not given.
+    :param default_ttl: float
+        Seconds a response is served without revalidation. Default 0, i.e.
+        always revalidate.
+    :param ttls: dict
+        Per-endpoint TTLs, mapping URL regex patterns to seconds. The first
+        pattern found in the URL wins over default_ttl.
+    :param max_entries: int
+        Maximum number of responses kept in memory, least recently used first out.
+
+    Examples
+    --------
+        >>> cache = ResponseCache(cache_dir='.pycaw_cache/responses',
+        ...                       ttls={r'/protocols$': 3600, r'/profile$': 86400})
+        >>> llama = DeFiLlama(response_cache=cache)
+        >>> cache.stats
+        {'hits': 0, 'revalidated': 0, 'misses': 0}
+    """
+    def __init__(self, cache_dir: Optional[str] = None, default_ttl: float = 0.0,
+                 ttls: Optional[Dict[str, float]] = None, max_entries: int = 1024):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or {}).items()]
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts of fresh hits, 304 revalidations and misses (full downloads)."""
+        with self._lock:
+            return dict(self._stats)
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+
+    @staticmethod
+    def key(endpoint_url: str, params: Optional[Dict] = None) -> str:
+        if not params:
+            return endpoint_url
+        return f'{endpoint_url}?{json.dumps(params, sort_keys=True, default=str)}'
+
+    def ttl(self, endpoint_url: str) -> float:
+        for pattern, ttl in self.ttls:
+            if pattern.search(endpoint_url):
+                return ttl
+        return self.default_ttl
+
+    def is_fresh(self, endpoint_url: str, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl(endpoint_url)
+
+    def should_store(self, endpoint_url: str, entry: CacheEntry) -> bool:
+        return bool(entry.etag or entry.last_modified or self.ttl(endpoint_url) > 0)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def load(self, key: str) -> Optional[CacheEntry]:
+        """Look an entry up in memory, then on disk."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                header = json.loads(f.readline())
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get('key') != key:
+            return None
+        entry = CacheEntry(content, header.get('etag'), header.get('last_modified'),
+                           header.get('stored_at'))
+        self._remember(key, entry)
+        return entry
+
+    def store(self, key: str, entry: CacheEntry) -> None:
+        """Write an entry to memory and, atomically, to disk."""
+        self._remember(key, entry)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        header = {'key': key, 'etag': entry.etag, 'last_modified': entry.last_modified,
+                  'stored_at': entry.stored_at}
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            f.write(entry.content)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries from memory and disk and reset the stats."""
+        with self._lock:
+            self._memory.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,134 @@
+"""This module is meant to contain the TaxonomyIndex class and its shared cache"""
+
+
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pycaw.messari.utils import get_taxonomy_path, validate_input
+
+# Seconds between checks of a mapping file for changes
+RELOAD_CHECK_INTERVAL = 1.0
+# File state of a mapping file which doesn't exist
+MISSING = (-1.0, -1)
+
+
+class TaxonomyIndex:
+    """Immutable slug mapping with forward and reverse lookups.
+
+    Slugs without an entry translate to themselves.
+
+    :param mapping: dict
+        Source slug to target slug, i.e. {'uni': 'uniswap'}.
+    """
+    def __init__(self, mapping: Optional[Dict[str, str]] = None):
+        self.forward: Mapping[str, str] = MappingProxyType(dict(mapping or {}))
+        reverse: Dict[str, List[str]] = {}
+        for source, target in self.forward.items():
+            reverse.setdefault(target, []).append(source)
+        self._reverse = {target: tuple(sources) for target, sources in reverse.items()}
+        self._sources = pd.Index(list(self.forward), dtype=object)
+        self._targets = np.array(list(self.forward.values()), dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.forward)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.forward
+
+    def reverse(self, slug: str) -> Tuple[str, ...]:
+        """Source slugs translating to slug, i.e. ('uniswap', 'uni') for 'uniswap'."""
+        return self._reverse.get(slug, ())
+
+    def _translate_array(self, slugs: np.ndarray) -> np.ndarray:
+        positions = self._sources.get_indexer(slugs)
+        found = positions >= 0
+        translated = slugs.copy()
+        translated[found] = self._targets[positions[found]]
+        return translated
+
+    def translate(self, input_slugs: Union[str, List]) -> List[str]:
+        """Validate and translate one slug or a list of slugs.
+
+        :param input_slugs: str, list
+            Single input slug string or list of input slugs (i.e. bitcoin)
+        :return: List of translated slugs
+        """
+        slugs = validate_input(input_slugs)
+        return self._translate_array(np.array(slugs, dtype=object)).tolist()
+
+    def translate_series(self, slugs: pd.Series) -> pd.Series:
+        """Translate a Series of slugs, keeping its index and name."""
+        translated = self._translate_array(slugs.to_numpy(dtype=object))
+        return pd.Series(translated, index=slugs.index, name=slugs.name)
+
+
+class _TaxonomyFile:
+    """Cached index of one mapping file, with the file state it was loaded from."""
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.index = TaxonomyIndex()
+        self.path: Optional[str] = None
+        self.state: Optional[Tuple[float, int]] = None
+        self.checked_at = float('-inf')
+        self.lock = threading.Lock()
+
+    def current(self) -> TaxonomyIndex:
+        now = time.monotonic()
+        if now - self.checked_at < RELOAD_CHECK_INTERVAL:
+            return self.index
+        with self.lock:
+            if now - self.checked_at >= RELOAD_CHECK_INTERVAL:
+                self._reload_if_changed()
+                self.checked_at = now
+        return self.index
+
+    def _reload_if_changed(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            self.path = get_taxonomy_path(self.filename)
+        if self.path is None:
+            if self.state != MISSING:
+                logging.warning('Cannot find taxonomy mapping %s', self.filename)
+                self.index, self.state = TaxonomyIndex(), MISSING
+            return
+        stat = os.stat(self.path)
+        state = (stat.st_mtime, stat.st_size)
+        if state == self.state:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                mapping = json.load(file)
+        except (OSError, ValueError) as e:
+            # Keep serving the previous mapping, i.e. while the file is being rewritten
+            logging.warning('Cannot load taxonomy mapping %s: %s', self.path, e)
+            return
+        self.index, self.state = TaxonomyIndex(mapping), state
+
+
+_taxonomy_files: Dict[str, _TaxonomyFile] = {}
+_taxonomy_files_lock = threading.Lock()
+
+
+def get_taxonomy_index(filename: str) -> TaxonomyIndex:
+    """Process-wide index of a mapping file in the mappings directory.
+
+    The file is read once and shared by every client. It is checked for
+    changes at most every RELOAD_CHECK_INTERVAL seconds and reloaded when
+    its modification time or size changes.
+
+    :param filename: str
+        Name of the JSON mapping file, i.e. 'messari_to_dl.json'.
+    :return: TaxonomyIndex
+    """
+    taxonomy_file = _taxonomy_files.get(filename)
+    if taxonomy_file is None:
+        with _taxonomy_files_lock:
+            taxonomy_file = _taxonomy_files.setdefault(filename, _TaxonomyFile(filename))
+    return taxonomy_file.current()
@@ -0,0 +1,241 @@
+"""This module is meant to contain the MetricTimeseriesCache class"""
+
+
+import os
+import re
+from typing import Union, List, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pycaw.messari.messari_api import Messari
+from pycaw.messari.utils import validate_input
+from pycaw.messari.helpers import format_metric_timeseries, TIMESERIES_INTERVALS
+
+DEFAULT_CACHE_DIR = os.path.join('.pycaw_cache', 'messari_timeseries')
+
+Range = Tuple[int, int]  # Inclusive [start, end] in epoch milliseconds
+
+
+class TimeseriesEntry:
+    """Columnar data stored for one (asset slug, metric, interval) key.
+
+    :param columns: list
+        Value column names, excluding timestamp.
+    :param timestamps: np.ndarray
+        Sorted, unique int64 epoch-millisecond timestamps.
+    :param values: np.ndarray
+        float64 array of shape (len(timestamps), len(columns)).
+    :param coverage: list
+        Sorted, non-overlapping inclusive ranges that have been fetched.
+    """
+    def __init__(self, columns: List[str], timestamps: np.ndarray, values: np.ndarray,
+                 coverage: List[Range]):
+        self.columns = columns
+        self.timestamps = timestamps
+        self.values = values
+        self.coverage = coverage
+
+    @classmethod
+    def empty(cls) -> 'TimeseriesEntry':
+        return cls([], np.empty(0, dtype='int64'), np.empty((0, 0)), [])
+
+    def missing_ranges(self, start: int, end: int) -> List[Range]:
+        """Sub-ranges of [start, end] not yet covered by a fetch."""
+        missing, cursor = [], start
+        for lo, hi in self.coverage:
+            if hi < cursor:
+                continue
+            if lo > end:
+                break
+            if lo > cursor:
+                missing.append((cursor, lo - 1))
+            cursor = max(cursor, hi + 1)
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    def merge(self, columns: List[str], rows: List[List], fetched: Range) -> None:
+        """Merge newly fetched rows in, preferring them on equal timestamps.
+
+        The fetched range is recorded as covered unless it is empty, which is
+        the case when it lies entirely in the still-changing latest interval.
+        """
+        if rows:
+            if self.columns and columns != self.columns:
+                raise ValueError(f'Cached columns {self.columns} do not match {columns}')
+            self.columns = columns
+            new = np.array(rows, dtype='float64').reshape(len(rows), len(columns) + 1)
+            new_ts = new[:, 0].astype('int64')
+            timestamps = np.concatenate([new_ts, self.timestamps])
+            values = np.concatenate([new[:, 1:], self.values.reshape(-1, len(columns))])
+            # np.unique keeps the first occurrence, which is the fresh row
+            timestamps, first = np.unique(timestamps, return_index=True)
+            self.timestamps, self.values = timestamps, values[first]
+        if fetched[0] <= fetched[1]:
+            self.coverage = _merge_ranges(self.coverage + [fetched])
+
+    def rows(self, start: int, end: int) -> List[List]:
+        """Rows in [start, end] in the 'values' layout of a Messari response."""
+        lo = np.searchsorted(self.timestamps, start, side='left')
+        hi = np.searchsorted(self.timestamps, end, side='right')
+        values = self.values[lo:hi].astype(object)
+        values[np.isnan(self.values[lo:hi])] = None
+        return [[int(ts)] + list(row) for ts, row in zip(self.timestamps[lo:hi], values)]
+
+
+def _merge_ranges(ranges: List[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _to_ms(date: Union[str, pd.Timestamp]) -> int:
+    timestamp = pd.Timestamp(date)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.value // 10**6
+
+
+def _ms_to_rfc3339(ms: int, round_up: bool = False) -> str:
+    # Second precision, rounding range starts up so they don't re-cover the last point
+    if round_up:
+        ms = -(-ms // 1000) * 1000
+    return pd.Timestamp(ms, unit='ms').strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class MetricTimeseriesCache:
+    """Incremental on-disk cache for Messari.get_metric_timeseries.
+
+    Data is stored column-wise in one .npz file per (asset slug, metric,
+    interval), together with the date ranges that have already been fetched.
+    A request only downloads the sub-ranges that are missing, which for a
+    daily refresh is usually just the newest tail, and serves the rest from
+    disk. The most recent interval is never marked as fetched, since its
+    point may still change, so it is re-requested on the next refresh.
+
+    :param messari: Messari
+        Connector used to fetch missing ranges.
+    :param cache_dir: str
+        Directory holding the cache files.
+
+    Examples
+    --------
+        >>> cache = MetricTimeseriesCache(Messari(api_key))
+        >>> prices = cache.get_metric_timeseries(['bitcoin', 'ethereum'], 'price',
+        ...                                      start='2020-01-01')
+    """
+    def __init__(self, messari: Messari, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.messari = messari
+        self.cache_dir = cache_dir
+        self.requests_made = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, asset: str, asset_metric: str, interval: str) -> str:
+        key = '__'.join(re.sub(r'[^A-Za-z0-9._-]', '_', part)
+                        for part in (asset, asset_metric, interval))
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def load(self, asset: str, asset_metric: str, interval: str) -> TimeseriesEntry:
+        """Load the cached entry for a key, or an empty entry if there is none."""
+        path = self._path(asset, asset_metric, interval)
+        if not os.path.exists(path):
+            return TimeseriesEntry.empty()
+        with np.load(path, allow_pickle=False) as data:
+            coverage = [(int(lo), int(hi)) for lo, hi in data['coverage']]
+            return TimeseriesEntry(list(data['columns']), data['timestamps'],
+                                   data['values'], coverage)
+
+    def save(self, asset: str, asset_metric: str, interval: str,
+             entry: TimeseriesEntry) -> None:
+        """Atomically write an entry to disk."""
+        path = self._path(asset, asset_metric, interval)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, columns=np.array(entry.columns, dtype=str),
+                 timestamps=entry.timestamps, values=entry.values,
+                 coverage=np.array(entry.coverage, dtype='int64').reshape(-1, 2))
+        os.replace(tmp_path, path)
+
+    def missing_ranges(self, asset: str, asset_metric: str, start: Union[str, pd.Timestamp],
+                       end: Union[str, pd.Timestamp] = None,
+                       interval: str = '1d') -> List[Tuple[str, str]]:
+        """Date ranges that a request for [start, end] would still have to fetch."""
+        end_ms = _to_ms(end) if end else _to_ms(pd.Timestamp.utcnow())
+        entry = self.load(asset, asset_metric, interval)
+        return [(_ms_to_rfc3339(lo, round_up=True), _ms_to_rfc3339(hi))
+                for lo, hi in entry.missing_ranges(_to_ms(start), end_ms)]
+
+    def get_metric_timeseries(self, asset_slugs: Union[str, List], asset_metric: str,
+                              start: Union[str, pd.Timestamp],
+                              end: Union[str, pd.Timestamp] = None,
+                              interval: str = '1d',
+                              to_dataframe: bool = True) -> Union[Dict, pd.DataFrame]:
+        """Cached equivalent of Messari.get_metric_timeseries.
+
+        Parameters
+        ----------
+            asset_slugs: str, list
+                Single asset slug string or list of asset slugs (i.e. bitcoin).
+            asset_metric: str
+                Single metric string to filter timeseries data.
+                See Messari.get_metric_timeseries for available metrics.
+            start: str
+                Starting date string for timeseries data.
+            end: str
+                Optional ending date string. Defaults to now.
+            interval: str
+                Interval of timeseries data. Default value is set to 1d.
+            to_dataframe: bool
+                Return data as DataFrame or JSON. Default is set to DataFrame.
+
+        Returns
+        -------
+            dict, DataFrame
+                Dictionary or pandas DataFrame of asset data, shaped like the
+                output of Messari.get_metric_timeseries.
+        """
+        asset_slugs = validate_input(asset_slugs)
+        now_ms = _to_ms(pd.Timestamp.utcnow())
+        start_ms = _to_ms(start)
+        end_ms = min(_to_ms(end), now_ms) if end else now_ms
+        step = TIMESERIES_INTERVALS.get(interval, pd.Timedelta(0))
+        # Points inside the latest interval may still change, don't treat them as final
+        settled_ms = now_ms - step.value // 10**6
+
+        entries = {asset: self.load(asset, asset_metric, interval) for asset in asset_slugs}
+
+        # Assets missing the same ranges (typically the same tail) share one fan-out call
+        assets_by_gap: Dict[Range, List[str]] = {}
+        for asset, entry in entries.items():
+            for gap in entry.missing_ranges(start_ms, end_ms):
+                assets_by_gap.setdefault(gap, []).append(asset)
+
+        for (lo, hi), assets in assets_by_gap.items():
+            response_data = self.messari.get_metric_timeseries(
+                asset_slugs=assets, asset_metric=asset_metric,
+                start=_ms_to_rfc3339(lo, round_up=True),
+                end=_ms_to_rfc3339(hi), interval=interval, to_dataframe=False)
+            self.requests_made += len(assets)
+            fetched = (lo, min(hi, settled_ms))
+            for asset in assets:
+                data = response_data[asset]
+                rows = data['values'] if isinstance(data.get('values'), list) else []
+                columns = [column for column in data.get('parameters_columns', [])
+                           if column != 'timestamp']
+                entry = entries[asset]
+                entry.merge(columns or entry.columns, rows, fetched)
+                self.save(asset, asset_metric, interval, entry)
+
+        response_data = {}
+        for asset, entry in entries.items():
+            rows = entry.rows(start_ms, end_ms)
+            response_data[asset] = {
+                'parameters_columns': ['timestamp'] + entry.columns,
+                'values': rows if rows else None}
+        if to_dataframe:
+            return format_metric_timeseries(response_data, asset_metric)
+        return response_data
@@ -6,6 +6,7 @@ import os
 from collections.abc import MutableMapping
 from typing import List, Union, Dict
 
+import numpy as np
 import pandas as pd
 
 # Inconsistent API usage between metrics and profile end points
@@ -39,6 +40,140 @@ def convert_flatten(response_json: Union[Dict, MutableMapping],
     return dict(items)
 
 
+class RecordFlattener:
+    """Flatten many JSON records with the same nesting into column arrays.
+
+    Equivalent to calling convert_flatten on every record and building a
+    DataFrame with DataFrame.from_dict(orient='index'), without creating
+    intermediate dictionaries, lists or key strings per record. The key paths
+    of each nested object are compiled once into a plan node that holds the
+    flattened column name and column index of every key, and later records
+    are walked with those plans, appending leaf values straight onto the
+    columns. A plan node is only rebuilt when an object with different keys,
+    or the same keys in another order, turns up at that path, so columns are
+    registered in the order from_dict would give them, and a nested object
+    that is null in some records does not invalidate the rest of the plan.
+    Records that flatten to no columns, like from_dict, get no row.
+
+    Records are JSON objects, so only dict values are treated as nested.
+
+    :param sep: str
+        Delimiter for new keys
+    """
+    def __init__(self, sep: str = "_"):
+        self.sep = sep
+        self.columns: List[str] = []
+        self._column_index: Dict[str, int] = {}
+        self._column_data: List[List] = []
+        # Plan node: [key tuple, [[key, flat_name, column, child_node], ...]]
+        self._root: List = [None, []]
+        self.num_records = 0
+
+    def _column(self, name: str) -> int:
+        idx = self._column_index.get(name)
+        if idx is None:
+            idx = len(self.columns)
+            self._column_index[name] = idx
+            self.columns.append(name)
+            self._column_data.append([])
+        return idx
+
+    def _entries(self, plan: List, node: Dict, prefix: str) -> List:
+        """Entries of a plan node, re-keyed first if node has other keys or key order."""
+        keys = tuple(node)
+        if keys == plan[0]:
+            return plan[1]
+        known = {entry[0]: entry for entry in plan[1]}
+        sep = self.sep
+        plan[0] = keys
+        plan[1] = [known.get(key) or [key, prefix + sep + key if prefix else key, -1, None]
+                   for key in keys]
+        return plan[1]
+
+    def add(self, record: Dict) -> bool:
+        """Append one record as a new row.
+
+        :return: bool
+            False if the record flattens to no columns and got no row
+        """
+        row = self.num_records
+        column_data = self._column_data
+        nan = np.nan
+        written = False
+
+        # Walk in key order with an explicit stack, so new columns are
+        # registered in the same order convert_flatten would produce them.
+        stack = [iter(self._entries(self._root, record, ""))]
+        nodes = [record]
+        while stack:
+            node = nodes[-1]
+            for entry in stack[-1]:
+                value = node[entry[0]]
+                if type(value) is dict:
+                    child = entry[3]
+                    if child is None:
+                        child = entry[3] = [None, []]
+                    stack.append(iter(self._entries(child, value, entry[1])))
+                    nodes.append(value)
+                    break
+                column = entry[2]
+                if column < 0:
+                    column = entry[2] = self._column(entry[1])
+                data = column_data[column]
+                num_values = len(data)
+                if num_values == row:
+                    data.append(value)
+                elif num_values < row:  # Key absent from earlier records, as in from_dict
+                    data.extend([nan] * (row - num_values))
+                    data.append(value)
+                else:  # Repeated flattened key, the last value wins
+                    data[row] = value
+                written = True
+            else:
+                stack.pop()
+                nodes.pop()
+        if written:
+            self.num_records += 1
+        return written
+
+    def extend(self, records) -> None:
+        """Append several records as new rows."""
+        for record in records:
+            self.add(record)
+
+    def to_dataframe(self, index=None) -> pd.DataFrame:
+        """Build a DataFrame with one row per record and one column per key path."""
+        num_records = self.num_records
+        for data in self._column_data:
+            if len(data) < num_records:
+                data.extend([np.nan] * (num_records - len(data)))
+        return pd.DataFrame(dict(zip(self.columns, self._column_data)), index=index,
+                            columns=self.columns)
+
+
+def flatten_to_dataframe(response_data: Union[Dict[str, Dict], List[Dict]],
+                         sep: str = "_") -> pd.DataFrame:
+    """Flatten JSON records straight into a DataFrame with RecordFlattener.
+
+    Produces the same frame as flattening each value with convert_flatten
+    and calling DataFrame.from_dict(orient='index'), at a fraction of the cost
+    for large, wide payloads. Records that flatten to no columns are dropped.
+
+    :param response_data: dict, list
+        Records keyed by index label (i.e. asset slug), or a list of records
+    :param sep: str
+        Delimiter for new keys
+    :return: pandas DataFrame
+    """
+    flattener = RecordFlattener(sep=sep)
+    if isinstance(response_data, dict):
+        # Records without any column get no row, as with from_dict
+        index = [label for label, record in response_data.items() if flattener.add(record)]
+        return flattener.to_dataframe(index=index)
+    kept = [position for position, record in enumerate(response_data) if flattener.add(record)]
+    return flattener.to_dataframe(index=None if len(kept) == len(response_data) else kept)
+
+
 def validate_input(asset_input: Union[str, List]):
     """Checks if input is list.
 
@@ -124,6 +259,9 @@ def time_filter_df(df_in: pd.DataFrame, start_date: Union[str, datetime.datetime
                    end_date: Union[str, datetime.datetime] = None) -> pd.DataFrame:
     """Convert filter timeseries indexed DataFrame
 
+    The input is not modified. It is only sorted (into a copy) when its index
+    isn't ascending already.
+
     :param df_in: pd.DataFrame
         Dataframe to filter
     :param start_date: str
@@ -134,7 +272,8 @@ def time_filter_df(df_in: pd.DataFrame, start_date: Union[str, datetime.datetime
     """
 
     filtered_df = df_in
-    filtered_df.sort_index(inplace=True)  # Must sort ascending for this to work
+    if not filtered_df.index.is_monotonic_increasing:
+        filtered_df = filtered_df.sort_index()  # Must sort ascending for this to work
 
     if start_date:
         start = validate_datetime(start_date)
@@ -149,21 +288,30 @@ def time_filter_df(df_in: pd.DataFrame, start_date: Union[str, datetime.datetime
     return filtered_df
 
 
-def get_taxonomy_dict(filename: str) -> Dict:
+def get_taxonomy_path(filename: str) -> Union[str, None]:
+    """Path of a mapping file, or None if it can't be found.
+
+    :param filename: str
+        Name of a JSON file in the mappings directory, or an absolute path.
+    :return: Path string or None
+    """
+    if os.path.isabs(filename):
+        return filename if os.path.exists(filename) else None
     current_path = os.path.dirname(__file__)
     # this file is being called from an install
     if os.path.exists(os.path.join(current_path, f"../{filename}")):
-        json_path = os.path.join(current_path, f"../{filename}")
-        with open(json_path, "r", encoding="utf=8") as file:
-            taxonomy_dict = json.load(file)
-            file.close()
+        return os.path.join(current_path, f"../{filename}")
     # this file is being called from the project dir
-    elif os.path.exists(os.path.join(current_path, f"mappings/{filename}")):
-        json_path = os.path.join(current_path, f"mappings/{filename}")
-        with open(json_path, "r", encoding="utf-8") as file:
-            taxonomy_dict = json.load(file)
-            file.close()
-    else:  # Can't find .mappings mapping file, default to empty
+    if os.path.exists(os.path.join(current_path, f"mappings/{filename}")):
+        return os.path.join(current_path, f"mappings/{filename}")
+    return None
+
+
+def get_taxonomy_dict(filename: str) -> Dict:
+    json_path = get_taxonomy_path(filename)
+    if json_path is None:  # Can't find .mappings mapping file, default to empty
         print(f"ERROR: cannot find {filename}")
-        taxonomy_dict = {}
+        return {}
+    with open(json_path, "r", encoding="utf-8") as file:
+        taxonomy_dict = json.load(file)
     return taxonomy_dict
@@ -0,0 +1,256 @@
+"""Offline tests for 'pycaw.messari.async_dataloader' and the async clients."""
+import asyncio
+import json
+import time
+import pandas as pd
+import pytest
+
+from pycaw.defillama import async_defillama
+from pycaw.defillama import defillama
+from pycaw.messari import async_dataloader
+from pycaw.messari import async_messari
+from pycaw.messari import dataloader
+from tests.defillama_test import LISTING, ProtocolSession, protocol_payload
+
+from typing import Dict, List
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+
+class FakeAsyncResponse:
+    def __init__(self, url: str, payload, status: int = 200):
+        self.url = url
+        self.status = status
+        self.headers: Dict = {}
+        self._content = json.dumps(payload).encode()
+
+    async def read(self) -> bytes:
+        return self._content
+
+
+class FakeAsyncSession:
+    """Stands in for 'aiohttp.ClientSession', answering from a payload function."""
+
+    def __init__(self, respond, delay: float = 0.05):
+        self.respond = respond
+        self.delay = delay
+        self.urls: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, params=None, headers=None):
+        self.urls.append(url)
+        session = self
+
+        class Request:
+            async def __aenter__(self):
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                await asyncio.sleep(session.delay)
+                session.in_flight -= 1
+                return FakeAsyncResponse(url, *session.respond(url, params))
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+        return Request()
+
+    async def close(self):
+        pass
+
+
+def asset_metrics(url: str, params: Dict):
+    if url.endswith("/missing/metrics"):
+        return {}, 404
+    slug = url.split("/assets/")[1].split("/")[0]
+    return {"data": {"slug": slug, "market_data": {"price_usd": len(slug)}}}, 200
+
+
+class TestAsyncDataLoader:
+    def test_real_session(self):
+        """Round trip through aiohttp against a local server, with one retried 503."""
+        calls: List[str] = []
+
+        async def handler(request):
+            calls.append(request.path)
+            if request.path == "/flaky" and calls.count("/flaky") == 1:
+                return web.Response(status=503)
+            if request.path == "/missing":
+                return web.Response(status=404)
+            await asyncio.sleep(0.05)
+            return web.json_response({"path": request.path, "page": request.query.get("page")})
+
+        async def main():
+            app = web.Application()
+            app.router.add_get("/{name}", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            base = f"http://127.0.0.1:{port}"
+            policy = dataloader.RetryPolicy(backoff_factor=0.001)
+            try:
+                async with async_dataloader.AsyncDataLoader(
+                        api_dict=None, taxonomy_dict={}, retry_policy=policy) as loader:
+                    start = time.perf_counter()
+                    pages = await loader.get_responses(
+                        [f"{base}/page"] * 10, params=[{"page": i} for i in range(10)])
+                    elapsed = time.perf_counter() - start
+                    flaky = await loader.get_response(f"{base}/flaky", params={"x": None})
+                    with pytest.raises(SystemError):
+                        await loader.get_response(f"{base}/missing")
+            finally:
+                await runner.cleanup()
+            return pages, elapsed, flaky
+
+        pages, elapsed, flaky = asyncio.run(main())
+        assert [page["page"] for page in pages] == [str(i) for i in range(10)]
+        assert elapsed < 10 * 0.05
+        assert flaky == {"path": "/flaky", "page": None}
+        assert calls.count("/flaky") == 2
+
+    def test_translate(self):
+        loader = async_dataloader.AsyncDataLoader(api_dict=None,
+                                                  taxonomy_dict={"uniswap": "uniswap-v3"})
+        assert loader.translate(["uniswap", "aave"]) == ["uniswap-v3", "aave"]
+
+    def test_requests_run_concurrently(self):
+        async def main():
+            loader = async_dataloader.AsyncDataLoader(api_dict=None, taxonomy_dict={})
+            loader.session = FakeAsyncSession(asset_metrics)
+            responses = await loader.get_responses(
+                [f"https://data.messari.io/api/v1/assets/a{i}/metrics" for i in range(20)])
+            return loader.session, responses
+
+        session, responses = asyncio.run(main())
+        assert len(responses) == 20
+        assert session.max_in_flight == 20
+
+
+    def test_identical_requests_are_coalesced(self):
+        async def main():
+            loader = async_dataloader.AsyncDataLoader(api_dict=None, taxonomy_dict={})
+            loader.session = FakeAsyncSession(asset_metrics)
+            url = "https://data.messari.io/api/v1/assets/bitcoin/metrics"
+            first = asyncio.ensure_future(loader.get_response(url))
+            await asyncio.sleep(0)
+            first.cancel()
+            # The shared request keeps running for the other waiters
+            results = await asyncio.gather(*[loader.get_response(url) for _ in range(5)])
+            return loader, results
+
+        loader, results = asyncio.run(main())
+        assert len(loader.session.urls) == 1
+        assert loader.coalescing_stats == {"executed": 1, "coalesced": 5}
+        assert results[0] == results[1] and results[0] is not results[1]
+
+
+class TestAsyncMessari:
+    def test_get_asset_metrics(self):
+        async def main():
+            async with async_messari.AsyncMessari(api_key="test") as messari:
+                messari.session = FakeAsyncSession(asset_metrics)
+                assets = [f"asset-{i}" for i in range(12)]
+                start = time.perf_counter()
+                metrics_df = await messari.get_asset_metrics(asset_slugs=assets)
+                return assets, metrics_df, time.perf_counter() - start
+
+        assets, metrics_df, elapsed = asyncio.run(main())
+        assert list(metrics_df.index) == assets
+        assert metrics_df.loc["asset-10", "market_data_price_usd"] == len("asset-10")
+        assert elapsed < 12 * 0.05
+
+    def test_without_api_key(self):
+        """A real aiohttp session must not get the None key header."""
+        received: List[Dict] = []
+
+        async def handler(request):
+            received.append(dict(request.headers))
+            return web.json_response({"data": {"slug": "bitcoin"}})
+
+        async def main():
+            app = web.Application()
+            app.router.add_get("/assets", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                for api_key in (None, "test"):
+                    async with async_messari.AsyncMessari(api_key=api_key) as messari:
+                        await messari.get_response(f"http://127.0.0.1:{port}/assets",
+                                                   headers=messari.api_dict)
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(main())
+        assert "x-messari-api-key" not in {name.lower() for name in received[0]}
+        assert received[1]["x-messari-api-key"] == "test"
+
+    def test_http_error(self):
+        async def main():
+            messari = async_messari.AsyncMessari(api_key="test")
+            messari.session = FakeAsyncSession(asset_metrics)
+            await messari.get_asset_metrics(asset_slugs=["bitcoin", "missing"])
+
+        with pytest.raises(SystemError):
+            asyncio.run(main())
+
+
+class TestAsyncDeFiLlama:
+    def test_protocol_tvl_matches_blocking_client(self):
+        llama = defillama.DeFiLlama()
+        llama.session = ProtocolSession()
+        expected = llama.get_protocol_tvl_timeseries(["aave", "compound"])
+
+        async def main():
+            async with async_defillama.AsyncDeFiLlama() as async_llama:
+                async_llama.session = FakeAsyncSession(protocol_payload, delay=0)
+                return await async_llama.get_protocol_tvl_timeseries(["aave", "compound"])
+
+        result = asyncio.run(main())
+        pd.testing.assert_frame_equal(expected, result)
+        assert ("aave", "Ethereum", "USDC_usd") in result.columns
+        assert result[("compound", "all", "totalLiquidityUSD")].iloc[0] == len("compound")
+
+    def test_current_tvl_snapshot(self):
+        def respond(url: str, params: Dict = None):
+            if url.endswith("/protocols"):
+                return LISTING, 200
+            if url.endswith("/tvl/missing"):
+                return {}, 404
+            if url.endswith("/tvl/unreachable"):
+                raise aiohttp.ClientConnectionError("Connection refused")
+            return float(len(url.rsplit("/", 1)[1])), 200
+
+        async def main():
+            async with async_defillama.AsyncDeFiLlama(
+                    retry_policy=dataloader.RetryPolicy(max_retries=0)) as async_llama:
+                async_llama.session = FakeAsyncSession(respond, delay=0)
+                result = await async_llama.get_current_tvl(
+                    ["gmx", "curve", "missing", "unreachable"], snapshot=True,
+                    return_errors=True)
+                return async_llama.session.urls, result
+
+        urls, (tvl_df, errors_df) = asyncio.run(main())
+        assert len(urls) == 4
+        assert tvl_df["tvl"].to_dict() == {"gmx": 5e8, "curve": 5.0}
+        assert errors_df["type"].to_dict() == {"missing": "http", "unreachable": "http"}
+
+    def test_iter_protocol_tvl_timeseries(self):
+        async def main():
+            async with async_defillama.AsyncDeFiLlama() as async_llama:
+                # Longer slugs answer later
+                async_llama.session = FakeAsyncSession(protocol_payload, delay=0)
+                slugs = ["convex-finance", "aave", "curve"]
+                streamed = []
+                async for slug, slug_df in async_llama.iter_protocol_tvl_timeseries(
+                        slugs, output="long"):
+                    streamed.append(slug)
+                    assert set(slug_df["protocol"]) == {slug}
+                return streamed
+
+        assert sorted(asyncio.run(main())) == ["aave", "convex-finance", "curve"]
@@ -2,8 +2,10 @@
 
 import os
 import json
+import time
 import pytest
 from pycaw import cmc
+from tests.http_fixtures import StubServer, route_to
 from typing import Any, Dict, List, Union
 
 
@@ -69,3 +71,186 @@ class TestCoinMarketCapAPI:
 
         os.remove(temp_save_path)
         assert not os.path.exists(temp_save_path)
+
+
+def coin_quote(id_: int) -> dict:
+    return {"id": id_, "name": f"Coin {id_}", "symbol": f"C{id_}", "slug": f"coin-{id_}",
+            "quote": {"USD": {"price": id_ * 1.5, "volume_24h": id_ * 10.0}}}
+
+
+def coin_info(id_: int) -> dict:
+    return {"id": id_, "name": f"Coin {id_}", "symbol": f"C{id_}", "category": "coin",
+            "logo": f"https://s2.coinmarketcap.com/{id_}.png"}
+
+
+def by_ids(entry):
+    """Stub route answering an 'id' list like CMC with skip_invalid, ids above
+    10_000 being invalid."""
+    def payload(path, query):
+        ids = [int(id_) for id_ in query["id"].split(",")]
+        assert query["skip_invalid"] == "true"
+        assert len(cmc.CoinMarketCapEndpoint.preamble_v1) + len(path) <= cmc.MAX_URL_LENGTH
+        return {"data": {str(id_): entry(id_) for id_ in ids if id_ <= 10_000}}
+    return payload
+
+
+class TestCoinMarketCapBatches:
+    """Offline tests of the batch methods against a StubServer."""
+
+    @pytest.fixture
+    def server(self):
+        routes = {r"/cryptocurrency/quotes/latest": by_ids(coin_quote),
+                  r"/cryptocurrency/info": by_ids(coin_info)}
+        with StubServer(routes) as server, route_to(
+                server, hosts=["pro-api.coinmarketcap.com"]):
+            yield server
+
+    def test_quotes_latest_chunks(self, server):
+        ids = list(range(1, 251)) + [20_000, 5]
+        with cmc.CoinMarketCapAPI(api_key="offline") as api:
+            quotes = api.quotes_latest(ids, chunk_size=100)
+        assert server.stats["requests"] == 3
+        assert quotes.index.tolist() == list(range(1, 251))
+        assert quotes.loc[4, "USD_price"] == 6.0
+        assert "quote" not in quotes.columns
+
+    def test_url_length_bounds_chunks(self, server):
+        with cmc.CoinMarketCapAPI(api_key="offline") as api:
+            assert len(api.quotes_latest(range(1, 251))) == 250
+            assert server.stats["requests"] == 1
+            # Ids of 4 digits take 7 characters each once the commas are encoded
+            quotes = api.quotes_latest(range(9_999, 8_999, -1))
+        assert server.stats["requests"] == 1 + 4
+        assert quotes.index.tolist() == list(range(9_000, 10_000))
+
+    def test_quotes_with_metadata(self, server):
+        with cmc.CoinMarketCapAPI(api_key="offline") as api:
+            df = api.quotes_with_metadata([3, 1, 2], chunk_size=2)
+        assert df.index.tolist() == [1, 2, 3]
+        assert list(df.columns) == ["name", "symbol", "slug", "USD_price",
+                                    "USD_volume_24h", "category", "logo"]
+        assert df.loc[3, "logo"].endswith("3.png")
+
+    def test_concurrent_chunks(self, server):
+        server.latency = 0.1
+        api = cmc.CoinMarketCapAPI(api_key="offline", max_workers=4)
+        start = time.perf_counter()
+        metadata = api.metadata(range(1, 401), chunk_size=100)
+        assert time.perf_counter() - start < 0.3
+        assert len(metadata) == 400
+        assert server.stats["requests"] == 4
+        api.close()
+
+    def test_empty(self, server):
+        with cmc.CoinMarketCapAPI(api_key="offline") as api:
+            assert api.quotes_latest([20_000]).empty
+            assert api.metadata([]).index.name == "id"
+
+
+def id_map_entry(id_: int, symbol: str, slug: str, **fields) -> dict:
+    return dict(id=id_, name=slug.title(), symbol=symbol, slug=slug, **fields)
+
+
+class TestCmcIdMapIndex:
+    @pytest.fixture
+    def index(self) -> cmc.CmcIdMapIndex:
+        return cmc.CmcIdMapIndex([
+            id_map_entry(1, "BTC", "bitcoin"), id_map_entry(1027, "ETH", "ethereum"),
+            id_map_entry(5000, "UNI", "uniswap"), id_map_entry(4000, "UNI", "unicorn"),
+            id_map_entry(5959, "EWT", "energy-web-token")])
+
+    def test_lookups(self, index):
+        assert len(index) == 5 and 1027 in index
+        assert index.get(1)["slug"] == "bitcoin"
+        assert index.by_slug("ethereum")["id"] == 1027
+        assert [map_["id"] for map_ in index.by_symbol("uni")] == [4000, 5000]
+        assert index.by_symbol("EWTB") == index.by_symbol("EWT")
+        assert index.by_slug("dogecoin") is None and index.by_symbol("DOGE") == []
+        assert index.missing(["BTC", "doge", "DOGE", "ewtb"]) == ["DOGE"]
+
+    def test_keyed_merge(self, index):
+        renamed = id_map_entry(4000, "UNC", "unicorn-2")
+        assert index.merge([id_map_entry(1, "BTC", "bitcoin"), renamed,
+                            id_map_entry(74, "DOGE", "dogecoin")]) == 2
+        assert len(index) == 6
+        assert [map_["id"] for map_ in index.by_symbol("UNI")] == [5000]
+        assert index.by_symbol("UNC") == [renamed]
+        assert index.by_slug("unicorn") is None
+        assert [map_["id"] for map_ in index.to_list()] == [1, 74, 1027, 4000, 5000, 5959]
+
+    def test_configurable_aliases(self):
+        index = cmc.CmcIdMapIndex([id_map_entry(1, "BTC", "bitcoin")], aliases={"XBT": "BTC"})
+        assert index.by_symbol("xbt")[0]["id"] == 1
+        assert index.missing(["EWTB"]) == ["EWTB"]
+
+    def test_save_and_load(self, index, tmp_path):
+        path = str(tmp_path / "cmc_id_maps.json")
+        index.save(path)
+        loaded = cmc.CmcIdMapIndex()
+        assert loaded.load(path) == 5
+        assert loaded.to_list() == index.to_list()
+        assert cmc.CmcIdMapIndex().load(str(tmp_path / "missing.json")) == 0
+
+
+class TestCoinMarketCapIdMap:
+    """Offline tests of the id map resolution against a StubServer."""
+
+    @pytest.fixture
+    def server(self):
+        id_map = [id_map_entry(id_, f"C{id_}", f"coin-{id_}") for id_ in range(1, 26)]
+        id_map.append(id_map_entry(26, "C1", "coin-1-clone"))
+        by_symbol: Dict[str, List[dict]] = {}
+        for map_ in id_map:
+            by_symbol.setdefault(map_["symbol"], []).append(map_)
+
+        def payload(path, query):
+            if "symbol" in query:
+                return {"data": [map_ for symbol in query["symbol"].split(",")
+                                 for map_ in by_symbol.get(symbol, [])]}
+            start = int(query["start"]) - 1
+            return {"data": id_map[start:start + int(query["limit"])]}
+
+        with StubServer({r"/cryptocurrency/map": payload}) as server, route_to(
+                server, hosts=["pro-api.coinmarketcap.com"]):
+            yield server
+
+    def test_symbols_resolve_locally(self, server, tmp_path):
+        path = str(tmp_path / "cmc_id_maps.json")
+        api = cmc.CoinMarketCapAPI(api_key="offline", id_map_path=path)
+        assert [map_["id"] for map_ in api.cmc_id_map(["C1", "C2"], save=True)] == [1, 26, 2]
+        assert [map_["id"] for map_ in api.cmc_id_map(["c2", "C3"])] == [2, 3]
+        assert [map_["id"] for map_ in api.cmc_id_map("C2")] == [2]
+        assert server.stats["requests"] == 2
+
+        # A new connector starts from the saved index
+        api = cmc.CoinMarketCapAPI(api_key="offline", id_map_path=path)
+        assert api.cmc_id_map(["C1"])[0]["slug"] == "coin-1"
+        assert server.stats["requests"] == 2
+
+    def test_save_without_id_map_path_keeps_saved_maps(self, server, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        saved = [id_map_entry(99, "OLD", "old-coin"), id_map_entry(2, "C2", "stale-slug")]
+        (tmp_path / "cmc_id_maps.json").write_text(json.dumps(saved))
+        api = cmc.CoinMarketCapAPI(api_key="offline")
+        api.cmc_id_map(["C2", "C3"], save=True)
+        saved = json.loads((tmp_path / "cmc_id_maps.json").read_text())
+        assert [(map_["id"], map_["slug"]) for map_ in saved] == [
+            (2, "coin-2"), (3, "coin-3"), (99, "old-coin")]
+
+    def test_refresh_pages(self, server):
+        api = cmc.CoinMarketCapAPI(api_key="offline")
+        assert api.refresh_id_map(page_size=10) == 26
+        assert server.stats["requests"] == 3
+        assert api.refresh_id_map(page_size=10) == 0
+        assert len(api.cmc_id_map("all")) == 26
+
+    def test_save_merges_by_id(self, tmp_path):
+        path = tmp_path / "ids.json"
+        api = cmc.CoinMarketCapAPI(api_key="offline")
+        api._save_cmc_id_maps([id_map_entry(2, "B", "b"), id_map_entry(1, "A", "a")],
+                              filename="ids.json", save_dir=str(tmp_path))
+        api._save_cmc_id_maps([id_map_entry(1, "A", "a-renamed"), id_map_entry(3, "C", "c")],
+                              filename="ids.json", save_dir=str(tmp_path))
+        saved = json.loads(path.read_text())
+        assert [(map_["id"], map_["slug"]) for map_ in saved] == [
+            (1, "a-renamed"), (2, "b"), (3, "c")]
@@ -0,0 +1,451 @@
+"""Offline tests for 'pycaw.messari.dataloader' and the Messari fan-out."""
+import json
+import math
+import threading
+import time
+import pytest
+import pandas as pd
+
+from pycaw.messari import dataloader
+from pycaw.messari import helpers
+from pycaw.messari import json_decoding
+from pycaw.messari import messari_api
+
+from typing import Dict, List
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code: int = 200, headers: Dict = None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise dataloader.requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    @property
+    def content(self) -> bytes:
+        return json.dumps(self.payload).encode()
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Stands in for 'requests.Session', answering each URL after a delay."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.urls: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None):
+        with self._lock:
+            self.urls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if url.endswith("/missing/metrics"):
+            return FakeResponse({}, status_code=404)
+        slug = url.split("/assets/")[1].split("/")[0]
+        return FakeResponse({"data": {"slug": slug, "market_data": {"price_usd": len(slug)}}})
+
+    def close(self):
+        pass
+
+
+class TestDataLoader:
+    @pytest.fixture
+    def fake_session(self) -> FakeSession:
+        return FakeSession()
+
+    @pytest.fixture
+    def messari_conn(self, fake_session: FakeSession) -> messari_api.Messari:
+        conn = messari_api.Messari(api_key="test", max_workers=4)
+        conn.session = fake_session
+        return conn
+
+    def test_get_asset_metrics_concurrent(self, messari_conn, fake_session):
+        assets = [f"asset-{i}" for i in range(12)]
+        start = time.perf_counter()
+        metrics_df = messari_conn.get_asset_metrics(asset_slugs=assets)
+        elapsed = time.perf_counter() - start
+
+        assert list(metrics_df.index) == assets
+        assert metrics_df.loc["asset-10", "market_data_price_usd"] == len("asset-10")
+        assert fake_session.max_in_flight == 4
+        assert elapsed < 12 * fake_session.delay
+
+    def test_get_asset_profile_order(self, messari_conn):
+        assets = ["c", "a", "b"]
+        profiles: Dict = messari_conn.get_asset_profile(asset_slugs=assets)
+        assert list(profiles) == assets
+        assert profiles["a"]["slug"] == "a"
+
+    def test_http_error(self, messari_conn):
+        with pytest.raises(SystemError):
+            messari_conn.get_asset_metrics(asset_slugs=["bitcoin", "missing"])
+
+    def test_map_completed(self, messari_conn, fake_session):
+        def fetch(asset: str) -> str:
+            url = f"https://data.messari.io/api/v1/assets/{asset}/metrics"
+            return messari_conn.get_response(url)["data"]["slug"]
+
+        results = dict(messari_conn.map_completed(fetch, [f"asset-{i}" for i in range(10)]))
+        assert results == {f"asset-{i}": f"asset-{i}" for i in range(10)}
+        assert fake_session.max_in_flight == 4
+
+        with pytest.raises(SystemError):
+            list(messari_conn.map_completed(fetch, ["missing"] + [f"a{i}" for i in range(30)]))
+        time.sleep(0.1)
+        # Items beyond the submitted window were never requested
+        assert len(fake_session.urls) <= 10 + 2 * 4 + 1
+
+    def test_rate_limiter(self):
+        limiter = dataloader.RateLimiter(calls_per_sec=50)
+        start = time.perf_counter()
+        for _ in range(6):
+            limiter.acquire()
+        assert time.perf_counter() - start >= 5 / 50 * 0.9
+
+
+class ScriptedSession(FakeSession):
+    """Answers requests with a scripted sequence of status codes, then 200s."""
+
+    def __init__(self, statuses: List, retry_after: str = None):
+        super().__init__(delay=0)
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None):
+        self.calls += 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == "reset":
+            raise dataloader.requests.exceptions.ConnectionError("connection reset")
+        headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+        return FakeResponse({"data": {"status": status}}, status_code=status, headers=headers)
+
+
+class TestRetries:
+    @pytest.fixture
+    def fast_policy(self) -> dataloader.RetryPolicy:
+        return dataloader.RetryPolicy(max_retries=3, backoff_factor=0.001)
+
+    def make_loader(self, session: FakeSession, **kwargs) -> dataloader.DataLoader:
+        loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={}, **kwargs)
+        loader.session = session
+        return loader
+
+    def test_transient_errors_are_retried(self, fast_policy):
+        session = ScriptedSession([502, "reset", 429])
+        loader = self.make_loader(session, retry_policy=fast_policy)
+        assert loader.get_response("https://data.messari.io/x") == {"data": {"status": 200}}
+        assert session.calls == 4
+
+    def test_gives_up_after_max_retries(self, fast_policy):
+        session = ScriptedSession([503] * 10)
+        loader = self.make_loader(session, retry_policy=fast_policy, breaker_threshold=0)
+        with pytest.raises(SystemError):
+            loader.get_response("https://data.messari.io/x")
+        assert session.calls == 4
+
+    def test_client_errors_are_not_retried(self, fast_policy):
+        session = ScriptedSession([404])
+        loader = self.make_loader(session, retry_policy=fast_policy)
+        with pytest.raises(SystemError):
+            loader.get_response("https://data.messari.io/x")
+        assert session.calls == 1
+
+    def test_retry_after(self, fast_policy):
+        session = ScriptedSession([429], retry_after="0.2")
+        loader = self.make_loader(session, retry_policy=fast_policy)
+        start = time.perf_counter()
+        loader.get_response("https://data.messari.io/x")
+        assert time.perf_counter() - start >= 0.2
+        assert dataloader.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+        session = ScriptedSession([429], retry_after="3600")
+        with pytest.raises(SystemError):
+            self.make_loader(session, retry_policy=fast_policy).get_response(
+                "https://data.messari.io/x")
+        assert session.calls == 1
+
+    def test_circuit_breaker(self):
+        session = ScriptedSession([500] * 4)
+        loader = self.make_loader(session, retry_policy=dataloader.RetryPolicy(max_retries=0),
+                                  breaker_threshold=2, breaker_timeout=0.1)
+        for _ in range(2):
+            with pytest.raises(SystemError):
+                loader.get_response("https://data.messari.io/x")
+        with pytest.raises(dataloader.CircuitOpenError):
+            loader.get_response("https://data.messari.io/x")
+        assert session.calls == 2
+        # Other hosts are unaffected
+        with pytest.raises(SystemError):
+            loader.get_response("https://api.llama.fi/x")
+        assert session.calls == 3
+
+        time.sleep(0.1)
+        session.statuses.clear()
+        assert loader.get_response("https://data.messari.io/x") == {"data": {"status": 200}}
+        assert not loader.circuit_breakers["data.messari.io"].is_open
+
+    def test_per_host_rate_limit(self):
+        loader = self.make_loader(ScriptedSession([]), host_calls_per_sec={"a.io": 20})
+        start = time.perf_counter()
+        for _ in range(3):
+            loader.get_response("https://b.io/x")
+        assert time.perf_counter() - start < 0.05
+        for _ in range(3):
+            loader.get_response("https://a.io/x")
+        assert time.perf_counter() - start >= 2 / 20 * 0.9
+
+
+class TestSingleFlight:
+    def make_loader(self, session: FakeSession, **kwargs) -> dataloader.DataLoader:
+        loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={}, max_workers=16,
+                                       **kwargs)
+        loader.session = session
+        return loader
+
+    def test_identical_requests_are_coalesced(self):
+        class ProtocolsSession(FakeSession):
+            def get(self, url, params=None, headers=None):
+                with self._lock:
+                    self.urls.append(url)
+                time.sleep(self.delay)
+                return FakeResponse([{"slug": "aave", "tokens": {"USDC": 1.0}}])
+
+        session = ProtocolsSession(delay=0.1)
+        loader = self.make_loader(session)
+        results = loader.get_responses(["https://api.llama.fi/protocols"] * 8)
+        assert len(session.urls) == 1
+        assert loader.coalescing_stats == {"executed": 1, "coalesced": 7}
+        # Every waiter decodes its own payload, so in-place edits don't leak
+        results[0][0]["tokens"].pop("USDC")
+        assert results[1][0]["tokens"] == {"USDC": 1.0}
+
+    def test_different_params_are_not_coalesced(self):
+        session = PagingSession(num_rows=100)
+        loader = self.make_loader(session)
+        loader.get_responses(["https://data.messari.io/api/v2/assets"] * 4,
+                             params=[{"page": page, "limit": 10} for page in range(1, 5)])
+        assert sorted(session.pages) == [1, 2, 3, 4]
+        assert loader.coalescing_stats["coalesced"] == 0
+
+    def test_errors_reach_every_waiter(self):
+        session = FakeSession(delay=0.1)
+        loader = self.make_loader(session, retry_policy=dataloader.RetryPolicy(max_retries=0))
+        url = "https://data.messari.io/api/v1/assets/missing/metrics"
+        errors: List[Exception] = []
+
+        def call():
+            try:
+                loader.get_response(url)
+            except SystemError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 4
+        assert len(session.urls) == 1
+
+    def test_disabled(self):
+        session = FakeSession(delay=0.05)
+        loader = self.make_loader(session, coalesce=False)
+        loader.get_responses(["https://data.messari.io/api/v1/assets/btc/metrics"] * 3)
+        assert len(session.urls) == 3
+
+
+class TestJsonDecoding:
+    def test_backends(self):
+        content = b'{"tvl": [1.5, 2], "name": "aave"}'
+        assert json_decoding.get_decoder("json")(content) == {"tvl": [1.5, 2], "name": "aave"}
+        if json_decoding.orjson is not None:
+            assert json_decoding.get_decoder("orjson")(content) == json.loads(content)
+            assert json_decoding.get_decoder("auto") is json_decoding._orjson_loads
+        with pytest.raises(ValueError):
+            json_decoding.get_decoder("simplejson")
+
+    def test_default_is_exact(self):
+        """Integers wider than 64 bits and NaN literals decode like the stdlib"""
+        loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={})
+        decode = loader.json_decoder.decode
+        supply = 123456789012345678901234567890
+        assert decode(b'{"supply": %d}' % supply)["supply"] == supply
+        assert math.isnan(decode(b'{"price": NaN}')["price"])
+
+    @pytest.mark.skipif(json_decoding.orjson is None, reason="orjson is not installed")
+    def test_orjson_falls_back_on_rejected_payloads(self):
+        decode = json_decoding.get_decoder("orjson")
+        assert math.isnan(decode(b'[NaN, 1]')[0])
+        assert decode('{"price": Infinity}')["price"] == math.inf
+
+    def test_decode_stats(self):
+        loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={}, json_backend="json")
+        loader.session = FakeSession(delay=0)
+        for slug in ["bitcoin", "ethereum"]:
+            loader.get_response(f"https://data.messari.io/api/v1/assets/{slug}/metrics")
+        stats = loader.decode_stats
+        assert stats["calls"] == 2
+        assert stats["bytes"] > 0 and stats["seconds"] > 0
+
+    def test_accept_encoding(self):
+        loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={})
+        encodings = loader.session.headers["Accept-Encoding"].split(", ")
+        assert "gzip" in encodings
+        assert ("br" in encodings) == json_decoding.BROTLI
+
+
+class PagingSession(FakeSession):
+    """Serves 'num_rows' asset or market rows split into pages."""
+
+    def __init__(self, num_rows: int, delay: float = 0.01):
+        super().__init__(delay=delay)
+        self.num_rows = num_rows
+        self.pages: List[int] = []
+
+    def get(self, url, params=None, headers=None):
+        with self._lock:
+            self.pages.append(params["page"])
+        time.sleep(self.delay)
+        start = (params["page"] - 1) * params["limit"]
+        stop = min(start + params["limit"], self.num_rows)
+        rows = [{"slug": f"asset-{i}", "metrics": {"marketcap": {"rank": i}}}
+                for i in range(start, stop)]
+        return FakeResponse({"data": rows})
+
+
+class TestPagination:
+    def test_iter_all_assets(self):
+        conn = messari_api.Messari(api_key="test")
+        conn.session = PagingSession(num_rows=1234)
+        rows = list(conn.iter_all_assets(asset_fields="metrics", prefetch=3))
+
+        assert [row["slug"] for row in rows] == [f"asset-{i}" for i in range(1234)]
+        assert rows[7]["metrics_marketcap_rank"] == 7
+        assert sorted(set(conn.session.pages))[:3] == [1, 2, 3]
+        assert max(conn.session.pages) <= 3 + 3
+
+    def test_exact_multiple_of_limit(self):
+        conn = messari_api.Messari(api_key="test")
+        conn.session = PagingSession(num_rows=40)
+        markets = list(conn.iter_all_markets(limit=20, prefetch=2))
+        assert len(markets) == 40
+
+    def test_max_pages_and_early_stop(self):
+        conn = messari_api.Messari(api_key="test")
+        conn.session = PagingSession(num_rows=10_000)
+        rows = list(conn.iter_all_assets(limit=100, max_pages=3))
+        assert len(rows) == 300
+        assert max(conn.session.pages) == 3
+
+        first = next(conn.iter_all_assets(limit=100, flatten=False))
+        assert first["metrics"] == {"marketcap": {"rank": 0}}
+
+    def test_invalid_limit(self):
+        conn = messari_api.Messari(api_key="test")
+        with pytest.raises(ValueError):
+            next(conn.iter_all_markets(limit=501))
+
+
+class TimeseriesSession(FakeSession):
+    """Serves price points on the interval grid for the requested [start, end]."""
+
+    def __init__(self):
+        super().__init__(delay=0.0)
+        self.windows: List[tuple] = []
+
+    def get(self, url, params=None, headers=None):
+        with self._lock:
+            self.windows.append((params["start"], params["end"]))
+        start = pd.Timestamp(params["start"]).value // 10**6
+        end = pd.Timestamp(params["end"]).value // 10**6
+        step = helpers.TIMESERIES_INTERVALS[params["interval"]].value // 10**6
+        first = -(-start // step) * step
+        values = [[ts, 1.0, 2.0, 0.5, 1.5, 10.0]
+                  for ts in range(first, end + 1, step)]
+        return FakeResponse({"data": {
+            "parameters": {"asset_key": "btc", "start": params["start"],
+                           "end": params["end"], "interval": params["interval"],
+                           "columns": ["timestamp", "open", "high", "low", "close", "volume"]},
+            "values": values}})
+
+
+class TestTimeseriesWindows:
+    def test_windowed_fetch_matches_single_request(self):
+        conn = messari_api.Messari(api_key="test")
+        conn.session = TimeseriesSession()
+        windowed_df = conn.get_metric_timeseries(
+            asset_slugs=["bitcoin", "ethereum"], asset_metric="price",
+            start="2021-01-01", end="2021-01-20", interval="5m")
+        num_windows = len(conn.session.windows) // 2
+        assert num_windows == 3
+
+        conn.session = TimeseriesSession()
+        single_df = conn.get_metric_timeseries(
+            asset_slugs=["bitcoin", "ethereum"], asset_metric="price",
+            start="2021-01-01", end="2021-01-20", interval="5m", max_points=10**6)
+        assert len(conn.session.windows) == 2
+
+        pd.testing.assert_frame_equal(windowed_df, single_df)
+        assert windowed_df.index.is_unique
+        assert len(windowed_df) == 19 * 24 * 12 + 1
+
+    def test_short_range_is_one_request(self):
+        conn = messari_api.Messari(api_key="test")
+        conn.session = TimeseriesSession()
+        conn.get_metric_timeseries(asset_slugs="bitcoin", asset_metric="price",
+                                   start="2021-01-01", end="2021-01-02", interval="5m")
+        assert conn.session.windows == [("2021-01-01", "2021-01-02")]
+
+
+class TestTimeseriesToDataframe:
+    @pytest.fixture
+    def response_data(self) -> Dict[str, Dict]:
+        columns = ["timestamp", "open", "close"]
+        return {
+            "bitcoin": {"parameters_columns": columns,
+                        "values": [[0, 1.0, 2.0], [60_000, 3.0, None], [120_000, 5.0, 6.0]]},
+            # Ragged, offset history so the timestamp union has to be merged
+            "ethereum": {"parameters_columns": columns,
+                         "values": [[60_000, 7.0, 8.0], [180_000, 9.0, 10.0]]},
+            "delisted": {"parameters_columns": columns, "values": None},
+        }
+
+    def test_matches_concat_builder(self, response_data):
+        expected = helpers._timeseries_to_dataframe_concat(
+            {k: v for k, v in response_data.items() if k != "delisted"})
+        result = helpers.timeseries_to_dataframe(response_data)
+        pd.testing.assert_frame_equal(expected, result, check_freq=False)
+        assert list(result.index.asi8 // 10**6) == [0, 60_000, 120_000, 180_000]
+        assert result[("ethereum", "open")].isna().tolist() == [True, False, True, False]
+
+    def test_float32(self, response_data):
+        result = helpers.timeseries_to_dataframe(response_data, dtype="float32")
+        assert (result.dtypes == "float32").all()
+        assert result.loc[result.index[1], ("bitcoin", "open")] == 3.0
+
+    @pytest.mark.parametrize("dtype", ["float64", "float32"])
+    def test_fallback_keeps_dtype(self, response_data, dtype):
+        # A string value sends the whole response down the per-asset concat path
+        response_data["bitcoin"]["values"][1][2] = "n/a"
+        result = helpers.timeseries_to_dataframe(response_data, dtype=dtype)
+        assert (result.dtypes == dtype).all()
+        assert list(result.columns.get_level_values(0).unique()) == ["bitcoin", "ethereum"]
+        response_data["bitcoin"]["values"][1][2] = None
+        expected = helpers.timeseries_to_dataframe(response_data, dtype=dtype)
+        pd.testing.assert_frame_equal(expected, result, check_freq=False, check_names=False)
+
+    def test_invalid_dtype(self, response_data):
+        with pytest.raises(ValueError):
+            helpers.timeseries_to_dataframe(response_data, dtype="int64")
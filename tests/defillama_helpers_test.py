@@ -0,0 +1,138 @@
+"""Offline tests for 'pycaw.defillama.helpers'."""
+import copy
+import pandas as pd
+import pytest
+
+from benchmarks import defillama_tvl_benchmark
+from benchmarks import payloads
+from benchmarks import tvl_decomposition_benchmark
+from pycaw.defillama import helpers
+from pycaw.messari import utils
+
+from typing import Dict
+
+
+class TestProtocolTvlDf:
+    def test_matches_concat_builder(self):
+        protocols = {"aave": payloads.synthetic_protocol(num_days=60, num_chains=2,
+                                                         num_tokens=4, seed=1),
+                     "curve": payloads.synthetic_protocol(num_days=40, num_chains=3,
+                                                          num_tokens=3, seed=2)}
+        expected = defillama_tvl_benchmark.baseline(copy.deepcopy(protocols))
+        result = helpers.protocols_tvl_df(protocols)
+        pd.testing.assert_frame_equal(expected, result, check_dtype=False)
+
+    def test_keeps_last_point_of_each_day(self):
+        protocol = payloads.synthetic_protocol(num_days=3, num_chains=1, num_tokens=2)
+        untouched = copy.deepcopy(protocol)
+        result = helpers.protocol_tvl_df(protocol)
+        assert protocol == untouched
+        assert len(result) == 3
+        assert (result.dtypes == "float64").all()
+        last = protocol["chainTvls"]["Chain0"]["tvl"][-1]["totalLiquidityUSD"]
+        assert result[("Chain0", "totalLiquidityUSD")].iloc[-1] == last
+        assert list(result.columns.get_level_values(0).unique()) == ["Chain0", "all"]
+
+
+class TestProtocolTvlOutputs:
+    @pytest.fixture
+    def protocols(self) -> Dict[str, Dict]:
+        return {"aave": payloads.synthetic_protocol(num_days=30, num_chains=2, num_tokens=3),
+                "curve": payloads.synthetic_protocol(num_days=20, num_chains=1, num_tokens=2,
+                                                     seed=1, launch_day=15)}
+
+    def test_sparse_matches_wide(self, protocols):
+        wide = helpers.protocols_tvl_df(protocols)
+        sparse = helpers.protocols_tvl_df(protocols, output="sparse")
+        assert all(isinstance(dtype, pd.SparseDtype) for dtype in sparse.dtypes)
+        pd.testing.assert_frame_equal(wide, sparse.sparse.to_dense())
+
+    def test_long_matches_wide(self, protocols):
+        wide = helpers.protocols_tvl_df(protocols)
+        long_df = helpers.protocols_tvl_df(protocols, output="long")
+        assert list(long_df.columns) == ["protocol", "chain", "token", "amount", "amount_usd"]
+        assert long_df.index.is_monotonic_increasing
+        assert list(long_df["protocol"].cat.categories) == ["aave", "curve"]
+        assert (long_df[["amount", "amount_usd"]].notna().sum().sum()
+                == wide.notna().sum().sum())
+
+        totals = long_df[long_df["token"] == "totalLiquidityUSD"]
+        assert totals["amount"].isna().all()
+        pivoted = totals.pivot_table(index=totals.index.date, columns=["protocol", "chain"],
+                                     values="amount_usd", observed=True)
+        pivoted.columns = pd.MultiIndex.from_tuples(list(pivoted.columns))
+        expected = wide.xs("totalLiquidityUSD", axis=1, level=2)
+        pd.testing.assert_frame_equal(expected, pivoted[expected.columns], check_names=False)
+
+        row = long_df[(long_df["protocol"] == "aave") & (long_df["chain"] == "Chain1")
+                      & (long_df["token"] == "TOKEN0")].iloc[-1]
+        column = wide[("aave", "Chain1")].dropna(subset=["TOKEN0"]).iloc[-1]
+        assert (row["amount"], row["amount_usd"]) == (column["TOKEN0"], column["TOKEN0_usd"])
+
+    def test_long_token_codes_past_20_bits(self):
+        series = payloads.synthetic_protocol(num_days=5, num_chains=1,
+                                             num_tokens=3)["chainTvls"]["Chain0"]
+        token_codes = {f"SEEN{i}": i for i in range((1 << 20) + 5)}
+        days, codes, amounts, amounts_usd = helpers._chain_long(series, token_codes)
+        names = list(token_codes)
+        last = series["tokensInUsd"][-1]
+        for token, amount in last["tokens"].items():
+            row = (days == days.max()) & (codes == token_codes[token])
+            assert amounts_usd[row].tolist() == [amount]
+        assert {names[code] for code in codes} == {"totalLiquidityUSD", *last["tokens"]}
+
+    def test_invalid_output(self, protocols):
+        with pytest.raises(ValueError):
+            helpers.protocols_tvl_df(protocols, output="dense")
+
+
+class TestDateWindow:
+    def test_window_matches_time_filter(self):
+        protocol = payloads.synthetic_protocol(num_days=90, num_chains=2, num_tokens=4)
+        start, end = helpers.date_window("2019-02-01", "2019-02-07")
+        assert (start, end) == (1548979200, 1548979200 + 7 * 86400)
+        windowed = helpers.protocol_tvl_df(helpers.window_protocol(protocol, start, end))
+
+        full = utils.time_filter_df(helpers.protocol_tvl_df(protocol),
+                                    start_date="2019-02-01", end_date="2019-02-07")
+        assert len(windowed) == 7
+        # Tokens with no points in the window have no column
+        full = full.dropna(axis=1, how="all")
+        assert set(full.columns) == set(windowed.columns)
+        pd.testing.assert_frame_equal(full[windowed.columns], windowed)
+
+    def test_window_points(self):
+        points = [{"date": str(86400 * day + 3600 * hour)} for day in range(5) for hour in (0, 23)]
+        windowed = helpers.window_points(points, start=86400, end=3 * 86400)
+        assert [int(point["date"]) // 86400 for point in windowed] == [1, 1, 2, 2]
+        assert helpers.window_points(points) is points
+        assert helpers.window_points(points, start=10 * 86400) == []
+
+
+class TestTvlDecomposition:
+    def test_matches_clean_tvl_data(self):
+        for num_tokens in (4, 15):
+            protocol_df = helpers.protocol_tvl_df(payloads.synthetic_protocol(
+                num_days=80, num_chains=3, num_tokens=num_tokens, seed=num_tokens))
+            expected = tvl_decomposition_benchmark.baseline_clean_tvl_data(protocol_df)
+            pd.testing.assert_frame_equal(expected, helpers.tvl_decomposition(protocol_df))
+
+    def test_top_n_and_other(self):
+        index = pd.Index([f"2022-01-0{day}" for day in range(1, 5)])
+        protocol_df = pd.DataFrame({
+            ("Ethereum", "totalLiquidityUSD"): [6.0, 6.0, 6.0, 6.0],
+            ("Ethereum", "A_usd"): [1.0, None, 3.0, None],
+            ("Ethereum", "B_usd"): [None, 2.0, None, 1.0],
+            ("Ethereum", "C_usd"): [2.0, 2.0, 2.0, 4.0],
+            ("Ethereum", "A"): [10.0, 10.0, 10.0, 10.0],
+        }, index=index)
+        result = helpers.tvl_decomposition(pd.concat({"aave": protocol_df}, axis=1), top_n=1)
+        assert list(result.columns) == [("Ethereum", "C"), ("Ethereum", "Other")]
+        assert result[("Ethereum", "Other")].tolist() == [1.0, 2.0, 3.0, 1.0]
+
+        untouched = helpers.tvl_decomposition(protocol_df, top_n=3)
+        assert list(untouched.columns.get_level_values(1)) == ["A", "B", "C"]
+        # Interpolated forward only, trailing gaps repeat the last value
+        assert untouched[("Ethereum", "A")].tolist() == [1.0, 2.0, 3.0, 3.0]
+        assert untouched[("Ethereum", "B")].isna().tolist() == [True, False, False, False]
+        assert untouched[("Ethereum", "B")].tolist()[1:] == [2.0, 1.5, 1.0]
@@ -1,9 +1,32 @@
+import os
+import time
 import pandas as pd
-from pycaw import defillama as dl 
+import pytest
+from pycaw import defillama as dl
+from tests.dataloader_test import FakeResponse, FakeSession
+from tests.http_fixtures import use_cassette
+
+from typing import Dict
+
+
+CASSETTE = os.path.join(os.path.dirname(__file__), "cassettes", "defillama.json")
 
 
 class TestDeFiLlama():
-    """Test suite for the 'defillama.DeFiLlama' class."""
+    """Test suite for the 'defillama.DeFiLlama' class.
+
+    Each test runs against the live API (marked 'live') and offline from
+    CASSETTE. Set PYCAW_CASSETTE_MODE=record to record it again from the API.
+    """
+
+    @pytest.fixture(autouse=True,
+                    params=[pytest.param("live", marks=pytest.mark.live), "cassette"])
+    def source(self, request):
+        if request.param == "live":
+            yield
+        else:
+            with use_cassette(CASSETTE, mode=os.getenv("PYCAW_CASSETTE_MODE", "replay")):
+                yield
 
     def test_init(self):
         """Test initializing DeFiLlama class"""
@@ -34,6 +57,8 @@ class TestDeFiLlama():
             chains, start_date="2021-10-01", end_date="2021-10-10"
         )
         assert isinstance(chain_tvl, pd.DataFrame)
+        assert list(chain_tvl.columns) == chains
+        assert len(chain_tvl) == 10
 
     def test_current_tvl(self):
         """Test getting current protocol tvl"""
@@ -46,4 +71,218 @@ class TestDeFiLlama():
         """Test getting protocol info"""
         dl_conn = dl.DeFiLlama()
         protocols = dl_conn.get_protocols()
-        assert isinstance(protocols, pd.DataFrame)
\ No newline at end of file
+        assert isinstance(protocols, pd.DataFrame)
+
+
+def protocol_payload(url: str, params: Dict = None):
+    """A small '/protocol/{slug}' response with the TVL depending on the slug."""
+    slug = url.rsplit("/", 1)[1]
+    day = 86400 * 18900
+    points = [{"date": day + i * 86400, "totalLiquidityUSD": float(i + len(slug))}
+              for i in range(5)]
+    tokens = [{"date": day + i * 86400, "tokens": {"USDC": float(i)}} for i in range(5)]
+    chain = {"tvl": points, "tokens": tokens, "tokensInUsd": tokens}
+    return {"chains": ["Ethereum"], "chainTvls": {"Ethereum": chain},
+            "tvl": points, "tokens": tokens, "tokensInUsd": tokens}, 200
+
+
+LISTING = [
+    {"name": "Aave V3", "slug": "aave-v3", "category": "Lending", "chain": "Multi-Chain",
+     "chains": ["Ethereum", "Arbitrum"], "tvl": 12e9,
+     "chainTvls": {"Ethereum": 11e9, "Arbitrum": 1e9}, "change_1d": "1.5", "mcap": None},
+    {"name": "Radiant", "slug": "radiant", "category": "Lending", "chain": "Arbitrum",
+     "chains": ["Arbitrum"], "tvl": 5e6, "chainTvls": {"Arbitrum": 5e6}, "change_1d": -2.0},
+    {"name": "GMX", "slug": "gmx", "category": "Derivatives", "chain": "Arbitrum",
+     "chains": ["Arbitrum", "Avalanche"], "tvl": 5e8,
+     "chainTvls": {"Arbitrum": 4e8, "Avalanche": 1e8}, "change_1d": None},
+]
+
+
+class ProtocolSession(FakeSession):
+    """Stands in for 'requests.Session' on the protocol, chart and tvl endpoints."""
+
+    def __init__(self, delay: float = 0.0):
+        FakeSession.__init__(self, delay=delay)
+        self.listing = LISTING
+
+    def get(self, url, params=None, headers=None):
+        with self._lock:
+            self.urls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Longer names answer later, so completion order differs from request order
+        time.sleep(self.delay * len(url.rsplit("/", 1)[1]))
+        with self._lock:
+            self.in_flight -= 1
+        name = url.rsplit("/", 1)[1]
+        if url.endswith("/protocols"):
+            return FakeResponse(self.listing)
+        if url.endswith("/tvl/missing"):
+            return FakeResponse({}, status_code=404)
+        if url.endswith("/tvl/unlisted"):
+            return FakeResponse({"message": "Protocol is not in our database"})
+        if "/tvl/" in url:
+            return FakeResponse(float(len(name)))
+        if "/charts/" in url:
+            return FakeResponse([{"date": 86400 * 18900, "totalLiquidityUSD": len(name)}])
+        return FakeResponse(protocol_payload(url)[0])
+
+
+class TestDeFiLlamaConcurrency:
+    """Offline tests of the concurrent 'defillama.DeFiLlama' requests."""
+
+    @pytest.fixture
+    def session(self) -> ProtocolSession:
+        return ProtocolSession(delay=0.005)
+
+    @pytest.fixture
+    def dl_conn(self, session: ProtocolSession) -> dl.DeFiLlama:
+        dl_conn = dl.DeFiLlama(max_workers=4)
+        dl_conn.session = session
+        return dl_conn
+
+    def test_get_protocol_tvl(self, dl_conn, session):
+        slugs = [f"protocol-{'x' * i}" for i in range(8)]
+        tvl = dl_conn.get_protocol_tvl_timeseries(slugs)
+        assert list(tvl.columns.get_level_values(0).unique()) == slugs
+        assert session.max_in_flight == 4
+
+    def test_chain_and_current_tvl(self, dl_conn, session):
+        chains = ["Polygon", "Avalanche", "BSC"]
+        chain_tvl = dl_conn.get_chain_tvl_timeseries(chains)
+        assert chain_tvl.iloc[0].tolist() == [len(chain) for chain in chains]
+        current_tvl = dl_conn.get_current_tvl(chains)
+        assert current_tvl["tvl"].tolist() == [len(chain) for chain in chains]
+
+    def test_iter_protocol_tvl(self, dl_conn, session):
+        slugs = ["convex-finance", "aave", "curve", "uniswap"]
+        streamed = dict(dl_conn.iter_protocol_tvl_timeseries(slugs, output="sparse"))
+        assert list(streamed) == ["aave", "curve", "uniswap", "convex-finance"]
+        expected = dl_conn.get_protocol_tvl_timeseries(["aave"], output="sparse")
+        pd.testing.assert_frame_equal(expected, streamed["aave"])
+
+    def test_iter_protocol_tvl_stops_early(self, dl_conn, session):
+        slugs = [f"protocol-{i}" for i in range(40)]
+        stream = dl_conn.iter_protocol_tvl_timeseries(slugs)
+        next(stream)
+        stream.close()
+        time.sleep(0.2)
+        # Only the submitted window was requested
+        assert len(session.urls) <= 2 * 4 + 1
+
+    def test_invalid_output(self, dl_conn):
+        with pytest.raises(ValueError):
+            dl_conn.iter_protocol_tvl_timeseries(["aave"], output="dense")
+
+
+class TestProtocolCatalog:
+    """Offline tests of 'defillama.ProtocolCatalog'."""
+
+    def test_columns_and_indexes(self):
+        catalog = dl.ProtocolCatalog.from_protocols(LISTING)
+        assert list(catalog.df.index) == ["aave-v3", "radiant", "gmx"]
+        assert catalog.df["change_1d"].dtype == "float64"
+        assert catalog.df["change_1d"].iloc[0] == 1.5
+        assert catalog.df["category"].dtype == "category"
+        assert catalog.get("gmx")["name"] == "GMX"
+        assert catalog.get_by_name("aave v3")["slug"] == "aave-v3"
+        assert catalog.get("missing") is None
+        assert "radiant" in catalog and len(catalog) == 3
+
+    def test_find(self):
+        catalog = dl.ProtocolCatalog.from_protocols(LISTING)
+        assert catalog.find(chain="Arbitrum", category="Lending") == ["aave-v3", "radiant"]
+        # TVL bounds apply to the TVL on the chain
+        assert catalog.find(chain="Arbitrum", min_tvl=10e6) == ["aave-v3", "gmx"]
+        assert catalog.find(chain="Ethereum", min_tvl=12e9) == []
+        assert catalog.find(min_tvl=1e9) == ["aave-v3"]
+        assert catalog.find(chain="Solana") == []
+        assert list(catalog.query(category="Derivatives").index) == ["gmx"]
+
+    def test_refresh(self):
+        session = ProtocolSession()
+        dl_conn = dl.DeFiLlama()
+        dl_conn.session = session
+        catalog = dl_conn.get_protocol_catalog()
+        assert catalog.find(category="Lending") == ["aave-v3", "radiant"]
+
+        session.listing = LISTING[2:]
+        catalog.refresh()
+        assert catalog.find(category="Lending") == []
+
+    def test_background_refresh_keeps_snapshot_on_failure(self):
+        session = ProtocolSession()
+        dl_conn = dl.DeFiLlama(retry_policy=dl.dataloader.RetryPolicy(max_retries=0))
+        dl_conn.session = session
+        catalog = dl_conn.get_protocol_catalog(refresh_interval=0.01)
+        try:
+            assert len(catalog) == 3
+            session.listing = LISTING[:1]
+            time.sleep(0.1)
+            assert len(catalog) == 1
+            session.get = lambda *args, **kwargs: FakeResponse({}, status_code=500)
+            time.sleep(0.1)
+            assert isinstance(catalog.last_error, SystemError)
+            assert len(catalog) == 1
+        finally:
+            catalog.stop()
+
+
+class TestCurrentTvlSnapshot:
+    """Offline tests of 'defillama.DeFiLlama.get_current_tvl'."""
+
+    @pytest.fixture
+    def session(self) -> ProtocolSession:
+        return ProtocolSession()
+
+    @pytest.fixture
+    def dl_conn(self, session: ProtocolSession) -> dl.DeFiLlama:
+        dl_conn = dl.DeFiLlama(retry_policy=dl.dataloader.RetryPolicy(max_retries=0))
+        dl_conn.session = session
+        return dl_conn
+
+    def test_structured_errors(self, dl_conn, session):
+        tvl_df, errors_df = dl_conn.get_current_tvl(["gmx", "missing", "unlisted"],
+                                                    return_errors=True)
+        assert tvl_df["tvl"].to_dict() == {"gmx": 3.0}
+        assert errors_df["type"].to_dict() == {"missing": "http", "unlisted": "api"}
+        assert errors_df.loc["unlisted", "message"] == "Protocol is not in our database"
+        assert len(session.urls) == 3
+
+    def test_transport_errors_per_slug(self, dl_conn, session):
+        class InvalidJsonResponse(FakeResponse):
+            content = b"<html>Bad gateway</html>"
+
+        answer = session.get
+
+        def get(url, params=None, headers=None):
+            if url.endswith("/tvl/unreachable"):
+                raise dl.dataloader.requests.exceptions.ConnectionError("Connection refused")
+            if url.endswith("/tvl/garbled"):
+                return InvalidJsonResponse(None)
+            return answer(url, params, headers)
+
+        session.get = get
+        tvl_df, errors_df = dl_conn.get_current_tvl(["unreachable", "gmx", "garbled"],
+                                                    return_errors=True)
+        assert tvl_df["tvl"].to_dict() == {"gmx": 3.0}
+        assert errors_df["type"].to_dict() == {"unreachable": "http", "garbled": "decode"}
+        assert errors_df.loc["unreachable", "message"] == "ConnectionError: Connection refused"
+
+    def test_snapshot(self, dl_conn, session):
+        slugs = ["aave-v3", "radiant", "gmx", "curve"]
+        tvl_df = dl_conn.get_current_tvl(slugs, snapshot=True)
+        # One '/protocols' call, plus one for the slug it doesn't list
+        assert sorted(url.rsplit("/", 1)[1] for url in session.urls) == ["curve", "protocols"]
+        assert list(tvl_df.index) == slugs
+        assert tvl_df["tvl"].tolist() == [12e9, 5e6, 5e8, 5.0]
+
+        dl_conn.get_current_tvl(slugs[:3], snapshot=True)
+        assert len(session.urls) == 2
+        dl_conn.get_current_tvl(slugs[:3], snapshot=True, max_age=0)
+        assert len(session.urls) == 3
+
+    def test_no_errors(self, dl_conn):
+        tvl_df, errors_df = dl_conn.get_current_tvl("gmx", snapshot=True, return_errors=True)
+        assert tvl_df["tvl"].tolist() == [5e8]
+        assert errors_df.empty and list(errors_df.columns) == ["type", "message"]
@@ -0,0 +1,60 @@
+"""Offline tests for 'pycaw.defillama.tvl_report'."""
+import os
+import pandas as pd
+import pytest
+
+from pycaw.defillama import defillama
+from pycaw.defillama import helpers
+from pycaw.defillama import tvl_report
+from pycaw.defillama import tvl_store
+from tests.dataloader_test import FakeResponse
+from tests.defillama_tvl_store_test import GrowingHistorySession
+
+
+class FailingHistorySession(GrowingHistorySession):
+    """Like GrowingHistorySession, with a 500 for the 'broken' protocol."""
+
+    def get(self, url, params=None, headers=None):
+        if url.endswith("/broken"):
+            self.urls.append(url)
+            return FakeResponse({}, status_code=500)
+        return GrowingHistorySession.get(self, url, params, headers)
+
+
+class TestTvlReport:
+    @pytest.fixture
+    def store(self, tmp_path) -> tvl_store.TvlHistoryStore:
+        llama = defillama.DeFiLlama(retry_policy=defillama.dataloader.RetryPolicy(max_retries=0))
+        llama.session = FailingHistorySession(num_days=40)
+        return tvl_store.TvlHistoryStore(llama, store_dir=str(tmp_path / "store"))
+
+    def test_reports_and_summary(self, store, tmp_path):
+        out_dir = str(tmp_path / "reports")
+        summary = tvl_report.run_reports(["aave", "curve", "broken"], out_dir, store,
+                                         start_date="2019-01-20", formats=["csv"], workers=1)
+        assert summary["status"].tolist() == ["ok", "ok", "sync_failed"]
+        assert summary.loc["aave", "days"] == 21
+        assert "500" in summary.loc["broken", "error"]
+        assert sorted(os.listdir(out_dir)) == ["aave.csv", "curve.csv", "summary.csv"]
+
+        report = pd.read_csv(os.path.join(out_dir, "aave.csv"), header=[0, 1], index_col=0)
+        expected = helpers.tvl_decomposition(
+            store.get_protocol_tvl_timeseries("aave", start_date="2019-01-20", sync=False))
+        assert report.shape == expected.shape
+        assert report.to_numpy() == pytest.approx(expected.to_numpy(), nan_ok=True)
+
+    def test_stale_history_and_worker_processes(self, store, tmp_path):
+        out_dir = str(tmp_path / "reports")
+        tvl_report.run_reports(["aave"], out_dir, store, formats=["csv"], workers=1)
+        # The API is down, reports come from the stored histories
+        store.llama.session.get = lambda url, params=None, headers=None: FakeResponse(
+            {}, status_code=500)
+        summary = tvl_report.run_reports(["aave", "curve"], out_dir, store, formats=["csv"],
+                                         workers=2)
+        assert summary["status"].tolist() == ["stale", "sync_failed"]
+        assert summary.loc["aave", "days"] == 40
+
+    def test_png_needs_matplotlib(self, store, tmp_path, monkeypatch):
+        monkeypatch.setattr(tvl_report, "Figure", None)
+        with pytest.raises(ImportError):
+            tvl_report.run_reports(["aave"], str(tmp_path), store, formats=["csv", "png"])
@@ -0,0 +1,111 @@
+"""Offline tests for 'pycaw.defillama.tvl_store'."""
+import copy
+import pandas as pd
+import pytest
+
+from benchmarks import payloads
+from pycaw.defillama import defillama
+from pycaw.defillama import tvl_store
+from tests.dataloader_test import FakeResponse, FakeSession
+
+from typing import Dict, List
+
+HISTORY = payloads.synthetic_protocol(num_days=60, num_chains=2, num_tokens=4)
+
+
+class GrowingHistorySession(FakeSession):
+    """Serves the first num_days of a history, plus an intraday point of the last day."""
+
+    def __init__(self, num_days: int):
+        FakeSession.__init__(self, delay=0)
+        self.num_days = num_days
+
+    def _cut(self, points: List[Dict]) -> List[Dict]:
+        latest = copy.deepcopy(points[self.num_days - 1])
+        latest["date"] = type(latest["date"])(int(latest["date"]) + 3600)
+        if "totalLiquidityUSD" in latest:
+            latest["totalLiquidityUSD"] += 1.0
+        return copy.deepcopy(points[:self.num_days]) + [latest]
+
+    def get(self, url, params=None, headers=None):
+        self.urls.append(url)
+        if "/charts/" in url:
+            return FakeResponse(self._cut(
+                [{"date": str(point["date"]), "totalLiquidityUSD": point["totalLiquidityUSD"]}
+                 for point in HISTORY["tvl"][:-1]]))
+        protocol = {key: self._cut(HISTORY[key]) for key in ("tvl", "tokens", "tokensInUsd")}
+        protocol["chains"] = HISTORY["chains"]
+        protocol["chainTvls"] = {
+            chain: {key: self._cut(HISTORY["chainTvls"][chain][key])
+                    for key in ("tvl", "tokens", "tokensInUsd")}
+            for chain in HISTORY["chains"]}
+        return FakeResponse(protocol)
+
+
+class TestTvlHistoryStore:
+    @pytest.fixture
+    def llama(self) -> defillama.DeFiLlama:
+        llama = defillama.DeFiLlama()
+        llama.session = GrowingHistorySession(num_days=40)
+        return llama
+
+    @pytest.fixture
+    def store(self, llama, tmp_path) -> tvl_store.TvlHistoryStore:
+        return tvl_store.TvlHistoryStore(llama, store_dir=str(tmp_path))
+
+    def test_incremental_protocol_sync(self, store, llama):
+        assert store.sync_protocols("aave") == {"aave": 40}
+        assert str(store.last_date("protocol", "aave")) == "2019-02-09"
+
+        llama.session.num_days = 45
+        # The last stored day is parsed again, its intraday point may have changed
+        assert store.sync_protocols("aave") == {"aave": 6}
+        stored = store.get_protocol_tvl_timeseries("aave", sync=False)
+        expected = llama.get_protocol_tvl_timeseries("aave")
+        pd.testing.assert_frame_equal(expected, stored, check_dtype=False)
+
+        window = store.get_protocol_tvl_timeseries("aave", start_date="2019-02-01",
+                                                   end_date="2019-02-05", sync=False)
+        pd.testing.assert_frame_equal(window, stored.loc[window.index])
+        assert len(window) == 5
+
+    def test_incremental_chain_sync(self, store, llama):
+        store.sync_chains(["Ethereum", "Arbitrum"])
+        llama.session.num_days = 50
+        assert store.sync_chains("Ethereum") == {"Ethereum": 11}
+        stored = store.get_chain_tvl_timeseries(["Ethereum"], sync=False)
+        expected = llama.get_chain_tvl_timeseries(["Ethereum"])
+        pd.testing.assert_frame_equal(expected, stored, check_dtype=False)
+        # The latest point of a day wins
+        assert stored["Ethereum"].iloc[-1] == HISTORY["tvl"][49]["totalLiquidityUSD"] + 1.0
+
+    def test_chain_without_history(self, store, llama):
+        store.sync_chains("Ethereum")
+        chains_df = store.get_chain_tvl_timeseries(["Ethereum", "Nochain"], sync=False)
+        assert list(chains_df.columns) == ["Ethereum", "Nochain"]
+        assert len(chains_df) == 40 and chains_df["Nochain"].isna().all()
+
+        # A chain whose history comes back empty
+        get = llama.session.get
+        llama.session.get = lambda url, params=None, headers=None: (
+            FakeResponse([]) if url.endswith("/Nochain") else get(url, params, headers))
+        chains_df = store.get_chain_tvl_timeseries(["Nochain", "Ethereum"])
+        assert list(chains_df.columns) == ["Nochain", "Ethereum"]
+        assert chains_df["Nochain"].isna().all() and chains_df["Ethereum"].notna().all()
+
+    def test_new_columns(self):
+        history = tvl_store.TvlHistory.empty()
+        first = pd.DataFrame({("Ethereum", "totalLiquidityUSD"): [1.0, 2.0],
+                              ("all", "totalLiquidityUSD"): [1.0, 2.0]},
+                             index=pd.to_datetime(["2021-01-01", "2021-01-02"]).date)
+        history.merge(tvl_store.TvlHistory.from_frame(first))
+        second = pd.DataFrame({("Ethereum", "totalLiquidityUSD"): [3.0, 4.0],
+                               ("Ethereum", "USDC"): [5.0, 6.0],
+                               ("all", "totalLiquidityUSD"): [3.0, 4.0]},
+                              index=pd.to_datetime(["2021-01-02", "2021-01-03"]).date)
+        history.merge(tvl_store.TvlHistory.from_frame(second))
+        merged = history.to_frame()
+        assert list(merged.columns) == [("Ethereum", "totalLiquidityUSD"), ("Ethereum", "USDC"),
+                                        ("all", "totalLiquidityUSD")]
+        assert merged[("Ethereum", "totalLiquidityUSD")].tolist() == [1.0, 3.0, 4.0]
+        assert merged[("Ethereum", "USDC")].isna().tolist() == [True, False, False]
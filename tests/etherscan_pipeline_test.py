@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import json
+import os
+import sqlite3
+import pytest
+
+from pycaw.etherscan import pipeline
+
+from typing import Any, Dict, List
+
+
+def make_log(block_number: int, log_index: int) -> Dict[str, Any]:
+    return {
+        "address": "0x6b175474e89094c44da98b954eedeac495271d0f",
+        "topics": ["0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"],
+        "data": "0x" + "00" * 32,
+        "blockNumber": hex(block_number),
+        "transactionHash": f"0x{block_number:064x}",
+        "logIndex": hex(log_index) if log_index else "0x",
+    }
+
+
+class FakeLogConnector:
+    """Serves 'get_event_log' pages from an in-memory, block-ordered list."""
+
+    def __init__(self, logs: List[Dict[str, Any]]):
+        self.logs = logs
+        self.calls: List[Dict[str, Any]] = []
+
+    def get_event_log(self, address, topic0, from_block=None, to_block=None,
+                      page=None, offset=None):
+        self.calls.append(dict(from_block=from_block, page=page, offset=offset))
+        in_range = [log for log in self.logs
+                    if int(log["blockNumber"], 16) >= from_block]
+        return in_range[(page - 1) * offset: page * offset]
+
+
+def fake_decoder(data: str, topics: List[str], abi: Any):
+    return ("Transfer", json.dumps({"value": len(data)}), json.dumps([]))
+
+
+class TestEventLogPipeline:
+    @pytest.fixture
+    def logs(self) -> List[Dict[str, Any]]:
+        return [make_log(block_number=block, log_index=i)
+                for block in range(100, 160) for i in range(5)]
+
+    def test_pages_through_result_window(self, logs, monkeypatch):
+        monkeypatch.setattr(pipeline, "MAX_RESULT_WINDOW", 100)
+        connector = FakeLogConnector(logs)
+        log_pipeline = pipeline.EventLogPipeline(
+            connector, abi=[], sink=pipeline.CallbackSink(lambda _: None),
+            page_size=20, decoder=fake_decoder)
+        pages = list(log_pipeline.iter_pages("0x", "0x", from_block=100))
+
+        seen = [(log["transactionHash"], log["logIndex"])
+                for page in pages for log in page]
+        assert len(seen) == len(logs)
+        assert len(set(seen)) == len(logs)
+        assert any(call["from_block"] > 100 for call in connector.calls)
+
+    def test_run_to_sqlite(self, logs, tmp_path):
+        db_path = os.path.join(tmp_path, "logs.db")
+        sink = pipeline.SQLiteSink(db_path)
+        log_pipeline = pipeline.EventLogPipeline(
+            FakeLogConnector(logs), abi=[], sink=sink, page_size=50,
+            queue_size=2, decode_workers=3, decoder=fake_decoder)
+        metrics = log_pipeline.run("0x", "0x", from_block=0)
+        sink.close()
+
+        assert metrics.stages["fetch"].records == len(logs)
+        assert metrics.stages["sink"].records == len(logs)
+        assert metrics.stages["decode"].batches == len(logs) // 50
+        with sqlite3.connect(db_path) as connection:
+            (count,) = connection.execute("SELECT COUNT(*) FROM event_logs").fetchone()
+            (zero_index,) = connection.execute(
+                "SELECT COUNT(*) FROM event_logs WHERE log_index = 0").fetchone()
+        assert count == len(logs)
+        assert zero_index == 60
+
+    def test_run_to_jsonl(self, logs, tmp_path):
+        path = os.path.join(tmp_path, "logs.jsonl")
+        with pipeline.JsonlSink(path) as sink:
+            pipeline.EventLogPipeline(
+                FakeLogConnector(logs), abi=[], sink=sink, page_size=100,
+                decoder=fake_decoder).run("0x", "0x")
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == len(logs)
+        assert records[0]["event"] == "Transfer"
+        assert records[0]["block_number"] == 100
+
+    def test_decode_errors_are_recorded(self, logs):
+        def broken_decoder(data, topics, abi):
+            raise KeyError(topics[0])
+
+        batches: List[List[Dict[str, Any]]] = []
+        pipeline.EventLogPipeline(
+            FakeLogConnector(logs[:10]), abi=[],
+            sink=pipeline.CallbackSink(batches.append),
+            decoder=broken_decoder).run("0x", "0x")
+        records = [record for batch in batches for record in batch]
+        assert len(records) == 10
+        assert all(record["event"] == "decode error" for record in records)
+
+    def test_stage_errors_propagate(self, logs):
+        def failing_sink(records):
+            raise IOError("disk full")
+
+        with pytest.raises(IOError, match="disk full"):
+            pipeline.EventLogPipeline(
+                FakeLogConnector(logs), abi=[], page_size=10, queue_size=1,
+                sink=pipeline.CallbackSink(failing_sink),
+                decoder=fake_decoder).run("0x", "0x")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import json
+import os
+import pytest
+
+from pycaw.etherscan import decoding_utils
+from pycaw.etherscan import signatures
+
+from typing import List
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+class TestSignatureDB:
+    @pytest.fixture
+    def db_path(self, tmp_path) -> str:
+        path = os.path.join(tmp_path, "signatures.db")
+        builder = signatures.SignatureDBBuilder().add_common()
+        # Two real signatures that share the selector 0x42966c68.
+        builder.add_function("burn(uint256)")
+        builder.add_function("collate_propagate_storage(bytes16)")
+        builder.write(path)
+        return path
+
+    def test_lookup(self, db_path: str):
+        with signatures.SignatureDB(db_path) as db:
+            assert db.functions("0xa9059cbb") == ["transfer(address,uint256)"]
+            assert db.functions(bytes.fromhex("095ea7b3")) == ["approve(address,uint256)"]
+            assert db.events(TRANSFER_TOPIC) == ["Transfer(address,address,uint256)"]
+            assert db.functions("0xffffffff") == []
+            assert db.events("0x" + "ab" * 32) == []
+            assert len(db) == db.num_functions + db.num_events
+
+    def test_closed(self, db_path: str):
+        db = signatures.SignatureDB(db_path)
+        num_signatures = len(db)
+        db.close()
+        assert db.closed
+        assert len(db) == num_signatures
+        with pytest.raises(ValueError, match="closed"):
+            db.functions("0xa9059cbb")
+        with pytest.raises(ValueError, match="closed"):
+            db.events(TRANSFER_TOPIC)
+
+    def test_selector_collisions(self, db_path: str):
+        with signatures.SignatureDB(db_path) as db:
+            assert sorted(db.functions("0x42966c68")) == [
+                "burn(uint256)", "collate_propagate_storage(bytes16)"]
+
+    def test_full_input_data_lookup(self, db_path: str):
+        input_data = "0xa9059cbb" + "00" * 64
+        with signatures.SignatureDB(db_path) as db:
+            assert db.functions(input_data) == ["transfer(address,uint256)"]
+
+    def test_bulk_import(self, tmp_path):
+        csv_path = os.path.join(tmp_path, "functions.csv")
+        with open(csv_path, "w") as f:
+            f.write("id,created_at,text_signature,hex_signature,bytes_signature\n")
+            f.write("1,2016-07-09,balanceOf(address),0x70a08231,x\n")
+            f.write("2,2016-07-09,totalSupply(),0x18160ddd,x\n")
+        txt_path = os.path.join(tmp_path, "events.txt")
+        with open(txt_path, "w") as f:
+            f.write("# event signatures\n")
+            f.write("Transfer(address, address, uint256)\n")
+            f.write("0x8c5be1e5,Approval(address,address,uint256)\n")
+            f.write("not a signature\n")
+
+        builder = signatures.SignatureDBBuilder()
+        assert builder.import_file(csv_path, kind="function") == 2
+        assert builder.import_file(txt_path, kind="event") == 2
+        db_path = os.path.join(tmp_path, "bulk.db")
+        builder.write(db_path)
+        with signatures.SignatureDB(db_path) as db:
+            assert db.functions("0x70a08231") == ["balanceOf(address)"]
+            assert db.events(TRANSFER_TOPIC) == ["Transfer(address,address,uint256)"]
+            assert db.num_functions == 2 and db.num_events == 2
+
+    def test_add_abi(self, tmp_path):
+        abi: List[dict] = [
+            {"type": "function", "name": "submit", "inputs": [
+                {"name": "order", "type": "tuple", "components": [
+                    {"name": "maker", "type": "address"},
+                    {"name": "amounts", "type": "uint256[]"}]}]},
+            {"type": "event", "name": "Sync", "anonymous": False, "inputs": [
+                {"name": "reserve0", "type": "uint112", "indexed": False},
+                {"name": "reserve1", "type": "uint112", "indexed": False}]}]
+        builder = signatures.SignatureDBBuilder().add_abi(json.dumps(abi))
+        assert builder.function_signatures == {"submit((address,uint256[]))"}
+        assert builder.event_signatures == {"Sync(uint112,uint112)"}
+
+    def test_abi_inputs(self):
+        name, types = signatures.split_signature("f((address,uint256)[],bytes)")
+        assert name == "f"
+        assert types == ["(address,uint256)[]", "bytes"]
+        inputs = signatures.abi_inputs(types)
+        assert inputs[0]["type"] == "tuple[]"
+        assert [c["type"] for c in inputs[0]["components"]] == ["address", "uint256"]
+
+    def test_invalid_file(self, tmp_path):
+        path = os.path.join(tmp_path, "junk.db")
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 64)
+        with pytest.raises(ValueError):
+            signatures.SignatureDB(path)
+
+
+class TestSignatureDecoding:
+    @pytest.fixture
+    def db(self, tmp_path) -> signatures.SignatureDB:
+        path = os.path.join(tmp_path, "signatures.db")
+        signatures.SignatureDBBuilder().add_common().write(path)
+        return signatures.SignatureDB(path)
+
+    def test_decode_tx_without_abi(self, db: signatures.SignatureDB):
+        recipient = "00" * 12 + "11" * 20
+        amount = f"{10**18:064x}"
+        input_data = "0xa9059cbb" + recipient + amount
+        fn_name, params, schema = decoding_utils.decode_tx(
+            "0x6b175474e89094c44da98b954eedeac495271d0f", input_data, abi=None,
+            signatures=db)
+        assert fn_name == "transfer"
+        assert json.loads(params)["arg1"] == 10**18
+        assert [arg["type"] for arg in json.loads(schema)] == ["address", "uint256"]
+
+    def test_decode_log_without_abi(self, db: signatures.SignatureDB):
+        topics = [TRANSFER_TOPIC, "0x" + "00" * 12 + "11" * 20,
+                  "0x" + "00" * 12 + "22" * 20]
+        data = "0x" + f"{5:064x}"
+        evt_name, args, _ = decoding_utils.decode_log(
+            data, topics, abi=None, signatures=db)
+        assert evt_name == "Transfer"
+        assert json.loads(args)["arg2"] == 5
+
+    def test_no_signature_match(self, db: signatures.SignatureDB):
+        assert decoding_utils.decode_tx(
+            "0x0", "0xffffffff", abi=None, signatures=db) == (
+                "no matching abi", None, None)
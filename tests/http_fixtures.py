@@ -0,0 +1,337 @@
+"""Record/replay HTTP fixtures and a local stub server for offline runs.
+
+Test and benchmark tooling only, it is not part of the pycaw package: its
+hooks reroute every HTTP request of the process while they are active.
+
+Every connector ends up in requests' transport: DataLoader (DeFiLlama,
+Messari) and CoinMarketCapAPI through a requests.Session, the Etherscan and
+FTMScan connectors through requests.get. Both are served by
+requests.adapters.HTTPAdapter.send, which is where this module hooks in, so
+no connector needs to know whether it talks to the network, to a recording
+or to a stub server.
+
+Classes:
+    Cassette
+    StubServer
+
+Functions:
+    use_cassette
+    route_to
+
+Examples:
+    Record once with API keys, then replay offline:
+
+    >>> with use_cassette("tests/cassettes/defillama.json", mode="once"):
+    ...     tvl = DeFiLlama().get_protocol_tvl_timeseries(["aave", "curve"])
+
+    Run against canned payloads with 20 ms latency and 5% of requests failing:
+
+    >>> with StubServer({r"^/protocol/": protocol}, latency=0.02, error_rate=0.05) as server:
+    ...     with route_to(server, hosts=["api.llama.fi"]):
+    ...         tvl = DeFiLlama().get_protocol_tvl_timeseries(["aave", "curve"])
+"""
+import contextlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Query parameters holding API keys, never written to a cassette
+SECRET_PARAMS = ("apikey", "api_key", "key", "CMC_PRO_API_KEY")
+# Response headers that don't apply to the stored, already decoded body
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection",
+                   "set-cookie")
+CASSETTE_MODES = ("replay", "record", "once")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_key(method: str, url: str) -> str:
+    """Identity of a request in a cassette: method and URL with sorted,
+    secret-free query parameters. Headers are left out, so API keys sent as
+    headers never reach the cassette either."""
+    scheme, netloc, path, query, _ = urlsplit(url)
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                    if name not in SECRET_PARAMS)
+    return f"{method.upper()} {urlunsplit((scheme, netloc, path, urlencode(params), ''))}"
+
+
+class Cassette:
+    """Recorded HTTP interactions stored in a JSON file.
+
+    Several recordings of the same request are replayed in the order they
+    were recorded, the last one repeating, so paginated or growing
+    endpoints replay like they were recorded.
+
+    Args:
+        path (str): JSON file of the recordings.
+        mode (str): 'replay' answers from the file and raises
+            CassetteMissError for unknown requests, 'record' sends every
+            request and overwrites the file, 'once' replays what is recorded
+            and records the rest.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"mode must be one of {CASSETTE_MODES}, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats = {"replayed": 0, "recorded": 0}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode != "record" and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for interaction in json.load(f)["interactions"]:
+                    self.interactions.setdefault(interaction["request"], []).append(interaction)
+
+    def __len__(self) -> int:
+        return sum(len(recordings) for recordings in self.interactions.values())
+
+    def find(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recording of a request, None if it was never recorded"""
+        with self._lock:
+            recordings = self.interactions.get(key)
+            if not recordings:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.stats["replayed"] += 1
+            return recordings[min(position, len(recordings) - 1)]
+
+    def add(self, key: str, response: requests.Response) -> None:
+        """Record a response, reading its body"""
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_HEADERS}
+        interaction = {"request": key, "status": response.status_code,
+                       "reason": response.reason, "headers": headers,
+                       "body": response.content.decode("utf-8", errors="replace")}
+        with self._lock:
+            self.interactions.setdefault(key, []).append(interaction)
+            self.stats["recorded"] += 1
+
+    def save(self) -> None:
+        """Atomically write the recordings to path"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            interactions = [interaction for recordings in self.interactions.values()
+                            for interaction in recordings]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"interactions": interactions}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def to_response(interaction: Dict[str, Any],
+                    request: requests.PreparedRequest) -> requests.Response:
+        """Rebuild a requests.Response from a recording"""
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason")
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = interaction["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+@contextlib.contextmanager
+def _patch_send(send: Callable[..., requests.Response]) -> Iterator[None]:
+    """Replace HTTPAdapter.send in the whole process, restoring it on exit.
+
+    send gets the send method it replaces as its first argument.
+    """
+    previous = HTTPAdapter.send
+
+    def patched(adapter: HTTPAdapter, request: requests.PreparedRequest, **kwargs):
+        return send(previous, adapter, request, **kwargs)
+
+    HTTPAdapter.send = patched
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = previous
+
+
+@contextlib.contextmanager
+def use_cassette(path: str, mode: str = "replay") -> Iterator[Cassette]:
+    """Serve every HTTP request of the process from a cassette.
+
+    Recorded cassettes are saved on exit. Nest inside route_to to record
+    stub server responses under the real URLs.
+
+    Args:
+        path (str): JSON file of the recordings.
+        mode (str): 'replay', 'record' or 'once', see Cassette.
+
+    Yields:
+        (Cassette): the cassette, i.e. to check its stats
+    """
+    cassette = Cassette(path, mode)
+
+    def send(previous, adapter, request, **kwargs):
+        key = request_key(request.method, request.url)
+        if cassette.mode != "record":
+            interaction = cassette.find(key)
+            if interaction is not None:
+                return Cassette.to_response(interaction, request)
+            if cassette.mode == "replay":
+                raise CassetteMissError(f"{key} is not recorded in {cassette.path}")
+        response = previous(adapter, request, **kwargs)
+        cassette.add(key, response)
+        return response
+
+    try:
+        with _patch_send(send):
+            yield cassette
+    finally:
+        if cassette.stats["recorded"]:
+            cassette.save()
+
+
+Payload = Union[Any, Callable[[str, Dict[str, str]], Any]]
+
+
+class StubServer:
+    """Local HTTP server answering GET requests with canned JSON.
+
+    Routes map regexes, searched in the request path including its query
+    string, to payloads. A payload may be a callable of (path, query dict)
+    returning the payload. Unmatched requests get a 404. Latency and errors
+    are injected before routing, errors as error_status responses with a
+    Retry-After of 0.
+
+    Args:
+        routes (Dict[str, Any]): Optional initial routes, see add_route.
+        latency (float): Seconds added to every response.
+        jitter (float): Maximum random seconds added on top of latency.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): Status code of injected errors.
+        seed (int): Optional seed of the latency and error draws.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Payload]] = None, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = {"requests": 0, "errors": 0, "not_found": 0}
+        self._routes: List[Tuple[Pattern, Payload, int, Optional[bytes]]] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        for pattern, payload in (routes or {}).items():
+            self.add_route(pattern, payload)
+
+    def add_route(self, pattern: str, payload: Payload, status: int = 200) -> None:
+        """Answer requests whose path matches pattern, first added route first"""
+        body = None if callable(payload) else json.dumps(payload).encode()
+        self._routes.append((re.compile(pattern), payload, status, body))
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        """Serve on a free loopback port from a daemon thread"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+            # Headers and body are written separately, don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body = stub._respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == stub.error_status:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name="pycaw-stub-server")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _respond(self, path: str) -> Tuple[int, bytes]:
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return self.error_status, b'{"error": "injected"}'
+        for pattern, payload, status, body in self._routes:
+            if pattern.search(path):
+                if body is None:
+                    split = urlsplit(path)
+                    body = json.dumps(payload(split.path, dict(parse_qsl(split.query)))).encode()
+                return status, body
+        with self._lock:
+            self.stats["not_found"] += 1
+        return 404, json.dumps({"error": f"no route for {path}"}).encode()
+
+
+@contextlib.contextmanager
+def route_to(server: StubServer, hosts: Optional[Iterable[str]] = None) -> Iterator[None]:
+    """Send the process' HTTP requests to a stub server instead of their host.
+
+    Args:
+        server (StubServer): Started server receiving the requests.
+        hosts (Iterable[str]): Optional host names to reroute, i.e.
+            ['api.llama.fi']. Every host is rerouted if not given.
+    """
+    hosts = None if hosts is None else set(hosts)
+    target = urlsplit(server.url)
+
+    def send(previous, adapter, request, **kwargs):
+        scheme, netloc, path, query, fragment = urlsplit(request.url)
+        if hosts is None or netloc in hosts:
+            request = request.copy()
+            request.url = urlunsplit((target.scheme, target.netloc, path, query, fragment))
+        return previous(adapter, request, **kwargs)
+
+    with _patch_send(send):
+        yield
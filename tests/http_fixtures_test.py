@@ -0,0 +1,84 @@
+"""Offline tests for 'tests.http_fixtures'."""
+import json
+import pytest
+import requests
+
+from pycaw.messari import dataloader
+from pycaw.defillama import DeFiLlama
+
+from tests import http_fixtures
+from tests.defillama_test import protocol_payload
+
+
+def protocol_route(path, query):
+    return protocol_payload(path)[0]
+
+
+def fast_retries() -> dataloader.RetryPolicy:
+    return dataloader.RetryPolicy(max_retries=5, backoff_factor=0.0)
+
+
+class TestRequestKey:
+    def test_secrets_removed_and_params_sorted(self):
+        key = http_fixtures.request_key(
+            "get", "https://api.etherscan.io/api?module=logs&apikey=SECRET&action=getLogs")
+        assert key == "GET https://api.etherscan.io/api?action=getLogs&module=logs"
+
+
+class TestStubServer:
+    def test_routes_latency_and_errors(self):
+        routes = {r"^/protocol/": protocol_route, r"^/protocols$": [{"slug": "aave"}]}
+        with http_fixtures.StubServer(routes, latency=0.01) as server:
+            assert requests.get(f"{server.url}/protocols").json() == [{"slug": "aave"}]
+            assert requests.get(f"{server.url}/protocol/curve").json() == protocol_route(
+                "/protocol/curve", {})
+            assert requests.get(f"{server.url}/missing").status_code == 404
+            server.error_rate = 1.0
+            response = requests.get(f"{server.url}/protocols")
+            assert (response.status_code, response.headers["Retry-After"]) == (503, "0")
+        assert server.stats == {"requests": 4, "errors": 1, "not_found": 1}
+
+    def test_loader_retries_injected_errors(self):
+        with http_fixtures.StubServer({r"^/protocol/": protocol_route},
+                                      error_rate=0.3, seed=1) as server:
+            with http_fixtures.route_to(server, hosts=["api.llama.fi"]):
+                llama = DeFiLlama(max_workers=4, retry_policy=fast_retries())
+                tvl = llama.get_protocol_tvl_timeseries(["aave", "curve"] * 5)
+        assert server.stats["errors"] > 0
+        assert tvl["aave"]["all"]["totalLiquidityUSD"].tolist() == [4.0, 5.0, 6.0, 7.0, 8.0]
+
+
+class TestCassette:
+    def test_record_then_replay_offline(self, tmp_path):
+        path = str(tmp_path / "cassettes" / "defillama.json")
+        with http_fixtures.StubServer({r"^/protocol/": protocol_route}) as server:
+            with http_fixtures.route_to(server):
+                with http_fixtures.use_cassette(path, mode="record") as cassette:
+                    recorded = DeFiLlama().get_protocol_tvl_timeseries(["aave", "curve"])
+        assert cassette.stats["recorded"] == 2
+        with open(path) as f:
+            keys = [interaction["request"] for interaction in json.load(f)["interactions"]]
+        assert sorted(keys) == ["GET https://api.llama.fi/protocol/aave",
+                                "GET https://api.llama.fi/protocol/curve"]
+
+        # The server is gone, every response comes from the cassette
+        with http_fixtures.use_cassette(path) as cassette:
+            replayed = DeFiLlama().get_protocol_tvl_timeseries(["aave", "curve"])
+            with pytest.raises(http_fixtures.CassetteMissError):
+                DeFiLlama(retry_policy=fast_retries()).get_protocol_tvl_timeseries("uniswap")
+        assert cassette.stats == {"replayed": 2, "recorded": 0}
+        assert replayed.equals(recorded)
+
+    def test_repeated_requests_replay_in_order(self, tmp_path):
+        path = str(tmp_path / "pages.json")
+        pages = iter([{"page": 1}, {"page": 2}])
+        with http_fixtures.StubServer({r"^/page": lambda path, query: next(pages)}) as server:
+            with http_fixtures.use_cassette(path, mode="record"):
+                for _ in range(2):
+                    requests.get(f"{server.url}/page?apikey=SECRET")
+            url = f"{server.url}/page?apikey=OTHER"
+        with open(path) as f:
+            assert "SECRET" not in f.read()
+        with http_fixtures.use_cassette(path):
+            replayed = [requests.get(url).json() for _ in range(3)]
+        assert replayed == [{"page": 1}, {"page": 2}, {"page": 2}]
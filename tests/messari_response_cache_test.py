@@ -0,0 +1,141 @@
+"""Offline tests for 'pycaw.messari.response_cache'."""
+import json
+import time
+import pytest
+
+from pycaw.messari import dataloader
+from pycaw.messari import response_cache
+
+from typing import Dict, List
+
+
+class CachingResponse:
+    def __init__(self, payload, status_code: int = 200, headers: Dict = None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(payload).encode() if payload is not None else b""
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise dataloader.requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ETagSession:
+    """Serves a versioned payload, answering 304 to a matching If-None-Match."""
+
+    def __init__(self, etag: bool = True):
+        self.version = 1
+        self.etag = etag
+        self.requests: List[Dict] = []
+
+    def get(self, url, params=None, headers=None):
+        headers = headers or {}
+        self.requests.append(dict(url=url, params=params, headers=headers))
+        etag = f'"v{self.version}"'
+        if self.etag and headers.get("If-None-Match") == etag:
+            return CachingResponse(None, status_code=304)
+        return CachingResponse({"url": url, "params": params, "version": self.version},
+                               headers={"ETag": etag} if self.etag else {})
+
+    def close(self):
+        pass
+
+
+def make_loader(cache: response_cache.ResponseCache, session: ETagSession, **kwargs):
+    loader = dataloader.DataLoader(api_dict=None, taxonomy_dict={}, response_cache=cache,
+                                   **kwargs)
+    loader.session = session
+    return loader
+
+
+class TestResponseCache:
+    def test_revalidates_with_etag(self):
+        cache = response_cache.ResponseCache()
+        session = ETagSession()
+        loader = make_loader(cache, session)
+
+        first = loader.get_response("https://api.llama.fi/protocols")
+        second = loader.get_response("https://api.llama.fi/protocols")
+        assert first == second
+        assert session.requests[1]["headers"]["If-None-Match"] == '"v1"'
+        assert cache.stats == {"hits": 0, "revalidated": 1, "misses": 1}
+
+        session.version = 2
+        assert loader.get_response("https://api.llama.fi/protocols")["version"] == 2
+        assert cache.stats["misses"] == 2
+
+    def test_ttl_skips_network(self):
+        cache = response_cache.ResponseCache(ttls={r"/protocols$": 60})
+        session = ETagSession(etag=False)
+        loader = make_loader(cache, session)
+
+        for _ in range(3):
+            loader.get_response("https://api.llama.fi/protocols")
+        # Without validators or a TTL nothing is stored
+        loader.get_response("https://api.llama.fi/chains")
+        loader.get_response("https://api.llama.fi/chains")
+        assert len(session.requests) == 3
+        assert cache.stats == {"hits": 2, "revalidated": 0, "misses": 3}
+
+    def test_expired_ttl_revalidates(self):
+        cache = response_cache.ResponseCache(default_ttl=60)
+        session = ETagSession()
+        loader = make_loader(cache, session)
+        loader.get_response("https://api.llama.fi/protocols")
+        cache.load(cache.key("https://api.llama.fi/protocols")).stored_at = time.time() - 120
+        loader.get_response("https://api.llama.fi/protocols")
+        loader.get_response("https://api.llama.fi/protocols")
+        assert cache.stats == {"hits": 1, "revalidated": 1, "misses": 1}
+
+    def test_keyed_on_params(self):
+        cache = response_cache.ResponseCache(default_ttl=60)
+        loader = make_loader(cache, ETagSession())
+        a = loader.get_response("https://x/assets", params={"page": 1, "limit": 5})
+        b = loader.get_response("https://x/assets", params={"limit": 5, "page": 1})
+        c = loader.get_response("https://x/assets", params={"page": 2, "limit": 5})
+        assert a == b != c
+        assert cache.stats["hits"] == 1
+
+    def test_disk_level_survives_restart(self, tmp_path):
+        session = ETagSession()
+        cache = response_cache.ResponseCache(cache_dir=str(tmp_path), default_ttl=60)
+        payload = make_loader(cache, session).get_response("https://api.llama.fi/protocols")
+
+        restarted = response_cache.ResponseCache(cache_dir=str(tmp_path), default_ttl=60)
+        assert make_loader(restarted, session).get_response(
+            "https://api.llama.fi/protocols") == payload
+        assert len(session.requests) == 1
+        assert restarted.stats["hits"] == 1
+
+        restarted.clear()
+        assert restarted.load(restarted.key("https://api.llama.fi/protocols")) is None
+
+    def test_returned_payload_is_a_copy(self):
+        cache = response_cache.ResponseCache(default_ttl=60)
+        loader = make_loader(cache, ETagSession())
+        loader.get_response("https://api.llama.fi/protocols")["version"] = "mutated"
+        assert loader.get_response("https://api.llama.fi/protocols")["version"] == 1
+
+    def test_memory_is_bounded(self):
+        cache = response_cache.ResponseCache(default_ttl=60, max_entries=2)
+        loader = make_loader(cache, ETagSession())
+        for page in range(3):
+            loader.get_response("https://x/assets", params={"page": page})
+        assert cache.load(cache.key("https://x/assets", {"page": 0})) is None
+        assert cache.load(cache.key("https://x/assets", {"page": 2})) is not None
+
+    def test_errors_are_not_cached(self):
+        class FailingSession(ETagSession):
+            def get(self, url, params=None, headers=None):
+                return CachingResponse({}, status_code=500)
+
+        cache = response_cache.ResponseCache(default_ttl=60)
+        with pytest.raises(SystemError):
+            make_loader(cache, FailingSession(),
+                        retry_policy=dataloader.RetryPolicy(max_retries=0)).get_response(
+                            "https://x")
+        assert cache.load(cache.key("https://x")) is None
@@ -0,0 +1,80 @@
+"""Offline tests for 'pycaw.messari.taxonomy'."""
+import json
+import os
+import pandas as pd
+import pytest
+
+from pycaw.messari import dataloader
+from pycaw.messari import taxonomy
+
+MAPPING = {"uniswap": "uniswap-v3", "uni": "uniswap-v3", "aave": "aave-v2"}
+
+
+@pytest.fixture
+def mapping_file(tmp_path, monkeypatch):
+    """Absolute path of a mapping file checked for changes on every lookup."""
+    monkeypatch.setattr(taxonomy, "RELOAD_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(taxonomy, "_taxonomy_files", {})
+    path = tmp_path / "mapping.json"
+    path.write_text(json.dumps(MAPPING))
+    return str(path)
+
+
+class TestTaxonomyIndex:
+    def test_forward_and_reverse(self):
+        index = taxonomy.TaxonomyIndex(MAPPING)
+        assert index.translate(["uni", "bitcoin", "aave"]) == ["uniswap-v3", "bitcoin", "aave-v2"]
+        assert index.translate("uniswap") == ["uniswap-v3"]
+        assert index.reverse("uniswap-v3") == ("uniswap", "uni")
+        assert index.reverse("bitcoin") == ()
+        assert "uni" in index and len(index) == 3
+        with pytest.raises(TypeError):
+            index.forward["uni"] = "other"
+
+    def test_translate_series(self):
+        index = taxonomy.TaxonomyIndex(MAPPING)
+        slugs = pd.Series(["aave", "bitcoin", "uni"], index=[3, 1, 2], name="slug")
+        expected = pd.Series(["aave-v2", "bitcoin", "uniswap-v3"], index=[3, 1, 2],
+                             name="slug", dtype=object)
+        pd.testing.assert_series_equal(index.translate_series(slugs), expected)
+        empty = taxonomy.TaxonomyIndex()
+        pd.testing.assert_series_equal(empty.translate_series(slugs), slugs.astype(object))
+
+
+class TestTaxonomyFile:
+    def test_shared_and_reloaded_on_change(self, mapping_file):
+        index = taxonomy.get_taxonomy_index(mapping_file)
+        assert taxonomy.get_taxonomy_index(mapping_file) is index
+
+        with open(mapping_file, "w") as f:
+            json.dump({"uni": "uniswap-v2"}, f)
+        stat = os.stat(mapping_file)
+        os.utime(mapping_file, (stat.st_atime, stat.st_mtime + 10))
+        reloaded = taxonomy.get_taxonomy_index(mapping_file)
+        assert reloaded is not index
+        assert reloaded.translate(["uni", "uniswap"]) == ["uniswap-v2", "uniswap"]
+
+    def test_missing_or_broken_file(self, mapping_file):
+        assert len(taxonomy.get_taxonomy_index(mapping_file + ".missing")) == 0
+        index = taxonomy.get_taxonomy_index(mapping_file)
+        with open(mapping_file, "w") as f:
+            f.write("{not json")
+        # The previous mapping is kept until the file is valid again
+        assert taxonomy.get_taxonomy_index(mapping_file) is index
+
+    def test_loader_follows_file(self, mapping_file):
+        loaders = [dataloader.DataLoader(api_dict={}, taxonomy_dict=mapping_file)
+                   for _ in range(2)]
+        assert loaders[0].taxonomy is loaders[1].taxonomy
+        assert loaders[0].translate("uni") == ["uniswap-v3"]
+        assert loaders[0].taxonomy_dict == MAPPING
+
+        with open(mapping_file, "w") as f:
+            json.dump({"uni": "uniswap-v2"}, f)
+        stat = os.stat(mapping_file)
+        os.utime(mapping_file, (stat.st_atime, stat.st_mtime + 10))
+        assert loaders[1].translate(pd.Series(["uni"])).tolist() == ["uniswap-v2"]
+
+        loaders[0].set_taxonomy_dict({"uni": "uniswap"})
+        assert loaders[0].translate(["uni"]) == ["uniswap"]
+        assert dataloader.DataLoader(api_dict={}, taxonomy_dict=None).translate("uni") == ["uni"]
@@ -15,6 +15,7 @@ if API_KEY is None:
     sys.exit()
 
 
+@pytest.mark.live
 class TestMessari:
     """This is a unit testing class for testing the Messari class"""
 
@@ -0,0 +1,65 @@
+"""Offline tests for 'pycaw.messari.timeseries_cache'."""
+import pandas as pd
+import pytest
+
+from pycaw.messari import messari_api
+from pycaw.messari import timeseries_cache
+from tests.dataloader_test import TimeseriesSession
+
+
+class TestMetricTimeseriesCache:
+    @pytest.fixture
+    def cache(self, tmp_path) -> timeseries_cache.MetricTimeseriesCache:
+        conn = messari_api.Messari(api_key="test")
+        conn.session = TimeseriesSession()
+        return timeseries_cache.MetricTimeseriesCache(conn, cache_dir=str(tmp_path))
+
+    def test_only_missing_ranges_are_fetched(self, cache):
+        session = cache.messari.session
+        assets = ["bitcoin", "ethereum"]
+        first_df = cache.get_metric_timeseries(assets, "price", start="2021-01-01",
+                                               end="2021-03-01")
+        assert len(session.windows) == 2
+        assert len(first_df) == 60
+
+        session.windows.clear()
+        cached_df = cache.get_metric_timeseries(assets, "price", start="2021-01-10",
+                                                end="2021-02-10")
+        assert session.windows == []
+        pd.testing.assert_frame_equal(cached_df, first_df.loc["2021-01-10":"2021-02-10"])
+
+        extended_df = cache.get_metric_timeseries(assets, "price", start="2021-01-01",
+                                                  end="2021-03-10")
+        assert len(session.windows) == 2
+        tail_start, tail_end = session.windows[0]
+        assert pd.Timestamp(tail_start) > pd.Timestamp("2021-03-01", tz="UTC")
+        assert len(extended_df) == 69
+        assert extended_df.index.is_unique
+
+    def test_gap_in_middle(self, cache):
+        cache.get_metric_timeseries("bitcoin", "price", start="2021-01-01", end="2021-01-10")
+        cache.get_metric_timeseries("bitcoin", "price", start="2021-01-20", end="2021-01-31")
+        missing = cache.missing_ranges("bitcoin", "price", start="2021-01-01",
+                                       end="2021-01-31")
+        assert len(missing) == 1
+        assert pd.Timestamp(missing[0][0]) > pd.Timestamp("2021-01-10", tz="UTC")
+        assert pd.Timestamp(missing[0][1]) < pd.Timestamp("2021-01-20", tz="UTC")
+
+        full_df = cache.get_metric_timeseries("bitcoin", "price", start="2021-01-01",
+                                              end="2021-01-31")
+        assert len(full_df) == 31
+
+    def test_latest_interval_is_refetched(self, cache):
+        today = pd.Timestamp.utcnow().normalize()
+        start = (today - pd.Timedelta(days=5)).strftime("%Y-%m-%d")
+        cache.get_metric_timeseries("bitcoin", "price", start=start)
+        missing = cache.missing_ranges("bitcoin", "price", start=start)
+        assert len(missing) == 1
+        assert pd.Timestamp(missing[0][0]) > today - pd.Timedelta(days=2)
+
+    def test_entry_merge_prefers_new_rows(self):
+        entry = timeseries_cache.TimeseriesEntry.empty()
+        entry.merge(["price"], [[1000, 1.0], [2000, 2.0]], (1000, 2000))
+        entry.merge(["price"], [[2000, 5.0], [3000, None]], (2000, 3000))
+        assert entry.rows(0, 10_000) == [[1000, 1.0], [2000, 5.0], [3000, None]]
+        assert entry.coverage == [(1000, 3000)]
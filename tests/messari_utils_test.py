@@ -0,0 +1,89 @@
+"""Offline tests for 'pycaw.messari.utils'."""
+import pandas as pd
+import pytest
+
+from pycaw.messari import utils
+
+from typing import Dict
+
+
+def baseline(response_data: Dict[str, Dict]) -> pd.DataFrame:
+    flat = {key: utils.convert_flatten(value) for key, value in response_data.items()}
+    return pd.DataFrame.from_dict(flat, orient="index")
+
+
+class TestRecordFlattener:
+    @pytest.fixture
+    def response_data(self) -> Dict[str, Dict]:
+        return {
+            "bitcoin": {"id": "1", "symbol": "BTC",
+                        "market_data": {"price_usd": 40000.0,
+                                        "ohlcv_last_1_hour": {"open": 1.0, "close": 2.0}},
+                        "roi_by_year": {"2021_usd_percent": 60.0},
+                        "contract_addresses": None},
+            "ethereum": {"id": "2", "symbol": "ETH",
+                         "market_data": {"price_usd": 3000.0, "ohlcv_last_1_hour": None},
+                         "roi_by_year": None,
+                         "contract_addresses": None},
+            # Same number of keys as bitcoin but one key differs
+            "tether": {"id": "3", "symbol": "USDT",
+                       "market_data": {"price_usd": 1.0,
+                                       "ohlcv_last_1_hour": {"open": 1.0, "close": 1.0}},
+                       "supply": {"circulating": 8e10},
+                       "contract_addresses": "0xdac17f958d2ee523a2206206994597c13d831ec7"},
+            "dogecoin": {"id": "4", "symbol": "DOGE", "market_data": {}},
+        }
+
+    def test_matches_convert_flatten(self, response_data):
+        expected = baseline(response_data)
+        result = utils.flatten_to_dataframe(response_data)
+        assert list(result.index) == list(response_data)
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(expected.loc[result.index], result)
+
+    def test_list_of_records(self, response_data):
+        records = list(response_data.values())
+        result = utils.flatten_to_dataframe(records)
+        assert list(result.index) == [0, 1, 2, 3]
+        assert result.loc[2, "supply_circulating"] == 8e10
+        assert pd.isna(result.loc[0, "supply_circulating"])
+
+    def test_repeated_flat_key(self):
+        response_data = {"a": {"x_y": 1, "x": {"y": 2}}, "b": {"x_y": 3, "x": {"y": 4}}}
+        result = utils.flatten_to_dataframe(response_data)
+        pd.testing.assert_frame_equal(baseline(response_data), result)
+
+    def test_empty_records_are_dropped(self):
+        response_data = {"a": {"x": 1}, "empty": {}, "nested_empty": {"m": {}},
+                         "null": {"n": None}}
+        result = utils.flatten_to_dataframe(response_data)
+        assert list(result.index) == ["a", "null"]
+        pd.testing.assert_frame_equal(baseline(response_data), result)
+        result = utils.flatten_to_dataframe(list(response_data.values()))
+        assert list(result.index) == [0, 3]
+
+    def test_column_order_of_heterogeneous_records(self):
+        response_data = {"r0": {"d": 1, "b": 2, "a": {"e": 3}},
+                         # Same number of keys with one different, nested values first seen
+                         "r1": {"c": 4, "d": {"c": 5}, "b": {"d": 6}},
+                         # Same keys as r0 in another order
+                         "r2": {"a": {"f": 7}, "b": {"g": 8}, "d": 9},
+                         "r3": {"e": None}}
+        result = utils.flatten_to_dataframe(response_data)
+        expected = baseline(response_data)
+        assert list(result.index) == list(response_data)
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(expected.loc[result.index], result)
+
+    def test_separator(self):
+        result = utils.flatten_to_dataframe({"a": {"x": {"y": 1}}}, sep=".")
+        assert list(result.columns) == ["x.y"]
+
+
+class TestTimeFilterDf:
+    def test_input_is_not_modified(self):
+        dates = pd.to_datetime(["2021-01-03", "2021-01-01", "2021-01-02"]).date
+        df = pd.DataFrame({"tvl": [3.0, 1.0, 2.0]}, index=dates)
+        filtered = utils.time_filter_df(df, start_date="2021-01-02", end_date="2021-01-03")
+        assert filtered["tvl"].tolist() == [2.0, 3.0]
+        assert df["tvl"].tolist() == [3.0, 1.0, 2.0]